@@ -13,6 +13,7 @@ from typing_extensions import Annotated, Literal
 
 # Use your new combined base classes
 from .base import BaseAction, BaseActionWithSelector
+from .frames import find_in_frames, frame_cache
 
 action_logger = logger.bind(action="autoppia_action")
 logger.disable("autoppia_action")  # Disable logging for agent actions execution as its so annoying
@@ -244,46 +245,49 @@ class SendKeysIWAAction(BaseAction):
         await page.keyboard.press(self.keys)
 
 
+# Finds the <select> for a {kind, query} target from frames.compile_selector
+FIND_SELECT_JS = """
+    const select = target.kind === 'xpath'
+        ? document.evaluate(target.query, document, null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+        : target.kind === 'css' ? document.querySelector(target.query) : null;
+"""
+
+
 class GetDropDownOptions(BaseActionWithSelector):
     type: Literal["GetDropDownOptions"] = "GetDropDownOptions"
 
     @log_action("GetDropDownOptions")
     async def execute(self, page: Optional[Page], backend_service, web_agent_id: str):
         xpath = self.validate_selector()
-        all_options = []
-        frame_index = 0
+        found = await find_in_frames(
+            page,
+            """
+            (target) => {"""
+            + FIND_SELECT_JS
+            + """
+                if (!select) return null;
+                return {
+                    options: Array.from(select.options || []).map(opt => ({
+                        text: opt.text,
+                        value: opt.value,
+                        index: opt.index
+                    })),
+                    id: select.id,
+                    name: select.name
+                };
+            }
+            """,
+            xpath,
+        )
 
-        for frame in page.frames:
-            try:
-                options = await frame.evaluate(
-                    """
-                    (xp) => {
-                        const select = document.evaluate(xp, document, null,
-                            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
-                        if (!select) return null;
-                        return {
-                            options: Array.from(select.options).map(opt => ({
-                                text: opt.text,
-                                value: opt.value,
-                                index: opt.index
-                            })),
-                            id: select.id,
-                            name: select.name
-                        };
-                    }
-                    """,
-                    xpath,
-                )
-                if options:
-                    action_logger.debug(f"Found dropdown in frame {frame_index}")
-                    formatted = []
-                    for opt in options["options"]:
-                        encoded_text = json.dumps(opt["text"])
-                        formatted.append(f'{opt["index"]}: text={encoded_text}')
-                    all_options.extend(formatted)
-            except Exception as e:
-                action_logger.debug(f"Frame {frame_index} evaluate error: {str(e)}")
-            frame_index += 1
+        all_options = []
+        if found:
+            frame, options = found
+            action_logger.debug(f"Found dropdown in frame {frame.url}")
+            for opt in options["options"]:
+                encoded_text = json.dumps(opt["text"])
+                all_options.append(f'{opt["index"]}: text={encoded_text}')
 
         if all_options:
             msg = "\n".join(all_options) + "\nUse the exact string in SelectDropDownOption"
@@ -292,6 +296,32 @@ class GetDropDownOptions(BaseActionWithSelector):
             action_logger.info("No options found in any frame for dropdown")
 
 
+# Describes the <select> for a target in one frame, {found: false, ...} when there is none
+SELECT_INFO_JS = (
+    """
+    (target) => {"""
+    + FIND_SELECT_JS
+    + """
+        if (!select) return { found: false, error: 'No select found' };
+        if (select.tagName.toLowerCase() !== 'select') {
+            return {
+                found: false,
+                error: `Element is ${select.tagName}, not SELECT`
+            };
+        }
+        return {
+            found: true,
+            id: select.id,
+            name: select.name,
+            optionCount: select.options.length,
+            currentValue: select.value,
+            availableOptions: Array.from(select.options).map(o => o.text.trim())
+        };
+    }
+    """
+)
+
+
 class SelectDropDownOption(BaseActionWithSelector):
     type: Literal["SelectDropDownOption"] = "SelectDropDownOption"
     text: str
@@ -299,45 +329,26 @@ class SelectDropDownOption(BaseActionWithSelector):
     @log_action("SelectDropDownOption")
     async def execute(self, page: Optional[Page], backend_service, web_agent_id: str):
         xpath = self.validate_selector()
-        frame_index = 0
-        found = False
-
-        for frame in page.frames:
+        # Frames where selecting failed are left out of the next lookup
+        tried = []
+        selected_in = None
+        while selected_in is None:
+            found = await find_in_frames(
+                page, SELECT_INFO_JS, xpath, accept=lambda info: bool(info and info.get("found")), exclude=tried
+            )
+            if not found:
+                break
+            frame, _ = found
             try:
-                dropdown_info = await frame.evaluate(
-                    """
-                    (xp) => {
-                        const select = document.evaluate(xp, document, null,
-                            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
-                        if (!select) return { found: false, error: 'No select found' };
-                        if (select.tagName.toLowerCase() !== 'select') {
-                            return {
-                                found: false,
-                                error: `Element is ${select.tagName}, not SELECT`
-                            };
-                        }
-                        return {
-                            found: true,
-                            id: select.id,
-                            name: select.name,
-                            optionCount: select.options.length,
-                            currentValue: select.value,
-                            availableOptions: Array.from(select.options).map(o => o.text.trim())
-                        };
-                    }
-                    """,
-                    xpath,
-                )
-                if dropdown_info.get("found"):
-                    selected = await frame.locator(xpath).nth(0).select_option(label=self.text, timeout=1000)
-                    action_logger.info(f"Selected '{self.text}' => {selected} in frame {frame_index}")
-                    found = True
-                    break
+                selected = await frame.locator(xpath).nth(0).select_option(label=self.text, timeout=1000)
+                action_logger.info(f"Selected '{self.text}' => {selected} in frame {frame.url}")
+                selected_in = frame
             except Exception as e:
-                action_logger.debug(f"Frame {frame_index} attempt failed: {e}")
-            frame_index += 1
+                action_logger.debug(f"Frame {frame.url} attempt failed: {e}")
+                frame_cache(page).forget(xpath)
+                tried.append(frame)
 
-        if not found:
+        if selected_in is None:
             action_logger.info(f"Could not select option '{self.text}' in any frame")
 
 
@@ -0,0 +1,123 @@
+# Description: Helpers for running one script in every frame of a page at once, and
+# for remembering which frame held an element.
+
+import asyncio
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from playwright.async_api import Frame, Page
+
+
+def compile_selector(selector: str) -> Dict[str, Any]:
+    """Translates a Playwright selector string into a {kind, query} target for injected scripts."""
+    if selector.startswith("xpath="):
+        return {"kind": "xpath", "query": selector[len("xpath="):]}
+    if selector.startswith(("//", "..")):
+        return {"kind": "xpath", "query": selector}
+    if selector.startswith("text="):
+        value = selector[len("text="):]
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            return {"kind": "text", "query": value[1:-1], "exact": True}
+        return {"kind": "text", "query": value, "exact": False}
+    if selector.startswith("css="):
+        selector = selector[len("css="):]
+    return {"kind": "css", "query": selector}
+
+
+async def _evaluate(frame: Frame, script: str, arg: Any) -> Optional[Any]:
+    try:
+        return await frame.evaluate(script, arg)
+    except Exception as e:
+        logger.debug(f"frame {frame.url} evaluate error: {e}")
+        return None
+
+
+async def evaluate_in_frames(page: Page, script: str, arg: Any = None) -> List[Tuple[Frame, Optional[Any]]]:
+    """
+    Evaluates `script` in all frames of the page concurrently and returns
+    (frame, result) pairs in page.frames order; frames that fail give None.
+    """
+    frames = list(page.frames)
+    results = await asyncio.gather(*(_evaluate(frame, script, arg) for frame in frames))
+    return list(zip(frames, results))
+
+
+class FrameCache:
+    """
+    Remembers which frame of a page held the element for a selector. Entries
+    for a frame go when it navigates or detaches, and all of them go when the
+    main frame navigates. Frames are held weakly so the cache never keeps the
+    page alive.
+    """
+
+    def __init__(self, page: Page):
+        self._frames: Dict[str, weakref.ref] = {}
+        page.on("framenavigated", self._on_frame_changed)
+        page.on("framedetached", self._on_frame_changed)
+
+    def _on_frame_changed(self, frame: Frame):
+        if frame.parent_frame is None:
+            self._frames.clear()
+            return
+        for key in [key for key, ref in self._frames.items() if ref() in (None, frame)]:
+            del self._frames[key]
+
+    def get(self, key: str) -> Optional[Frame]:
+        ref = self._frames.get(key)
+        frame = ref() if ref is not None else None
+        if frame is None or frame.is_detached():
+            self._frames.pop(key, None)
+            return None
+        return frame
+
+    def put(self, key: str, frame: Frame):
+        self._frames[key] = weakref.ref(frame)
+
+    def forget(self, key: str):
+        self._frames.pop(key, None)
+
+
+_frame_caches: "weakref.WeakKeyDictionary[Page, FrameCache]" = weakref.WeakKeyDictionary()
+
+
+def frame_cache(page: Page) -> FrameCache:
+    """Returns the FrameCache of a page, creating it on first use."""
+    cache = _frame_caches.get(page)
+    if cache is None:
+        cache = _frame_caches[page] = FrameCache(page)
+    return cache
+
+
+async def find_in_frames(page: Page, script: str, selector: str, accept: Callable[[Any], bool] = bool,
+                         exclude: Sequence[Frame] = ()) -> Optional[Tuple[Frame, Any]]:
+    """
+    Runs `script` with the compiled `selector` in the frame that held it last
+    time, or else in all frames but `exclude` concurrently, and returns
+    (frame, result) for the first frame in page order whose result `accept`
+    takes; the frames after it are cancelled. The frame is remembered for the
+    next lookup of the same selector on this page.
+    """
+    cache = frame_cache(page)
+    target = compile_selector(selector)
+
+    frame = cache.get(selector)
+    if frame is not None and frame not in exclude:
+        result = await _evaluate(frame, script, target)
+        if accept(result):
+            return frame, result
+        cache.forget(selector)
+
+    frames = [frame for frame in page.frames if frame not in exclude]
+    tasks = [asyncio.ensure_future(_evaluate(frame, script, target)) for frame in frames]
+    try:
+        # All frames run at once, but a frame only wins once every frame before it has missed
+        for frame, task in zip(frames, tasks):
+            result = await task
+            if accept(result):
+                cache.put(selector, frame)
+                return frame, result
+    finally:
+        for task in tasks:
+            task.cancel()
+    return None
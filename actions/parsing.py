@@ -0,0 +1,168 @@
+# Description: Turns the action lists the LLM writes into typed action models, validating
+# the whole list in one call through a cached TypeAdapter.
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from pydantic import OnErrorOmit, TypeAdapter, ValidationError
+
+from .actions import ACTION_CLASS_MAP, AllActionsUnion
+from .base import BaseAction, Selector
+from ..json_stream import JsonArrayStream
+
+
+def _action_types() -> Dict[str, str]:
+    """Every spelling of an action type that is accepted, mapped to its discriminator value."""
+    types = {}
+    for name, action_class in ACTION_CLASS_MAP.items():
+        action_type = action_class.model_fields["type"].default
+        for key in (name, name.lower(), action_type.lower(), action_type.replace("Action", "").lower()):
+            types.setdefault(key, action_type)
+    return types
+
+
+ACTION_TYPES = _action_types()
+
+# DragAndDropAction only takes its aliases, the prompt asks for the field names
+DRAG_AND_DROP_FIELDS = (("source_selector", "sourceSelector"), ("target_selector", "targetSelector"))
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(skip_invalid: bool) -> TypeAdapter:
+    if skip_invalid:
+        # Invalid entries are left out in the same pass instead of failing the list
+        return TypeAdapter(List[OnErrorOmit[AllActionsUnion]])
+    return TypeAdapter(List[AllActionsUnion])
+
+
+@lru_cache(maxsize=None)
+def _action_adapter() -> TypeAdapter:
+    return TypeAdapter(AllActionsUnion)
+
+
+def _repair_selector(selector: Any) -> Any:
+    """Bare XPath strings become xpathSelector objects; anything else is left to validation."""
+    if isinstance(selector, str) and selector.startswith(("//", "xpath=")):
+        return {"type": "xpathSelector", "value": selector[len("xpath="):] if selector.startswith("xpath=") else selector}
+    return selector
+
+
+def _selector_string(selector: Any) -> Any:
+    if isinstance(selector, dict):
+        try:
+            return Selector(**selector).to_playwright_selector()
+        except (ValidationError, ValueError):
+            pass
+    return selector
+
+
+def normalize_action(data: Any) -> Optional[Dict[str, Any]]:
+    """
+    Rewrites one action dict into the shape the models validate: the wrapped
+    {"selector", "action"} form is flattened, alias types (see ACTION_CLASS_MAP)
+    are resolved and known slips of the LLM are repaired. Returns None when the
+    type is missing or unknown.
+    """
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get("action"), dict):
+        data = {**({"selector": data["selector"]} if "selector" in data else {}), **data["action"]}
+    else:
+        data = dict(data)
+
+    name = data.get("type")
+    if not isinstance(name, str):
+        return None
+    action_type = ACTION_TYPES.get(name) or ACTION_TYPES.get(name.lower())
+    if action_type is None:
+        return None
+    data["type"] = action_type
+
+    if action_type == "TypeAction" and "text" not in data and "value" in data:
+        data["text"] = data["value"]
+    if "selector" in data:
+        data["selector"] = _repair_selector(data["selector"])
+    if action_type == "DragAndDropAction":
+        for field, alias in DRAG_AND_DROP_FIELDS:
+            value = data.pop(field, None)
+            if alias not in data and value is not None:
+                data[alias] = value
+            if alias in data:
+                data[alias] = _selector_string(data[alias])
+    return data
+
+
+def parse_actions(data: Any, skip_invalid: bool = True) -> List[BaseAction]:
+    """
+    Validates a list of action dicts into action models in one TypeAdapter
+    call. Invalid entries are dropped (and logged) when `skip_invalid` is set;
+    otherwise the first one raises ValueError. A single dict counts as a list
+    of one action.
+    """
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a list of actions, got {type(data).__name__}")
+
+    entries = []
+    skipped = []
+    for index, item in enumerate(data):
+        entry = normalize_action(item)
+        if entry is None:
+            if not skip_invalid:
+                raise ValueError(f"Invalid action at {index}: {item!r}")
+            skipped.append(index)
+        else:
+            entries.append((index, entry))
+
+    try:
+        actions = _list_adapter(skip_invalid).validate_python([entry for _, entry in entries])
+    except ValidationError as e:
+        raise ValueError(f"Invalid action at {entries[e.errors()[0]['loc'][0]][0]}: {e}") from e
+
+    invalid = len(entries) - len(actions)
+    if skipped or invalid:
+        logger.warning(f"skipped {len(skipped) + invalid} invalid actions"
+                       + (f" (unknown type at {skipped})" if skipped else ""))
+    return actions
+
+
+def parse_action(data: Any) -> Optional[BaseAction]:
+    """Validates a single action dict, or returns None if it is invalid."""
+    entry = normalize_action(data)
+    if entry is None:
+        return None
+    try:
+        return _action_adapter().validate_python(entry)
+    except ValidationError:
+        return None
+
+
+class ActionStream:
+    """
+    Validates the actions of a reply one by one while the model is still
+    writing it. Pass `feed` as the text callback of a streamed turn, then
+    call result() with the parsed reply.
+    """
+
+    def __init__(self):
+        self.actions: List[BaseAction] = []
+        self.invalid = 0
+        self._stream = JsonArrayStream(self._on_item)
+        self.feed = self._stream.feed
+
+    def _on_item(self, item: Any):
+        action = parse_action(item)
+        if action is None:
+            self.invalid += 1
+        else:
+            self.actions.append(action)
+
+    def result(self, data: Any) -> List[BaseAction]:
+        """The streamed actions when the stream saw all of `data`, else parse_actions(data)."""
+        if not self._stream.done or self._stream.items != data:
+            return parse_actions(data)
+        if self.invalid:
+            logger.warning(f"skipped {self.invalid} invalid actions")
+        return self.actions
@@ -0,0 +1,222 @@
+# Description: Resolves the selectors of a whole action plan up front, one injected script per frame.
+
+import asyncio
+from typing import Any, Dict, List, Optional, Union
+
+from loguru import logger
+from playwright.async_api import Page
+from pydantic import BaseModel
+
+from .actions import DragAndDropAction, NavigateAction
+from .base import BaseAction, Selector
+from .frames import compile_selector, evaluate_in_frames
+from .parsing import parse_action
+from ..browser_pool import get_browser_pool
+from ..config import BROWSER_PAGE_TIMEOUT
+
+
+# Actions that work on elements the user cannot see, so only a match is required
+HIDDEN_TARGET_ACTIONS = frozenset(["GetDropDownOptions", "SelectDropDownOption"])
+
+PREFLIGHT_SCRIPT = """
+(targets) => {
+    const normalize = (text) => (text || '').replace(/\\s+/g, ' ').trim();
+    const skipped = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'HEAD', 'TEMPLATE']);
+    const isVisible = (el) => {
+        const style = window.getComputedStyle(el);
+        if (style.display === 'none' || style.visibility === 'hidden') return false;
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+    const textMatches = (text, query, exact) =>
+        exact ? text === query : text.toLowerCase().includes(query.toLowerCase());
+    const byText = (query, exact) => {
+        // Innermost elements whose text matches, like Playwright's text= engine
+        const matches = [];
+        const root = document.body || document.documentElement;
+        if (!root) return matches;
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT);
+        for (let el = walker.currentNode; el; el = walker.nextNode()) {
+            if (skipped.has(el.tagName)) continue;
+            if (!textMatches(normalize(el.textContent), query, exact)) continue;
+            const inner = Array.from(el.children).some(
+                (child) => !skipped.has(child.tagName) && textMatches(normalize(child.textContent), query, exact));
+            if (!inner) matches.push(el);
+        }
+        return matches;
+    };
+    const resolve = (target) => {
+        if (target.kind === 'xpath') {
+            const snapshot = document.evaluate(target.query, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const nodes = [];
+            for (let i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+            return nodes.filter((node) => node.nodeType === Node.ELEMENT_NODE);
+        }
+        if (target.kind === 'text') return byText(target.query, target.exact);
+        return Array.from(document.querySelectorAll(target.query));
+    };
+    return targets.map((target) => {
+        try {
+            const elements = resolve(target);
+            const shown = elements.find(isVisible);
+            const rect = (shown || elements[0]) ? (shown || elements[0]).getBoundingClientRect() : null;
+            return {
+                count: elements.length,
+                visible: Boolean(shown),
+                box: rect ? { x: rect.x, y: rect.y, width: rect.width, height: rect.height } : null,
+            };
+        } catch (e) {
+            return { count: 0, visible: false, box: null, error: String(e) };
+        }
+    });
+}
+"""
+
+
+class SelectorCheck(BaseModel):
+    """How one selector of one action resolved on its page."""
+
+    index: int  # Position of the action in the plan
+    action: str
+    role: str = "selector"  # "selector", or "source" / "target" for drag and drop
+    selector: str = ""
+    page_url: Optional[str] = None
+    matches: int = 0
+    visible: bool = False
+    box: Optional[Dict[str, float]] = None  # Of the first visible match, relative to its frame
+    frame: Optional[int] = None  # Index in page.frames of the frame holding that match
+    error: Optional[str] = None
+    ok: bool = False
+
+
+def _as_action(action: Union[BaseAction, Dict]) -> Optional[BaseAction]:
+    if isinstance(action, BaseAction):
+        return action
+    return parse_action(action)
+
+
+def action_targets(actions: List[Union[BaseAction, Dict]]) -> List[SelectorCheck]:
+    """One unresolved check per selector in the plan, in plan order."""
+    checks = []
+    for index, action in enumerate(actions):
+        action = _as_action(action)
+        if action is None:
+            continue
+        if isinstance(action, DragAndDropAction):
+            checks.append(SelectorCheck(index=index, action=action.type, role="source", selector=action.source_selector))
+            checks.append(SelectorCheck(index=index, action=action.type, role="target", selector=action.target_selector))
+            continue
+        selector = getattr(action, "selector", None)
+        if selector is None:
+            continue
+        check = SelectorCheck(index=index, action=action.type)
+        try:
+            if not isinstance(selector, Selector):
+                selector = Selector(**selector)
+            check.selector = selector.to_playwright_selector()
+        except Exception as e:
+            check.error = f"Invalid selector: {e}"
+        checks.append(check)
+    return checks
+
+
+def _merge(check: SelectorCheck, frame_results: List[Optional[Dict[str, Any]]]):
+    """Folds the per-frame results for one selector into its check."""
+    errors = []
+    for frame_index, result in enumerate(frame_results):
+        if result is None:
+            continue
+        if result.get("error"):
+            errors.append(result["error"])
+            continue
+        check.matches += result["count"]
+        if result["count"] and (check.frame is None or (result["visible"] and not check.visible)):
+            check.frame = frame_index
+            check.box = result["box"]
+            check.visible = result["visible"]
+    if not check.matches and errors:
+        check.error = errors[0]
+    check.ok = check.error is None and check.matches > 0 and (check.visible or check.action in HIDDEN_TARGET_ACTIONS)
+
+
+async def _preflight(page: Page, checks: List[SelectorCheck]) -> List[SelectorCheck]:
+    pending = [check for check in checks if check.error is None]
+    selectors = list(dict.fromkeys(check.selector for check in pending))
+    if selectors:
+        frame_results = await evaluate_in_frames(page, PREFLIGHT_SCRIPT, [compile_selector(selector) for selector in selectors])
+        by_selector = {
+            selector: [results[position] if results else None for _, results in frame_results]
+            for position, selector in enumerate(selectors)
+        }
+        for check in pending:
+            _merge(check, by_selector[check.selector])
+    for check in checks:
+        check.page_url = page.url
+    return checks
+
+
+async def preflight_actions(page: Page, actions: List[Union[BaseAction, Dict]]) -> List[SelectorCheck]:
+    """
+    Resolves every selector of `actions` against the page as it is now, in all
+    frames, with a single evaluate per frame. Checks that are not ok point at
+    actions that would fail when executed here.
+    """
+    return await _preflight(page, action_targets(actions))
+
+
+def _plan_pages(actions: List[Union[BaseAction, Dict]], start_url: str) -> Dict[Optional[str], List[SelectorCheck]]:
+    """Groups the checks by the page they run on, following NavigateAction URLs."""
+    pages: Dict[str, List[SelectorCheck]] = {}
+    checks = iter(action_targets(actions))
+    check = next(checks, None)
+    page_url = start_url
+    for index, action in enumerate(actions):
+        action = _as_action(action)
+        if isinstance(action, NavigateAction):
+            # Pages reached through history cannot be known up front
+            page_url = None if action.go_back or action.go_forward else action.url
+        while check is not None and check.index == index:
+            if not page_url:
+                check.error = check.error or "Page not known before execution"
+            pages.setdefault(page_url, []).append(check)
+            check = next(checks, None)
+    return pages
+
+
+async def _preflight_plan(actions: List[Union[BaseAction, Dict]], start_url: str, timeout: int) -> List[SelectorCheck]:
+    pool = get_browser_pool()
+
+    async def _check_page(page_url: Optional[str], checks: List[SelectorCheck]) -> List[SelectorCheck]:
+        if not page_url:
+            return checks
+        try:
+            async with pool.page() as page:
+                await page.goto(page_url, timeout=timeout)
+                return await _preflight(page, checks)
+        except Exception as e:
+            logger.debug(f"preflight: could not open {page_url}: {e}")
+            for check in checks:
+                check.page_url = page_url
+                check.error = check.error or f"Page not loaded: {e}"
+            return checks
+
+    pages = _plan_pages(actions, start_url)
+    results = await asyncio.gather(*(_check_page(page_url, checks) for page_url, checks in pages.items()))
+    return sorted((check for checks in results for check in checks), key=lambda check: check.index)
+
+
+async def preflight_plan(actions: List[Union[BaseAction, Dict]], start_url: str,
+                         timeout: int = BROWSER_PAGE_TIMEOUT) -> List[SelectorCheck]:
+    """
+    Preflights a whole plan: actions are grouped by the page they run on (the
+    start URL, then each NavigateAction URL) and every page is opened once from
+    the browser pool, concurrently. Pages reached by clicking are not followed,
+    so actions after such a click are checked against the page before it.
+    """
+    return await asyncio.wrap_future(get_browser_pool().submit(_preflight_plan(actions, start_url, timeout)))
+
+
+def preflight_plan_sync(actions: List[Union[BaseAction, Dict]], start_url: str,
+                        timeout: int = BROWSER_PAGE_TIMEOUT) -> List[SelectorCheck]:
+    """preflight_plan, blocking the calling thread."""
+    return get_browser_pool().submit(_preflight_plan(actions, start_url, timeout)).result()
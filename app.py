@@ -9,11 +9,30 @@ import argparse
 import json
 
 from loguru import logger
-from flask import Flask, request
+from flask import Flask, Response, g, request
 
 from .actions.actions import ClickAction, TypeAction, ScrollAction, WaitAction, ScreenshotAction
+from .actions.preflight import preflight_plan_sync
 from .classes import TaskSolution
-from .openai_service import infer_actions
+from .openai_service import solve_task, solve_tasks, janitor
+from .plan_cache import plan_cache
+from .prefetch import prefetch_stats
+from .site_index import site_index
+from .metrics import REQUESTS, REQUEST_SECONDS, registry
+from .web_utils import page_cache
+from .recording import traffic_recorder
+from .serving import BatchSlots, admission_controlled, admission_gate
+from .jobs import job_manager
+from .config import (
+    SERVE_MODE,
+    MAX_INFLIGHT_REQUESTS,
+    REQUEST_QUEUE_SIZE,
+    REQUEST_QUEUE_TIMEOUT,
+    RETRY_AFTER_SECONDS,
+    JOB_MAX_WAIT,
+    BATCH_MAX_TASKS,
+    RECORD_REQUESTS_PATH,
+)
 
 
 DEFAULT_SCREEN_WIDTH = 1920
@@ -23,6 +42,49 @@ DEFAULT_SCREEN_HEIGHT = 1080
 app = Flask(__name__)
 
 
+# Plan and page cache stats, read when /metrics is scraped
+CACHES = {"plan": plan_cache, "page": page_cache}
+
+
+def _cache_stat(stat):
+    return lambda: {(name,): cache.stats()[stat] for name, cache in CACHES.items()}
+
+
+def _cache_lookups():
+    lookups = {}
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        lookups[(name, "hit")] = stats["hits"]
+        lookups[(name, "miss")] = stats["misses"]
+    return lookups
+
+
+registry.callback("agent_cache_lookups_total", "Cache lookups, by cache and result.", "counter",
+                  ["cache", "result"], _cache_lookups)
+registry.callback("agent_cache_evictions_total", "Cache entries evicted or expired.", "counter",
+                  ["cache"], _cache_stat("evictions"))
+registry.callback("agent_cache_entries", "Entries held by each cache.", "gauge", ["cache"], _cache_stat("entries"))
+registry.callback("agent_cache_bytes", "Bytes held by each cache, as measured by its sizeof.", "gauge",
+                  ["cache"], _cache_stat("bytes"))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if "request_started" in g:
+        elapsed = time.perf_counter() - g.request_started
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+        if request.method == "POST":
+            traffic_recorder.record(endpoint, request.get_json(silent=True), response.status_code, elapsed)
+    return response
+
+
 @app.route("/")
 def hello():
     return "Hello, I am a web agent!"
@@ -60,47 +122,185 @@ def random_task_handler():
     return ts.nested_model_dump()
 
 
+def _task_error(task):
+    """Returns why a /solve_task payload is unusable, or None if it is complete."""
+    if task.get("id", None) is None:
+        return "Task ID not provided"
+    if task.get("prompt", None) is None:
+        return "Task prompt not provided"
+    if task.get("url", None) is None:
+        return "Page URL not provided"
+    if task.get("engine", None) not in (None, "auto", "assistants", "chat"):
+        return "Unknown inference engine"
+    return None
+
+
+def _solve_openai_task(task):
+    """Solves a validated task and returns (TaskSolution dump, plan cache hit)."""
+    task_id = task.get("id", None)
+    task_prompt = task.get("prompt", None)
+    page_url = task.get("url", None)
+    is_web_real = task.get("is_web_real", "False")
+    page_html = task.get("html", None)
+    engine = task.get("engine", None)  # "assistants", "chat" or "auto"; defaults to INFERENCE_ENGINE
+
+    actions, cache_hit = solve_task(task_prompt, page_url, page_html, engine)
+    ts = TaskSolution(task_id=task_id, actions=actions, web_agent_id="openai_web_agent")
+    return ts.nested_model_dump(), cache_hit
+
+
 @app.route("/solve_task", methods=["POST"])
+@admission_controlled
 def openai_task_handler():
     # return "Hello, I am a openai web agent!"
-    actions = []
+    task = request.json or {}
 
-    if True:
-        task = request.json or {}
+    logger.info(f"task {task}")
 
-        logger.info(f"task {task}")
-        
-        task_id = task.get("id", None)
-        if task_id is None:
-            return "Task ID not provided", 400
+    error = _task_error(task)
+    if error is not None:
+        return error, 400
 
-        task_prompt = task.get("prompt", None)
-        if task_prompt is None:
-            return "Task prompt not provided", 400
+    solution, cache_hit = _solve_openai_task(task)
+    return solution, {"X-Plan-Cache": "hit" if cache_hit else "miss"}
 
-        page_url = task.get("url", None)
-        if page_url is None:
-            return "Page URL not provided", 400
 
-        is_web_real = task.get("is_web_real", "False")
-        page_html = task.get("html", None)
+@app.route("/solve_task/batch", methods=["POST"])
+@admission_controlled
+def openai_batch_handler():
+    payload = request.json or {}
+    tasks = payload.get("tasks", None) if isinstance(payload, dict) else payload
+    if not isinstance(tasks, list) or not tasks:
+        return "Tasks not provided", 400
+    if len(tasks) > BATCH_MAX_TASKS:
+        return f"Too many tasks, at most {BATCH_MAX_TASKS} per batch", 400
 
-        actions = infer_actions(task_prompt, page_url, page_html)
-    else:
-        x = random.randint(0, DEFAULT_SCREEN_WIDTH - 1)  # Random x coordinate
-        y = random.randint(0, DEFAULT_SCREEN_HEIGHT - 1)  # Random y coordinate
-        actions.append(ClickAction(x=x, y=y))
+    logger.info(f"batch of {len(tasks)} tasks")
 
-    ts = TaskSolution(task_id=task_id, actions=actions, web_agent_id="openai_web_agent")
-    return ts.nested_model_dump()
+    for index, task in enumerate(tasks):
+        error = _task_error(task) if isinstance(task, dict) else "Invalid task format"
+        if error is not None:
+            return f"Task {index}: {error}", 400
+
+    solutions = []
+    cache_hits = 0
+    # The batch runs its tasks under this request's slot plus one gate slot per extra task
+    for task, (actions, cache_hit) in zip(tasks, solve_tasks(tasks, BatchSlots(admission_gate))):
+        ts = TaskSolution(task_id=task["id"], actions=actions, web_agent_id="openai_web_agent")
+        solutions.append(ts.nested_model_dump())
+        cache_hits += cache_hit
+    return solutions, {"X-Plan-Cache-Hits": str(cache_hits)}
+
+
+def _job_response(job):
+    response = job.to_dict()
+    if job.result is not None:
+        response["result"], response["cache_hit"] = job.result
+    return response
+
+
+@app.route("/solve_task/jobs", methods=["POST"])
+def openai_job_submit_handler():
+    task = request.json or {}
+
+    logger.info(f"job task {task}")
+
+    error = _task_error(task)
+    if error is not None:
+        return error, 400
+
+    job = job_manager.submit(_solve_openai_task, task)
+    if job is None:
+        return "Job queue full, retry later", 503, {"Retry-After": str(RETRY_AFTER_SECONDS)}
+    return _job_response(job), 202, {"Location": f"/solve_task/jobs/{job.id}"}
+
+
+@app.route("/solve_task/jobs/<job_id>", methods=["GET"])
+def openai_job_status_handler(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return "Job not found", 404
+
+    # ?wait=N long-polls for up to N seconds until the job finishes
+    wait = request.args.get("wait", 0, type=float)
+    if wait > 0:
+        job.done.wait(timeout=min(wait, JOB_MAX_WAIT))
+    return _job_response(job)
+
+
+@app.route("/preflight", methods=["POST"])
+@admission_controlled
+def preflight_handler():
+    # Resolves the selectors of a plan ({"url", "actions"}) on its pages before it is executed
+    payload = request.json or {}
+    if payload.get("url", None) is None:
+        return "Page URL not provided", 400
+    if not isinstance(payload.get("actions", None), list):
+        return "Actions not provided", 400
+
+    checks = preflight_plan_sync(payload["actions"], payload["url"])
+    failing = sorted({check.index for check in checks if not check.ok})
+    return {"checks": [check.model_dump() for check in checks], "failing": failing}
+
+
+@app.route("/plan_cache", methods=["GET"])
+def plan_cache_stats_handler():
+    return plan_cache.stats()
+
+
+@app.route("/plan_cache", methods=["DELETE"])
+def plan_cache_invalidate_handler():
+    # An empty body drops every plan, otherwise only those matching prompt and/or url
+    selector = request.get_json(silent=True) or {}
+    removed = plan_cache.invalidate(selector.get("prompt"), selector.get("url"))
+    return {"removed": removed}
+
+
+@app.route("/prefetch", methods=["GET"])
+def prefetch_stats_handler():
+    return prefetch_stats.stats()
+
+
+@app.route("/site_index", methods=["GET"])
+def site_index_stats_handler():
+    return site_index.stats()
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_handler():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Autoppia Web Agent")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to run the service on")
     parser.add_argument("--port", type=int, default=9000, help="Port to run the service on")
     parser.add_argument("--debug", type=bool, default=False, help="Debug flag")
+    parser.add_argument("--mode", type=str, choices=["threaded", "single"], default=SERVE_MODE,
+                        help="Serve requests concurrently or one at a time")
+    parser.add_argument("--max-inflight", type=int, default=MAX_INFLIGHT_REQUESTS,
+                        help="Maximum number of tasks solved at the same time")
+    parser.add_argument("--queue-size", type=int, default=REQUEST_QUEUE_SIZE,
+                        help="Maximum number of tasks waiting for a free slot")
+    parser.add_argument("--queue-timeout", type=float, default=REQUEST_QUEUE_TIMEOUT,
+                        help="Seconds a task may wait for a slot before it is rejected")
+    parser.add_argument("--retry-after", type=int, default=RETRY_AFTER_SECONDS,
+                        help="Retry-After seconds sent with 503 responses")
+    parser.add_argument("--record", type=str, nargs="?", const=str(RECORD_REQUESTS_PATH), default=None,
+                        help="Append task requests to a JSON-lines file for offline replay")
     args = parser.parse_args()
 
-    # Run Flask so it only processes one request at a time
-    # by disabling threading.
-    app.run(host=args.host, port=args.port, debug=args.debug, use_reloader=False, threaded=False)
+    if args.record is not None:
+        traffic_recorder.configure(True, args.record)
+
+    # Resume deleting resources left behind by a previous run
+    janitor.start()
+
+    if args.mode == "single":
+        # Run Flask so it only processes one request at a time
+        # by disabling threading.
+        app.run(host=args.host, port=args.port, debug=args.debug, use_reloader=False, threaded=False)
+    else:
+        # Every request gets a thread; the admission gate bounds how many
+        # tasks actually run and sheds the excess with 503 + Retry-After.
+        admission_gate.configure(args.max_inflight, args.queue_size, args.queue_timeout, args.retry_after)
+        app.run(host=args.host, port=args.port, debug=args.debug, use_reloader=False, threaded=True)
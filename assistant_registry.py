@@ -0,0 +1,99 @@
+# Description: Process-level registry of reusable OpenAI assistants.
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import openai
+from loguru import logger
+
+from .config import ASSISTANT_REGISTRY_PATH
+
+
+def _assistant_key(model: str, instructions: str, tools: List[Dict]) -> str:
+    """Returns a stable key for an assistant definition."""
+    definition = json.dumps({"model": model, "instructions": instructions, "tools": tools}, sort_keys=True)
+    return hashlib.sha256(definition.encode("utf-8")).hexdigest()[:32]
+
+
+class AssistantRegistry:
+    """
+    Maps assistant definitions to the ids of assistants already created for them.
+
+    Ids are persisted to `path` so a restarted process reuses the assistants it
+    created before. A persisted id is checked against the API once per process
+    and the assistant is recreated if it no longer exists.
+    """
+
+    def __init__(self, path: Path = ASSISTANT_REGISTRY_PATH):
+        self.path = Path(path)
+        self._ids: Dict[str, str] = {}
+        self._verified = set()
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._ids = json.load(f)
+        except FileNotFoundError:
+            self._ids = {}
+        except Exception as e:
+            logger.warning(f"assistant registry: ignoring unreadable {self.path}: {e}")
+            self._ids = {}
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._ids, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"assistant registry: failed to save {self.path}: {e}")
+
+    @staticmethod
+    def _exists(client: openai.OpenAI, assistant_id: str) -> bool:
+        try:
+            client.beta.assistants.retrieve(assistant_id)
+            return True
+        except openai.NotFoundError:
+            return False
+
+    def get_assistant_id(self, client: openai.OpenAI, name: str, model: str, instructions: str, tools: List[Dict]) -> str:
+        """Returns the id of an assistant matching the definition, creating it on first use."""
+        key = _assistant_key(model, instructions, tools)
+        with self._lock:
+            if key in self._verified:
+                return self._ids[key]
+
+            self._load()
+            assistant_id: Optional[str] = self._ids.get(key)
+            if assistant_id is not None and not self._exists(client, assistant_id):
+                logger.debug(f"assistant registry: assistant {assistant_id} is gone, recreating")
+                assistant_id = None
+
+            if assistant_id is None:
+                logger.debug("creating assistant...")
+                assistant = client.beta.assistants.create(
+                    name=name,
+                    instructions=instructions,
+                    model=model,
+                    tools=tools,
+                    metadata={"registry_key": key},
+                )
+                assistant_id = assistant.id
+                self._ids[key] = assistant_id
+                self._save()
+
+            self._verified.add(key)
+            return assistant_id
+
+
+assistant_registry = AssistantRegistry()
@@ -0,0 +1,134 @@
+# Description: Benchmarks turning LLM action lists into action models: BaseAction.create_action
+# per entry against actions.parsing.parse_actions over the whole list.
+#
+# Usage (from the directory containing the package):
+#   python -m <package>.benchmarks.action_parsing --sizes 10,1000,5000 --invalid 0.05
+
+import argparse
+import copy
+import gc
+import importlib
+import logging
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+
+PACKAGE = __package__.rpartition(".")[0]
+
+WORDS = ["Submit", "Search", "Login", "Cart", "Checkout", "Next", "Email", "Password", "Apply", "Filter"]
+
+
+def _selector(rng: random.Random) -> Dict[str, Any]:
+    kind = rng.choice(["attributeValueSelector", "tagContainsSelector", "xpathSelector"])
+    if kind == "attributeValueSelector":
+        return {"type": kind, "attribute": rng.choice(["id", "class", "name"]), "value": rng.choice(WORDS).lower()}
+    if kind == "xpathSelector":
+        return {"type": kind, "value": f"//button[text()='{rng.choice(WORDS)}']"}
+    return {"type": kind, "value": rng.choice(WORDS)}
+
+
+def generate_plan(size: int, invalid: float, aliases: float, seed: int) -> List[Dict[str, Any]]:
+    """
+    A plan of `size` actions shaped like LLM output. An `aliases` fraction use
+    the short type names of ACTION_CLASS_MAP and an `invalid` fraction are
+    broken (unknown type or missing a required field).
+    """
+    rng = random.Random(seed)
+    makers = [
+        ("ClickAction", "click", lambda: {"selector": _selector(rng)}),
+        ("TypeAction", "type", lambda: {"selector": _selector(rng), "text": rng.choice(WORDS)}),
+        ("NavigateAction", "navigate", lambda: {"url": f"http://localhost/{rng.choice(WORDS).lower()}"}),
+        ("HoverAction", "hover", lambda: {"selector": _selector(rng)}),
+        ("ScrollAction", "scroll", lambda: {"down": True}),
+        ("WaitAction", "wait", lambda: {"time_seconds": 1.0}),
+        ("SelectDropDownOption", "selectdropdownoption", lambda: {"selector": _selector(rng), "text": rng.choice(WORDS)}),
+    ]
+    plan = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < invalid / 2:
+            plan.append({"type": "TeleportAction", "selector": _selector(rng)})
+        elif roll < invalid:
+            plan.append({"type": "TypeAction", "selector": _selector(rng)})
+        else:
+            name, alias, fields = rng.choice(makers)
+            plan.append({"type": alias if rng.random() < aliases else name, **fields()})
+    return plan
+
+
+def create_action_path(base, plan: List[Dict[str, Any]]) -> List[Any]:
+    actions = []
+    for data in plan:
+        try:
+            action = base.BaseAction.create_action(data)
+        except ValueError:
+            action = None
+        if action is not None:
+            actions.append(action)
+    return actions
+
+
+def agreed_entries(base, parsing, plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The entries of `plan` that both paths accept, or both reject. create_action
+    rejects some spellings parse_actions repairs, so timing the whole plan
+    would compare different amounts of work.
+    """
+    def accepted_by_create_action(data):
+        return bool(create_action_path(base, [copy.deepcopy(data)]))
+
+    def accepted_by_parse_actions(data):
+        return parsing.parse_action(copy.deepcopy(data)) is not None
+
+    return [data for data in plan if accepted_by_create_action(data) == accepted_by_parse_actions(data)]
+
+
+def measure(fn: Callable[[List[Dict[str, Any]]], List[Any]], plan: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    timings = []
+    produced = 0
+    for _ in range(repeat):
+        # Both paths get a fresh copy since create_action rewrites its input
+        data = copy.deepcopy(plan)
+        gc.collect()
+        started = time.perf_counter()
+        produced = len(fn(data))
+        timings.append(time.perf_counter() - started)
+    return {"median": statistics.median(timings), "min": min(timings), "actions": produced}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark create_action against parse_actions on generated plans")
+    parser.add_argument("--sizes", default="10,1000,5000", help="Comma-separated plan sizes")
+    parser.add_argument("--invalid", type=float, default=0.05, help="Fraction of broken actions")
+    parser.add_argument("--aliases", type=float, default=0.3, help="Fraction of actions using short type names")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per path and size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base = importlib.import_module(f"{PACKAGE}.actions.base")
+    parsing = importlib.import_module(f"{PACKAGE}.actions.parsing")
+    logging.disable(logging.CRITICAL)  # create_action logs every failure
+    parsing.logger.disable(parsing.__name__)
+
+    paths = {
+        "create_action": lambda plan: create_action_path(base, plan),
+        "parse_actions": parsing.parse_actions,
+    }
+    # Both paths return the same actions for the timed plans, so per action compares like with like
+    print(f"{'size':>7} {'path':<14} {'median':>10} {'min':>10} {'per action':>11} {'actions':>8}")
+    for size in (int(size) for size in args.sizes.split(",") if size.strip()):
+        plan = agreed_entries(base, parsing, generate_plan(size, args.invalid, args.aliases, args.seed))
+        if len(plan) < size:
+            print(f"{size:>7} {'skipped':<14} {size - len(plan):>8} entries only one path accepts")
+        results = {name: measure(fn, plan, args.repeat) for name, fn in paths.items()}
+        for name, result in results.items():
+            print(f"{size:>7} {name:<14} {result['median'] * 1000:>8.2f}ms {result['min'] * 1000:>8.2f}ms "
+                  f"{result['median'] / max(1, result['actions']) * 1e6:>9.2f}us {result['actions']:>8}")
+        speedup = results["create_action"]["median"] / results["parse_actions"]["median"]
+        print(f"{size:>7} {'speedup':<14} {speedup:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Description: Generated demo sites served locally for the replay benchmark.
+
+import functools
+import random
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><title>{title}</title><style>.hidden {{ display: none; }}</style><script>window.page = "{name}";</script></head>
+<body>
+<nav>{nav}</nav>
+<main>
+<h1>{title}</h1>
+{body}
+</main>
+<footer><p>Fixture site, page {name}</p></footer>
+</body>
+</html>
+"""
+
+PAGE_KINDS = ["products", "cart", "login", "register", "search", "contact", "about", "orders", "account", "help"]
+
+
+def _page_body(kind: str, rng: random.Random, paragraphs: int) -> str:
+    parts = []
+    for index in range(paragraphs):
+        words = " ".join(rng.choice(["lorem", "ipsum", "dolor", "sit", "amet", "shop", "item", "price", "offer"]) for _ in range(30))
+        parts.append(f"<p>{words}</p>")
+    if kind in ("login", "register", "contact", "search", "account"):
+        fields = {"login": ["email", "password"], "register": ["name", "email", "password", "confirm"],
+                  "contact": ["name", "email", "message"], "search": ["query"], "account": ["name", "address", "phone"]}[kind]
+        inputs = "".join(f'<label for="{field}">{field.title()}</label><input id="{field}" name="{field}" placeholder="{field.title()}">' for field in fields)
+        parts.append(f'<form id="{kind}-form" action="/{kind}.html">{inputs}<select name="country"><option>Spain</option><option>France</option></select><button type="submit">Submit</button></form>')
+    if kind == "products":
+        parts.append("<ul>" + "".join(
+            f'<li><a href="/product-{index}.html">Product {index}</a><button class="add" data-testid="add-{index}">Add to cart</button></li>'
+            for index in range(6)
+        ) + "</ul>")
+    parts.append('<div class="hidden"><p>Hidden promo</p><input type="hidden" name="csrf" value="token"></div>')
+    return "\n".join(parts)
+
+
+def build_fixture_site(root: Path, pages: int = 8, paragraphs: int = 5, seed: int = 0) -> List[str]:
+    """Writes a small shop-like site of index.html plus `pages` linked pages to root; returns the page paths."""
+    rng = random.Random(seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    kinds = [PAGE_KINDS[index % len(PAGE_KINDS)] for index in range(pages)]
+    names = [kind if index < len(PAGE_KINDS) else f"{kind}-{index}" for index, kind in enumerate(kinds)]
+    nav = " ".join(f'<a href="/{name}.html">{name.replace("-", " ").title()}</a>' for name in names)
+
+    paths = ["/index.html"]
+    (root / "index.html").write_text(PAGE_TEMPLATE.format(
+        title="Fixture Shop", name="index", nav=nav, body=_page_body("index", rng, paragraphs)), encoding="utf-8")
+    for kind, name in zip(kinds, names):
+        (root / f"{name}.html").write_text(PAGE_TEMPLATE.format(
+            title=name.replace("-", " ").title(), name=name, nav=nav, body=_page_body(kind, rng, paragraphs)), encoding="utf-8")
+        paths.append(f"/{name}.html")
+    for index in range(6):
+        (root / f"product-{index}.html").write_text(PAGE_TEMPLATE.format(
+            title=f"Product {index}", name=f"product-{index}", nav=nav,
+            body=_page_body("product", rng, paragraphs) + f'<button id="buy-{index}">Buy now</button>'), encoding="utf-8")
+    return paths
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """Serves a directory of fixture pages over HTTP on a background thread."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving and returns the site origin."""
+        handler = functools.partial(_QuietHandler, directory=str(self.root))
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fixture-site", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+SYNTHETIC_PROMPTS = [
+    "Log in with email test@example.com and password secret",
+    "Register a new account named Alice",
+    "Search for red shoes",
+    "Add product 2 to the cart",
+    "Send a message through the contact form",
+    "Update the phone number in my account",
+]
+
+
+def synthetic_tasks(origin: str, count: int, root: Optional[Path] = None, with_html: bool = False) -> List[Dict]:
+    """Builds `count` tasks on the fixture site; with_html sends the portal HTML along like the validator does."""
+    portal_html = (Path(root) / "index.html").read_text(encoding="utf-8") if with_html and root else None
+    tasks = []
+    for index in range(count):
+        task = {"id": f"synthetic-{index}", "prompt": SYNTHETIC_PROMPTS[index % len(SYNTHETIC_PROMPTS)],
+                "url": f"{origin}/index.html"}
+        if portal_html is not None:
+            task["html"] = portal_html
+        tasks.append(task)
+    return tasks
@@ -0,0 +1,331 @@
+# Description: Microbenchmarks for the CPU-bound HTML helpers in web_utils, run on synthetic DOMs.
+#
+# Usage (from the directory containing the package):
+#   python -m <package>.benchmarks.html_processing --sizes 10k,100k,1m --spa 4m --save results.json
+#   python -m <package>.benchmarks.html_processing --compare results.json --threshold 0.15
+
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+PACKAGE = __package__.rpartition(".")[0]
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "shop", "item", "price", "offer", "cart", "account", "search"]
+HIDDEN_MARKERS = ['style="display: none"', 'style="visibility: hidden"', "hidden"]
+
+
+def parse_size(value: str) -> int:
+    """Parses sizes like 512, 100k or 4m into bytes."""
+    value = value.strip().lower()
+    multiplier = {"k": 1024, "m": 1024 * 1024}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):g}m"
+    if size >= 1024:
+        return f"{size / 1024:g}k"
+    return str(size)
+
+
+class DomGenerator:
+    """
+    Builds synthetic pages of roughly `size` bytes out of repeated sections
+    nested `depth` levels deep. A `hidden` fraction of the elements carry one
+    of the markers clean_html drops; `spa` pages look like client-rendered
+    dumps: inline state blobs, data attributes, inline SVG icons and handlers.
+    """
+
+    def __init__(self, size: int, depth: int = 8, hidden: float = 0.1, spa: bool = False, seed: int = 0):
+        self.size = size
+        self.depth = max(1, depth)
+        self.hidden = hidden
+        self.spa = spa
+        self.rng = random.Random(seed)
+        self._ids = 0
+
+    def _text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+    def _attrs(self, tag: str) -> str:
+        self._ids += 1
+        attrs = f' id="{tag}-{self._ids}" class="c{self._ids % 17} {tag}-item"'
+        if self.spa:
+            attrs += f' data-reactid=".0.{self._ids}" data-testid="{tag}-{self._ids}"'
+        if self.rng.random() < self.hidden:
+            attrs += " " + self.rng.choice(HIDDEN_MARKERS)
+        return attrs
+
+    def _leaf(self) -> str:
+        kind = self.rng.randrange(6)
+        if kind == 0:
+            return f"<p{self._attrs('p')}>{self._text(25)}</p>"
+        if kind == 1:
+            return f'<a{self._attrs("a")} href="/page-{self._ids}.html">{self._text(3)}</a>'
+        if kind == 2:
+            icon = '<svg viewBox="0 0 24 24"><path d="M12 2L2 7l10 5 10-5-10-5z"/></svg>' if self.spa else ""
+            handler = ' onclick="window.__app.dispatch(this)"' if self.spa else ""
+            return f"<button{self._attrs('button')}{handler}>{icon}{self._text(2)}</button>"
+        if kind == 3:
+            fields = "".join(
+                f'<label for="f{self._ids}-{n}">{self._text(1)}</label>'
+                f'<input{self._attrs("input")} name="field{n}" placeholder="{self._text(1)}"/>'
+                for n in range(3)
+            )
+            return (f'<form{self._attrs("form")} action="/submit">{fields}'
+                    f'<select name="s{self._ids}"><option>one</option><option>two</option></select>'
+                    f'<input type="submit" value="Send"/></form>')
+        if kind == 4:
+            return "<ul>" + "".join(f"<li{self._attrs('li')}>{self._text(4)}</li>" for _ in range(4)) + "</ul>"
+        return f"<span{self._attrs('span')}>{self._text(6)}</span><!-- {self._text(4)} -->"
+
+    def _section(self, level: int = 0) -> str:
+        if level == self.depth:
+            return self._leaf()
+        children = "".join(self._section(level + 1) for _ in range(1 if level < self.depth - 1 else 3))
+        return f"<div{self._attrs('div')}>{children}</div>"
+
+    def _head(self) -> str:
+        head = "<title>Synthetic page</title><style>.hidden { display: none; }</style>"
+        if self.spa:
+            head += '<link rel="stylesheet" href="/static/app.css"/><meta name="viewport" content="width=device-width"/>'
+        return head
+
+    def _state_blob(self, size: int) -> str:
+        records = []
+        length = 0
+        while length < size:
+            record = json.dumps({"id": len(records), "title": self._text(5), "tags": [self._text(1) for _ in range(3)]})
+            records.append(record)
+            length += len(record) + 1
+        return "<script>window.__INITIAL_STATE__ = [" + ",".join(records) + "];</script>"
+
+    def build(self) -> str:
+        """Returns one page of roughly `size` bytes."""
+        sections: List[str] = []
+        length = 0
+        # SPA dumps carry a good share of their weight in inline state
+        body_size = self.size // 2 if self.spa else self.size
+        while length < body_size:
+            section = self._section()
+            sections.append(section)
+            length += len(section)
+        scripts = self._state_blob(self.size - length) if self.spa else "<script>window.page = 1;</script>"
+        return (f"<!DOCTYPE html>\n<html><head>{self._head()}</head>\n"
+                f"<body><div id=\"root\">{''.join(sections)}</div>{scripts}</body></html>")
+
+    def mutate(self, html: str, changes: int = 3) -> str:
+        """Returns a later state of the page: some paragraphs rewritten and a notice appended."""
+        for _ in range(changes):
+            start = html.find("<p ", self.rng.randrange(max(1, len(html))))
+            if start < 0:
+                start = html.find("<p ")
+            if start < 0:
+                break
+            open_end = html.find(">", start) + 1
+            close = html.find("</p>", open_end)
+            html = html[:open_end] + self._text(25) + html[close:]
+        notice = f'<div class="notice" role="alert">{self._text(8)}</div>'
+        return html.replace("</body>", notice + "</body>", 1)
+
+
+def build_case(size: int, depth: int, hidden: float, spa: bool, states: int, seed: int) -> Dict[str, Any]:
+    generator = DomGenerator(size, depth, hidden, spa, seed)
+    pages = [generator.build()]
+    for _ in range(states - 1):
+        pages.append(generator.mutate(pages[-1]))
+    name = f"{'spa' if spa else 'dom'}-{format_size(size)}-d{depth}-h{hidden:g}"
+    return {"name": name, "pages": pages}
+
+
+def _output_size(result: Any) -> int:
+    if isinstance(result, str):
+        return len(result)
+    if isinstance(result, list):
+        return sum(len(item) for item in result)
+    return len(json.dumps(result))
+
+
+def measure(fn: Callable[[Any], Any], argument: Any, repeat: int) -> Dict[str, Any]:
+    """Times `repeat` calls, then one more under tracemalloc for the peak allocation."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(argument)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn(argument)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_s": round(statistics.median(timings), 6),
+        "min_s": round(min(timings), 6),
+        "peak_bytes": peak,
+        "output_bytes": _output_size(result),
+    }
+
+
+def benchmarks(web_utils, xmldiff_max_bytes: int) -> List[Dict[str, Any]]:
+    """
+    The functions under test. Each takes the case and returns the argument it is
+    timed with; the diff functions see cleaned snapshots, as they do in the agent.
+    """
+    return [
+        {"function": "clean_html", "fn": web_utils.clean_html, "input": lambda case: case["pages"][0]},
+        {"function": "clean_html(prettify=False)", "fn": lambda html: web_utils.clean_html(html, prettify=False),
+         "input": lambda case: case["pages"][0]},
+        {"function": "_clean_html_tree", "fn": web_utils._clean_html_tree, "input": lambda case: case["pages"][0]},
+        {"function": "clean_html_stream", "fn": web_utils.clean_html_stream, "input": lambda case: case["pages"][0]},
+        {"function": "_clean_html_multipass", "fn": web_utils._clean_html_multipass, "input": lambda case: case["pages"][0]},
+        {"function": "detect_interactive_elements", "fn": web_utils.detect_interactive_elements,
+         "input": lambda case: case["cleaned"][0]},
+        {"function": "generate_html_differences", "fn": web_utils.generate_html_differences,
+         "input": lambda case: case["cleaned"]},
+        {"function": "generate_html_differences_with_xmldiff", "fn": web_utils.generate_html_differences_with_xmldiff,
+         "input": lambda case: case["cleaned"], "max_bytes": xmldiff_max_bytes},
+        {"function": "generate_html_differences_with_dom_diff", "fn": web_utils.generate_html_differences_with_dom_diff,
+         "input": lambda case: case["cleaned"]},
+    ]
+
+
+def check_parity(web_utils, case: Dict[str, Any]) -> bool:
+    """
+    The tree cleaner must reproduce the reference multi-pass cleaner on every
+    state of the page, and the streaming cleaner must match the tree cleaner.
+    """
+    for index, page in enumerate(case["pages"]):
+        tree = web_utils._clean_html_tree(page, parser="html.parser")
+        pairs = [
+            ("_clean_html_tree", tree, web_utils._clean_html_multipass(page)),
+            ("clean_html_stream", web_utils.clean_html_stream(page), tree),
+            ("clean_html_stream(prettify=False)", web_utils.clean_html_stream(page, prettify=False),
+             web_utils._clean_html_tree(page, parser="html.parser", prettify=False)),
+        ]
+        for name, output, expected in pairs:
+            if output != expected:
+                print(f"  parity mismatch: {name} on {case['name']} state {index}")
+                return False
+    return True
+
+
+def run(cases: List[Dict[str, Any]], repeat: int, only: Optional[List[str]], xmldiff_max_bytes: int, parity: bool) -> Dict[str, Any]:
+    web_utils = importlib.import_module(f"{PACKAGE}.web_utils")
+    results = []
+    parity_failures = []
+    for case in cases:
+        case["cleaned"] = [web_utils.clean_html(page) for page in case["pages"]]
+        input_bytes = len(case["pages"][0])
+        print(f"{case['name']}: {input_bytes} bytes, {len(case['pages'])} states")
+        if parity and not check_parity(web_utils, case):
+            parity_failures.append(case["name"])
+        for bench in benchmarks(web_utils, xmldiff_max_bytes):
+            if only and bench["function"] not in only:
+                continue
+            if input_bytes > bench.get("max_bytes", input_bytes):
+                print(f"  {bench['function']:<42} skipped (over {format_size(bench['max_bytes'])})")
+                continue
+            row = {"function": bench["function"], "case": case["name"], "input_bytes": input_bytes}
+            row.update(measure(bench["fn"], bench["input"](case), repeat))
+            results.append(row)
+            print(f"  {row['function']:<42} {row['median_s'] * 1000:10.2f} ms  peak {row['peak_bytes'] / 1e6:8.2f} MB"
+                  f"  out {row['output_bytes']}")
+    return {"results": results, "parity_failures": parity_failures}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent,
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Matches results to the baseline by (function, case) and returns the rows whose
+    median time or peak memory grew by more than `threshold` (a fraction).
+    """
+    previous = {(row["function"], row["case"]): row for row in baseline.get("results", [])}
+    regressions = []
+    print(f"\ncompared with {baseline.get('meta', {}).get('revision') or 'baseline'}:")
+    for row in results:
+        before = previous.get((row["function"], row["case"]))
+        if before is None:
+            continue
+        changes = {}
+        for metric in ("median_s", "peak_bytes"):
+            if before[metric]:
+                changes[metric] = row[metric] / before[metric] - 1
+        regressed = [metric for metric, change in changes.items() if change > threshold]
+        print(f"  {row['function']:<42} {row['case']:<22} time {changes.get('median_s', 0):+7.1%}"
+              f"  memory {changes.get('peak_bytes', 0):+7.1%}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(dict(row, regressed=regressed, baseline=before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the web_utils HTML processing functions on synthetic pages")
+    parser.add_argument("--sizes", default="10k,100k,1m", help="Comma-separated page sizes (bytes, k or m suffix)")
+    parser.add_argument("--spa", default="2m", help="Comma-separated sizes of SPA-style dumps to add, or '' for none")
+    parser.add_argument("--depth", type=int, default=8, help="Nesting depth of each generated section")
+    parser.add_argument("--hidden", type=float, default=0.1, help="Fraction of elements marked hidden")
+    parser.add_argument("--states", type=int, default=3, help="Page states fed to the diff functions")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per function and case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default="", help="Comma-separated function names to run")
+    parser.add_argument("--xmldiff-max-bytes", default="200k", help="Skip xmldiff on pages larger than this")
+    parser.add_argument("--check-parity", action="store_true", help="Check clean_html against the multi-pass reference")
+    parser.add_argument("--save", type=Path, default=None, help="Write the results as JSON")
+    parser.add_argument("--compare", type=Path, default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    cases = [build_case(parse_size(size), args.depth, args.hidden, False, args.states, args.seed)
+             for size in args.sizes.split(",") if size.strip()]
+    cases += [build_case(parse_size(size), args.depth, args.hidden, True, args.states, args.seed)
+              for size in args.spa.split(",") if size.strip()]
+    only = [name.strip() for name in args.only.split(",") if name.strip()]
+
+    report = run(cases, args.repeat, only, parse_size(args.xmldiff_max_bytes), args.check_parity)
+    report["meta"] = {
+        "revision": _git_revision(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "html_parser": os.getenv("HTML_PARSER", "html.parser"),
+        "config": {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()},
+    }
+
+    if args.save is not None:
+        args.save.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nsaved {len(report['results'])} results to {args.save}")
+
+    failed = bool(report["parity_failures"])
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(report["results"], baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Description: Offline end-to-end benchmark: replays recorded tasks against the Flask app
+# with a stubbed OpenAI API and locally served fixture sites.
+#
+# Usage (from the directory containing the package):
+#   python -m <package>.benchmarks.replay --synthetic 40 --concurrency 4 --llm-latency 0.5
+# Live traffic is recorded with `python -m <package>.app --record` (or RECORD_REQUESTS=true).
+
+import argparse
+import importlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from .fixture_sites import FixtureServer, build_fixture_site, synthetic_tasks
+from .stub_openai import StubModel, StubOpenAI
+
+
+PACKAGE = __package__.rpartition(".")[0]
+DEFAULT_REQUESTS_PATH = Path(__file__).resolve().parent.parent / "requests.jsonl"
+
+# Recorded job submissions are replayed synchronously
+REPLAYED_ENDPOINTS = {"/solve_task": "/solve_task", "/solve_task/batch": "/solve_task/batch", "/solve_task/jobs": "/solve_task"}
+
+
+def load_requests(path: Path) -> Tuple[List[Tuple[str, Any]], int]:
+    """
+    Reads (endpoint, payload) pairs from a JSON-lines file. Lines are either
+    recorded requests ({"endpoint", "payload", ...}) or bare tasks
+    ({"id", "prompt", "url", ...}); anything else is skipped and counted.
+    """
+    requests, skipped = [], 0
+    if not path.exists():
+        return requests, skipped
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if isinstance(record, dict) and record.get("endpoint") in REPLAYED_ENDPOINTS and "payload" in record:
+                requests.append((REPLAYED_ENDPOINTS[record["endpoint"]], record["payload"]))
+            elif isinstance(record, dict) and "prompt" in record and "url" in record:
+                requests.append(("/solve_task", record))
+            else:
+                skipped += 1
+    return requests, skipped
+
+
+def _rewrite_task(task: Dict[str, Any], origin: str) -> Dict[str, Any]:
+    parts = urlsplit(task.get("url") or "")
+    fixture = urlsplit(origin)
+    return dict(task, url=urlunsplit((fixture.scheme, fixture.netloc, parts.path or "/", parts.query, "")))
+
+
+def rewrite_origin(endpoint: str, payload: Any, origin: str) -> Any:
+    """Points the task URLs of a payload at the fixture server, keeping their paths."""
+    if endpoint == "/solve_task/batch":
+        tasks = payload.get("tasks", []) if isinstance(payload, dict) else payload
+        return {"tasks": [_rewrite_task(task, origin) for task in tasks]}
+    return _rewrite_task(payload, origin)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _tasks_with_actions(response) -> int:
+    """How many task solutions in a 200 reply have at least one action."""
+    if response.status_code != 200:
+        return 0
+    solutions = response.get_json(silent=True)
+    if isinstance(solutions, dict):
+        solutions = [solutions]
+    if not isinstance(solutions, list):
+        return 0
+    return sum(1 for solution in solutions if isinstance(solution, dict) and solution.get("actions"))
+
+
+def replay(app, requests: List[Tuple[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    """Posts every request to the app from `concurrency` threads and returns one result per request."""
+    local = threading.local()
+
+    def _post(item):
+        endpoint, payload = item
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        started = time.perf_counter()
+        response = local.client.post(endpoint, json=payload)
+        seconds = time.perf_counter() - started
+        tasks = len(payload["tasks"]) if endpoint == "/solve_task/batch" else 1
+        return {"endpoint": endpoint, "status": response.status_code, "tasks": tasks,
+                "with_actions": _tasks_with_actions(response), "seconds": seconds}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(_post, requests))
+
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float, stub: StubOpenAI) -> Dict[str, Any]:
+    latencies = [result["seconds"] for result in results]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    # A task only counts as solved when the agent returned actions for it; a
+    # 200 with an empty action list (e.g. after a failed model turn) does not
+    solved = sum(result["with_actions"] for result in results)
+    empty = sum(result["tasks"] - result["with_actions"] for result in results if result["status"] == 200)
+    turns = stub.llm_turns()
+    return {
+        "requests": len(results),
+        "tasks_solved": solved,
+        "tasks_without_actions": empty,
+        "statuses": statuses,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(results) / wall_seconds, 3) if wall_seconds else 0.0,
+        "throughput_tasks_per_s": round(solved / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 4),
+        "latency_p95": round(percentile(latencies, 95), 4),
+        "latency_p99": round(percentile(latencies, 99), 4),
+        "latency_max": round(max(latencies), 4) if latencies else 0.0,
+        "llm_turns": turns,
+        "llm_turns_per_task": round(turns / solved, 3) if solved else 0.0,
+        "stub_calls": dict(sorted(stub.calls.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded tasks offline against the web agent")
+    parser.add_argument("--requests", type=Path, default=DEFAULT_REQUESTS_PATH, help="JSON-lines file of recorded tasks")
+    parser.add_argument("--synthetic", type=int, default=20, help="Tasks generated on the fixture site when none are recorded")
+    parser.add_argument("--with-html", action="store_true", help="Send the portal HTML with synthetic tasks")
+    parser.add_argument("--sites", type=Path, default=None, help="Directory of fixture pages to serve instead of a generated site")
+    parser.add_argument("--fixture-pages", type=int, default=8, help="Pages of the generated fixture site")
+    parser.add_argument("--keep-origin", action="store_true", help="Do not point recorded task URLs at the fixture server")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the request list this many times")
+    parser.add_argument("--engine", choices=["auto", "assistants", "chat"], default="assistants")
+    parser.add_argument("--run-mode", choices=["stream", "poll"], default="stream")
+    parser.add_argument("--page-format", choices=["html", "outline"], default="html")
+    parser.add_argument("--no-stream-replies", action="store_true", help="Wait for whole replies before fetching pages")
+    parser.add_argument("--plan-cache", action="store_true", help="Leave the plan cache on (repeated tasks become cache hits)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per model turn")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="Seconds per other API call")
+    parser.add_argument("--index-latency", type=float, default=0.2, help="Seconds a file batch takes to index")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency variation, as a fraction")
+    parser.add_argument("--fanout", type=int, default=2, help="URLs the stub model asks for per discovery turn")
+    parser.add_argument("--discovery-rounds", type=int, default=1, help="Discovery turns that ask for more URLs")
+    parser.add_argument("--output", type=Path, default=None, help="Write the summary as JSON")
+    args = parser.parse_args()
+
+    stub = StubOpenAI(args.llm_latency, args.api_latency, args.index_latency, args.jitter,
+                      StubModel(args.fanout, args.discovery_rounds))
+    base_url = stub.start()
+
+    state_dir = Path(tempfile.mkdtemp(prefix="replay-state-"))
+    site_root = args.sites
+    if site_root is None:
+        site_root = state_dir / "site"
+        build_fixture_site(site_root, pages=args.fixture_pages)
+    fixtures = FixtureServer(site_root)
+    origin = fixtures.start()
+
+    # The app reads its configuration at import time
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": base_url,
+        "LLM_PROVIDER": "openai",
+        "AGENT_STATE_DIR": str(state_dir),
+        "INFERENCE_ENGINE": args.engine,
+        "RUN_MODE": args.run_mode,
+        "PAGE_FORMAT": args.page_format,
+        "STREAM_REPLIES": "false" if args.no_stream_replies else "true",
+        "PLAN_CACHE_ENABLED": "true" if args.plan_cache else "false",
+        "RECORD_REQUESTS": "false",
+    })
+    app = importlib.import_module(f"{PACKAGE}.app").app
+
+    requests, skipped = load_requests(args.requests)
+    if not requests:
+        requests = [("/solve_task", task) for task in synthetic_tasks(origin, args.synthetic, site_root, args.with_html)]
+    elif not args.keep_origin:
+        requests = [(endpoint, rewrite_origin(endpoint, payload, origin)) for endpoint, payload in requests]
+    requests = requests * args.repeat
+    print(f"replaying {len(requests)} requests ({skipped} lines skipped) against {origin}, stub at {base_url}")
+
+    started = time.perf_counter()
+    results = replay(app, requests, args.concurrency)
+    summary = summarize(results, time.perf_counter() - started, stub)
+    summary["config"] = {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()}
+
+    print(json.dumps(summary, indent=2))
+    if args.output is not None:
+        args.output.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+    fixtures.stop()
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
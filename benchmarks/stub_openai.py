@@ -0,0 +1,452 @@
+# Description: Local stand-in for the OpenAI assistants, files, vector store and chat APIs.
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+
+PORTAL_URL_PATTERN = re.compile(r"The url for main page is `([^`]+)`")
+HREF_PATTERN = re.compile(r"""href=["']([^"']+)["']""")
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def _text_message(thread_id: str, role: str, text: str, run_id: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": _new_id("msg"),
+        "object": "thread.message",
+        "created_at": int(time.time()),
+        "thread_id": thread_id,
+        "run_id": run_id,
+        "assistant_id": None,
+        "role": role,
+        "status": "completed",
+        "attachments": [],
+        "metadata": {},
+        "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+    }
+
+
+class StubModel:
+    """
+    Answers the agent's prompts without a model.
+
+    Discovery turns return up to `fanout` same-origin links found in the pages
+    the turn was given, for `discovery_rounds` rounds, then []. Every other
+    turn returns a short fixed action list for the portal page.
+    """
+
+    def __init__(self, fanout: int = 2, discovery_rounds: int = 1):
+        self.fanout = fanout
+        self.discovery_rounds = discovery_rounds
+
+    def _links(self, portal_url: str, pages: List[str], exclude: set) -> List[str]:
+        origin = urlsplit(portal_url)[:2]
+        links = []
+        for page in pages:
+            for href in HREF_PATTERN.findall(page):
+                url = urljoin(portal_url, href).split("#")[0]
+                if urlsplit(url)[:2] != origin or url in exclude or url in links:
+                    continue
+                links.append(url)
+        return links[:self.fanout]
+
+    def reply(self, conversation: List[str], pages: List[str]) -> str:
+        """conversation holds the user prompts so far, pages the page contents given with the last one."""
+        prompt = conversation[-1]
+        match = None
+        for text in conversation:
+            match = match or PORTAL_URL_PATTERN.search(text)
+        portal_url = match.group(1) if match else ""
+
+        discovery_round = sum(1 for text in conversation if "# First Misson" in text or "# Next Mission" in text)
+        if "# First Misson" in prompt or "# Next Mission" in prompt:
+            if discovery_round > self.discovery_rounds:
+                return "[]"
+            asked = set(re.findall(r"^(\S+) : page\d+\.html$", "\n".join(conversation), re.MULTILINE))
+            return json.dumps(self._links(portal_url, pages or [prompt], asked | {portal_url}))
+
+        return json.dumps([
+            {"type": "NavigateAction", "url": portal_url},
+            {"type": "ClickAction", "selector": {"type": "tagContainsSelector", "value": "Submit"}},
+        ])
+
+
+class StubOpenAI:
+    """
+    Serves the subset of the OpenAI REST API used by openai_service:
+    assistants, files, vector stores and file batches, threads, messages and
+    runs (polled or streamed as server-sent events), and chat completions
+    (whole or streamed).
+
+    `llm_latency` is the time a run or completion takes, `api_latency` the
+    time of every other call and `index_latency` the time a file batch spends
+    in_progress; each is varied by +/- `jitter` (a fraction).
+    """
+
+    def __init__(
+        self,
+        llm_latency: float = 0.5,
+        api_latency: float = 0.02,
+        index_latency: float = 0.2,
+        jitter: float = 0.2,
+        model: Optional[StubModel] = None,
+        stream_chunk: int = 16,
+    ):
+        self.llm_latency = llm_latency
+        self.api_latency = api_latency
+        self.index_latency = index_latency
+        self.jitter = jitter
+        self.model = model or StubModel()
+        self.stream_chunk = stream_chunk
+
+        self.files: Dict[str, str] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.threads: Dict[str, List[Dict[str, Any]]] = {}
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self.assistants: Dict[str, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # ------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving on a background thread and returns the base URL to give the OpenAI client."""
+        stub = self
+
+        class Handler(_StubHandler):
+            pass
+        Handler.stub = stub
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="stub-openai", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/v1"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _delay(self, base: float):
+        if base > 0:
+            time.sleep(max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter))))
+
+    def _count(self, route: str):
+        with self._lock:
+            self.calls[route] = self.calls.get(route, 0) + 1
+
+    def llm_turns(self) -> int:
+        with self._lock:
+            return self.calls.get("runs_create", 0) + self.calls.get("chat_completions", 0)
+
+    # ------------------------------------------------------
+    # Model turns
+    # ------------------------------------------------------
+
+    def _thread_reply(self, thread_id: str) -> str:
+        with self._lock:
+            messages = list(self.threads.get(thread_id, []))
+        conversation = [m["content"][0]["text"]["value"] for m in messages if m["role"] == "user"]
+        pages = []
+        if messages and messages[-1]["role"] == "user":
+            with self._lock:
+                pages = [self.files.get(a["file_id"], "") for a in messages[-1].get("attachments") or []]
+        return self.model.reply(conversation, pages)
+
+    def _chat_reply(self, messages: List[Dict[str, str]]) -> str:
+        conversation = [m["content"] for m in messages if m["role"] == "user"]
+        return self.model.reply(conversation, [])
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub: StubOpenAI = None
+
+    ROUTES = [
+        ("POST", r"/v1/assistants", "assistants_create"),
+        ("GET", r"/v1/assistants/(?P<id>[^/]+)", "assistants_retrieve"),
+        ("POST", r"/v1/files", "files_create"),
+        ("DELETE", r"/v1/files/(?P<id>[^/]+)", "files_delete"),
+        ("POST", r"/v1/vector_stores", "vector_stores_create"),
+        ("DELETE", r"/v1/vector_stores/(?P<id>[^/]+)", "vector_stores_delete"),
+        ("POST", r"/v1/vector_stores/(?P<vs>[^/]+)/file_batches", "file_batches_create"),
+        ("GET", r"/v1/vector_stores/(?P<vs>[^/]+)/file_batches/(?P<id>[^/]+)", "file_batches_retrieve"),
+        ("POST", r"/v1/threads", "threads_create"),
+        ("DELETE", r"/v1/threads/(?P<id>[^/]+)", "threads_delete"),
+        ("POST", r"/v1/threads/(?P<thread>[^/]+)/messages", "messages_create"),
+        ("GET", r"/v1/threads/(?P<thread>[^/]+)/messages", "messages_list"),
+        ("POST", r"/v1/threads/(?P<thread>[^/]+)/runs", "runs_create"),
+        ("GET", r"/v1/threads/(?P<thread>[^/]+)/runs/(?P<id>[^/]+)", "runs_retrieve"),
+        ("POST", r"/v1/chat/completions", "chat_completions"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, method: str):
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        self.query = parse_qs(parts.query)
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, parts.path)
+            if route_method == method and match:
+                self.stub._count(name)
+                return getattr(self, name)(**match.groupdict())
+        self._json({"error": {"message": f"No stub for {method} {parts.path}"}}, status=404)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _json(self, payload: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body_json(self) -> Dict[str, Any]:
+        return json.loads(self.body or b"{}")
+
+    # ------------------------------------------------------
+    # Assistants, files, vector stores
+    # ------------------------------------------------------
+
+    def assistants_create(self):
+        self.stub._delay(self.stub.api_latency)
+        assistant = {"id": _new_id("asst"), "object": "assistant", "created_at": int(time.time()),
+                     "tools": [], "metadata": {}, **self._body_json()}
+        with self.stub._lock:
+            self.stub.assistants[assistant["id"]] = assistant
+        self._json(assistant)
+
+    def assistants_retrieve(self, id):
+        self.stub._delay(self.stub.api_latency)
+        with self.stub._lock:
+            assistant = self.stub.assistants.get(id)
+        if assistant is None:
+            return self._json({"error": {"message": "No such assistant", "type": "invalid_request_error"}}, status=404)
+        self._json(assistant)
+
+    def files_create(self):
+        self.stub._delay(self.stub.api_latency)
+        message = BytesParser(policy=default_policy).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self.body
+        )
+        content, file_name = b"", "file"
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                content = part.get_payload(decode=True) or b""
+                file_name = part.get_filename() or file_name
+        file_id = _new_id("file")
+        with self.stub._lock:
+            self.stub.files[file_id] = content.decode("utf-8", errors="replace")
+        self._json({"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                    "filename": file_name, "purpose": "assistants", "status": "processed"})
+
+    def files_delete(self, id):
+        self.stub._delay(self.stub.api_latency)
+        with self.stub._lock:
+            self.stub.files.pop(id, None)
+        self._json({"id": id, "object": "file", "deleted": True})
+
+    def vector_stores_create(self):
+        self.stub._delay(self.stub.api_latency)
+        self._json({"id": _new_id("vs"), "object": "vector_store", "created_at": int(time.time()),
+                    "name": self._body_json().get("name"), "status": "completed", "usage_bytes": 0,
+                    "file_counts": {"in_progress": 0, "completed": 0, "failed": 0, "cancelled": 0, "total": 0}})
+
+    def vector_stores_delete(self, id):
+        self.stub._delay(self.stub.api_latency)
+        self._json({"id": id, "object": "vector_store.deleted", "deleted": True})
+
+    def _batch(self, vs, batch_id):
+        with self.stub._lock:
+            batch = self.stub.batches[batch_id]
+        total = len(batch["file_ids"])
+        done = time.monotonic() >= batch["ready_at"]
+        return {
+            "id": batch_id, "object": "vector_store.file_batch", "created_at": batch["created_at"],
+            "vector_store_id": vs, "status": "completed" if done else "in_progress",
+            "file_counts": {"in_progress": 0 if done else total, "completed": total if done else 0,
+                            "failed": 0, "cancelled": 0, "total": total},
+        }
+
+    def file_batches_create(self, vs):
+        self.stub._delay(self.stub.api_latency)
+        batch_id = _new_id("vsfb")
+        ready_at = time.monotonic() + max(0.0, self.stub.index_latency * (1 + random.uniform(-self.stub.jitter, self.stub.jitter)))
+        with self.stub._lock:
+            self.stub.batches[batch_id] = {"file_ids": self._body_json().get("file_ids", []),
+                                           "created_at": int(time.time()), "ready_at": ready_at}
+        self._json(self._batch(vs, batch_id))
+
+    def file_batches_retrieve(self, vs, id):
+        self.stub._delay(self.stub.api_latency)
+        self._json(self._batch(vs, id), headers={"openai-poll-after-ms": "50"})
+
+    # ------------------------------------------------------
+    # Threads, messages, runs
+    # ------------------------------------------------------
+
+    def threads_create(self):
+        self.stub._delay(self.stub.api_latency)
+        thread_id = _new_id("thread")
+        with self.stub._lock:
+            self.stub.threads[thread_id] = []
+        self._json({"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {},
+                    "tool_resources": self._body_json().get("tool_resources") or {}})
+
+    def threads_delete(self, id):
+        self.stub._delay(self.stub.api_latency)
+        with self.stub._lock:
+            self.stub.threads.pop(id, None)
+        self._json({"id": id, "object": "thread.deleted", "deleted": True})
+
+    def messages_create(self, thread):
+        self.stub._delay(self.stub.api_latency)
+        body = self._body_json()
+        message = _text_message(thread, body.get("role", "user"), body.get("content", ""))
+        message["attachments"] = body.get("attachments") or []
+        with self.stub._lock:
+            self.stub.threads.setdefault(thread, []).append(message)
+        self._json(message)
+
+    def messages_list(self, thread):
+        self.stub._delay(self.stub.api_latency)
+        limit = int(self.query.get("limit", ["20"])[0])
+        with self.stub._lock:
+            messages = list(reversed(self.stub.threads.get(thread, [])))[:limit]
+        self._json({"object": "list", "data": messages, "has_more": False,
+                    "first_id": messages[0]["id"] if messages else None,
+                    "last_id": messages[-1]["id"] if messages else None})
+
+    def _run(self, thread, run_id, status):
+        return {"id": run_id, "object": "thread.run", "created_at": int(time.time()), "thread_id": thread,
+                "assistant_id": self.stub.runs[run_id]["assistant_id"], "status": status, "model": "stub",
+                "instructions": "", "tools": [], "metadata": {}, "parallel_tool_calls": True}
+
+    def runs_create(self, thread):
+        body = self._body_json()
+        run_id = _new_id("run")
+        reply = self.stub._thread_reply(thread)
+        with self.stub._lock:
+            self.stub.runs[run_id] = {"assistant_id": body.get("assistant_id"), "thread": thread, "reply": reply,
+                                      "done_at": None, "posted": False}
+        if body.get("stream"):
+            return self._stream_run(thread, run_id, reply)
+        latency = max(0.0, self.stub.llm_latency * (1 + random.uniform(-self.stub.jitter, self.stub.jitter)))
+        with self.stub._lock:
+            self.stub.runs[run_id]["done_at"] = time.monotonic() + latency
+        self.stub._delay(self.stub.api_latency)
+        self._json(self._run(thread, run_id, "queued"))
+
+    def runs_retrieve(self, thread, id):
+        self.stub._delay(self.stub.api_latency)
+        with self.stub._lock:
+            run = self.stub.runs[id]
+            done = time.monotonic() >= run["done_at"]
+            if done and not run["posted"]:
+                run["posted"] = True
+                self.stub.threads.setdefault(thread, []).append(_text_message(thread, "assistant", run["reply"], id))
+        self._json(self._run(thread, id, "completed" if done else "in_progress"))
+
+    def _event(self, event: str, data: Any):
+        payload = data if isinstance(data, str) else json.dumps(data)
+        self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream_run(self, thread, run_id, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        self._event("thread.run.created", self._run(thread, run_id, "queued"))
+        self._event("thread.run.in_progress", self._run(thread, run_id, "in_progress"))
+        message = _text_message(thread, "assistant", reply, run_id)
+        started = dict(message, status="in_progress", content=[])
+        self._event("thread.message.created", started)
+        # The reply is streamed in chunks spread over the run latency
+        chunks = [reply[i:i + self.stub.stream_chunk] for i in range(0, len(reply), self.stub.stream_chunk)] or [""]
+        for chunk in chunks:
+            self.stub._delay(self.stub.llm_latency / len(chunks))
+            self._event("thread.message.delta", {
+                "id": message["id"], "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text", "text": {"value": chunk, "annotations": []}}]},
+            })
+        with self.stub._lock:
+            self.stub.threads.setdefault(thread, []).append(message)
+            self.stub.runs[run_id]["posted"] = True
+        self._event("thread.message.completed", message)
+        self._event("thread.run.completed", self._run(thread, run_id, "completed"))
+        self._event("done", "[DONE]")
+
+    # ------------------------------------------------------
+    # Chat completions
+    # ------------------------------------------------------
+
+    def chat_completions(self):
+        body = self._body_json()
+        reply = self.stub._chat_reply(body.get("messages", []))
+        if body.get("stream"):
+            return self._stream_chat(body, reply)
+        self.stub._delay(self.stub.llm_latency)
+        self._json({
+            "id": _new_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _stream_chat(self, body, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = _new_id("chatcmpl")
+
+        def _chunk(delta, finish_reason=None):
+            payload = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        _chunk({"role": "assistant", "content": ""})
+        # The reply is streamed in chunks spread over the completion latency
+        chunks = [reply[i:i + self.stub.stream_chunk] for i in range(0, len(reply), self.stub.stream_chunk)] or [""]
+        for chunk in chunks:
+            self.stub._delay(self.stub.llm_latency / len(chunks))
+            _chunk({"content": chunk})
+        _chunk({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
@@ -0,0 +1,246 @@
+# Description: Long-lived pool of headless Chromium browsers shared by the page fetchers.
+
+import asyncio
+import atexit
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from playwright.async_api import async_playwright
+
+from .config import (
+    BROWSER_POOL_SIZE,
+    BROWSER_PAGES_PER_BROWSER,
+    BROWSER_MAX_PAGES,
+    BROWSER_CONTEXT_MAX_PAGES,
+    BROWSER_PAGE_TIMEOUT,
+)
+from .metrics import span
+
+
+class _BrowserSlot:
+    """One warm browser plus the context its pages are opened in."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.browser = None
+        self.context = None
+        self.pages_served = 0
+        self.context_pages_served = 0
+        self.open_pages = 0
+        self.lock = asyncio.Lock()  # Check-outs of one browser happen one at a time
+
+
+class BrowserPool:
+    """
+    Keeps `size` headless Chromium browsers warm on a dedicated event loop,
+    each loading up to `pages_per_browser` pages at once, so up to
+    size * pages_per_browser pages load concurrently across the process.
+
+    Playwright objects are bound to the loop they were created on, so the pool
+    owns a background thread running its own loop and every browser operation
+    is submitted to it. Callers on any thread or loop borrow a page through
+    `fetch_html` / `fetch_html_sync`.
+
+    Contexts are recycled after `context_max_pages` pages and browsers are
+    relaunched after `max_pages` pages, in both cases once none of their pages
+    is still open, or straight away when they are found disconnected.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        pages_per_browser: int = BROWSER_PAGES_PER_BROWSER,
+        max_pages: int = BROWSER_MAX_PAGES,
+        context_max_pages: int = BROWSER_CONTEXT_MAX_PAGES,
+        launch_options: Optional[Dict[str, Any]] = None,
+    ):
+        self.size = max(1, size)
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.max_pages = max_pages
+        self.context_max_pages = context_max_pages
+        self.launch_options = launch_options or {"headless": True, "args": ["--start-maximized"]}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._playwright = None
+        self._slots: List[_BrowserSlot] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    # ------------------------------------------------------
+    # Loop management
+    # ------------------------------------------------------
+
+    def start(self) -> "BrowserPool":
+        """Starts the pool loop and launches the browsers (idempotent)."""
+        with self._start_lock:
+            if self._loop is not None:
+                return self
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+            self._thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+            except Exception:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop, self._thread = None, None
+                self._slots = []
+                raise
+        return self
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        self._idle = asyncio.Queue()
+        for index in range(self.size):
+            slot = _BrowserSlot(index)
+            try:
+                await self._launch(slot)
+            except Exception as e:
+                # Leave the slot cold, it is relaunched when borrowed.
+                logger.warning(f"browser pool: failed to warm slot {index}: {e}")
+            self._slots.append(slot)
+        # One queue entry per page a browser may have open; entries of all browsers are interleaved
+        for _ in range(self.pages_per_browser):
+            for slot in self._slots:
+                self._idle.put_nowait(slot)
+        logger.debug(f"browser pool: started with {self.size} browsers, {self.pages_per_browser} pages each")
+
+    def submit(self, coro):
+        """Schedules a coroutine on the pool loop and returns a concurrent future."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self):
+        """Closes every browser and stops the pool loop."""
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._loop is None:
+                return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(timeout=30)
+        except Exception as e:
+            logger.warning(f"browser pool: error while closing: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    async def _close(self):
+        for slot in self._slots:
+            await self._shutdown(slot)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    # ------------------------------------------------------
+    # Slot lifecycle (runs on the pool loop)
+    # ------------------------------------------------------
+
+    async def _launch(self, slot: _BrowserSlot):
+        with span("browser_launch"):
+            slot.browser = await self._playwright.chromium.launch(**self.launch_options)
+            slot.context = await slot.browser.new_context()
+        slot.pages_served = 0
+        slot.context_pages_served = 0
+
+    async def _shutdown(self, slot: _BrowserSlot):
+        for closable in (slot.context, slot.browser):
+            if closable is None:
+                continue
+            try:
+                await closable.close()
+            except Exception:
+                pass
+        slot.context = None
+        slot.browser = None
+
+    async def _check_out(self, slot: _BrowserSlot):
+        """
+        Health-checks a slot before lending it out, recycling it if needed. A
+        due recycle waits until the slot has no open pages, as it would close them.
+        """
+        if slot.browser is None or not slot.browser.is_connected():
+            logger.debug(f"browser pool: relaunching unhealthy slot {slot.index}")
+            await self._shutdown(slot)
+            await self._launch(slot)
+        elif slot.open_pages > 0:
+            return
+        elif slot.pages_served >= self.max_pages:
+            logger.debug(f"browser pool: recycling slot {slot.index} after {slot.pages_served} pages")
+            await self._shutdown(slot)
+            await self._launch(slot)
+        elif slot.context is None or slot.context_pages_served >= self.context_max_pages:
+            if slot.context is not None:
+                try:
+                    await slot.context.close()
+                except Exception:
+                    pass
+            slot.context = await slot.browser.new_context()
+            slot.context_pages_served = 0
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrows a fresh page from a pooled browser (pool loop only)."""
+        slot = await self._idle.get()
+        page = None
+        try:
+            async with slot.lock:
+                await self._check_out(slot)
+                page = await slot.context.new_page()
+                slot.open_pages += 1
+            slot.pages_served += 1
+            slot.context_pages_served += 1
+            yield page
+        except Exception:
+            # A failing browser is relaunched on its next check-out.
+            if slot.browser is not None and not slot.browser.is_connected():
+                await self._shutdown(slot)
+            raise
+        finally:
+            if page is not None:
+                slot.open_pages -= 1
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            self._idle.put_nowait(slot)
+
+    async def _fetch_html(self, page_url: str, timeout: int) -> str:
+        async with self.page() as page:
+            with span("page_navigation"):
+                await page.goto(page_url, timeout=timeout)
+                return await page.content()
+
+    # ------------------------------------------------------
+    # Public fetch helpers (any thread / loop)
+    # ------------------------------------------------------
+
+    async def fetch_html(self, page_url: str, timeout: int = BROWSER_PAGE_TIMEOUT) -> str:
+        """Returns the raw HTML of page_url, awaitable from any event loop."""
+        return await asyncio.wrap_future(self.submit(self._fetch_html(page_url, timeout)))
+
+    def fetch_html_sync(self, page_url: str, timeout: int = BROWSER_PAGE_TIMEOUT) -> str:
+        """Returns the raw HTML of page_url, blocking the calling thread."""
+        return self.submit(self._fetch_html(page_url, timeout)).result()
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Returns the process-wide browser pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+                atexit.register(_pool.close)
+    return _pool.start()
@@ -18,6 +18,11 @@ LLM_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", 10000))
 
 LOCAL_MODEL_ENDPOINT = os.getenv("LOCAL_MODEL_ENDPOINT", "http://127.0.0.1:6000/generate")
 LOCAL_PARALLEL_MODEL_ENDPOINT = os.getenv("LOCAL_PARALLEL_MODEL_ENDPOINT", "http://127.0.0.1:6000/generate_parallel")
+LOCAL_MODEL_TIMEOUT = float(os.getenv("LOCAL_MODEL_TIMEOUT", 120))
+LOCAL_MAX_CONNECTIONS = int(os.getenv("LOCAL_MAX_CONNECTIONS", 8))  # Keep-alive connections to the local model
+# Concurrent requests are sent together to LOCAL_PARALLEL_MODEL_ENDPOINT
+LOCAL_BATCH_SIZE = int(os.getenv("LOCAL_BATCH_SIZE", 8))
+LOCAL_BATCH_WAIT = float(os.getenv("LOCAL_BATCH_WAIT", 0.02))  # Seconds to wait for more requests to join a batch
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -25,6 +30,21 @@ OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4-32k-0613")
 OPENAI_MAX_TOKENS = int(os.getenv("LLM_CONTEXT_WINDOW", 2000))
 OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", 0.8))
 
+# Inference engine: "assistants" (vector store + file_search), "chat" (pages inlined in
+# chat completions) or "auto" (chat when the portal page fits the context window)
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "auto")
+CHAT_RESPONSE_RESERVE = int(os.getenv("CHAT_RESPONSE_RESERVE", 2000))  # Tokens of LLM_CONTEXT_WINDOW kept for replies
+
+# Assistant runs are streamed ("stream") or polled with backoff ("poll")
+RUN_MODE = os.getenv("RUN_MODE", "stream")
+RUN_POLL_INITIAL = float(os.getenv("RUN_POLL_INITIAL", 0.05))  # Seconds before the first status check
+RUN_POLL_MAX = float(os.getenv("RUN_POLL_MAX", 1.0))
+RUN_POLL_BACKOFF = float(os.getenv("RUN_POLL_BACKOFF", 1.5))
+
+# Stream replies and act on each URL or action as soon as the model has written it:
+# pages start loading while the rest of the reply is generated (assistants need RUN_MODE=stream)
+STREAM_REPLIES = bool(strtobool(os.getenv("STREAM_REPLIES", "true")))
+
 # Validate critical environment variables
 if LLM_PROVIDER == "openai" and not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY is required when LLM_PROVIDER is set to 'openai'.")
@@ -32,4 +52,86 @@ if LLM_PROVIDER == "openai" and not OPENAI_API_KEY:
 # ============================
 # Agent Configurations
 # ============================
-AGENT_NAME = os.getenv("AGENT_NAME")
\ No newline at end of file
+AGENT_NAME = os.getenv("AGENT_NAME")
+AGENT_STATE_DIR = Path(os.getenv("AGENT_STATE_DIR", Path.home() / ".autoppia_flask_agent"))  # Local state kept across restarts
+
+# Assistants are created once per (model, instructions, tools) and reused across requests
+ASSISTANT_REGISTRY_PATH = Path(os.getenv("ASSISTANT_REGISTRY_PATH", AGENT_STATE_DIR / "assistants.json"))
+
+# Vector stores, threads and files are deleted by a background janitor
+CLEANUP_QUEUE_PATH = Path(os.getenv("CLEANUP_QUEUE_PATH", AGENT_STATE_DIR / "cleanup_queue.json"))
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", 20))
+CLEANUP_MAX_ATTEMPTS = int(os.getenv("CLEANUP_MAX_ATTEMPTS", 5))
+CLEANUP_INTERVAL = float(os.getenv("CLEANUP_INTERVAL", 2))  # Seconds between queue checks, also the retry backoff base
+CLEANUP_WORKERS = int(os.getenv("CLEANUP_WORKERS", 4))  # Deletions run in parallel within a batch
+
+# ============================
+# SERVING CONFIGURATION
+# ============================
+SERVE_MODE = os.getenv("SERVE_MODE", "threaded")  # "threaded" serves requests concurrently, "single" one at a time
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", 4))  # Tasks solved at the same time
+REQUEST_QUEUE_SIZE = int(os.getenv("REQUEST_QUEUE_SIZE", 16))  # Tasks allowed to wait for a free slot
+REQUEST_QUEUE_TIMEOUT = float(os.getenv("REQUEST_QUEUE_TIMEOUT", 30))  # Seconds a task may wait before a 503
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", 5))  # Retry-After sent with 503 responses
+
+# Task requests can be appended to a JSON-lines file for offline replay (benchmarks/replay.py)
+RECORD_REQUESTS = bool(strtobool(os.getenv("RECORD_REQUESTS", "false")))
+RECORD_REQUESTS_PATH = Path(os.getenv("RECORD_REQUESTS_PATH", Path(__file__).resolve().parent / "requests.jsonl"))
+
+# Tasks submitted to /solve_task/jobs run on a bounded worker pool
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", 64))  # Jobs allowed to wait for a worker
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", 3600))  # Seconds a finished job's result is kept
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", 60))  # Longest long-poll allowed on a job
+
+# Tasks posted together to /solve_task/batch
+BATCH_MAX_TASKS = int(os.getenv("BATCH_MAX_TASKS", 100))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))  # Tasks of a batch solved in parallel
+
+# ============================
+# BROWSER CONFIGURATION
+# ============================
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 2))
+BROWSER_PAGES_PER_BROWSER = int(os.getenv("BROWSER_PAGES_PER_BROWSER", 4))  # Pages loading at once in one browser
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", 200))  # Relaunch a browser after this many pages
+BROWSER_CONTEXT_MAX_PAGES = int(os.getenv("BROWSER_CONTEXT_MAX_PAGES", 20))  # Recycle a context after this many pages
+BROWSER_PAGE_TIMEOUT = int(os.getenv("BROWSER_PAGE_TIMEOUT", 60000))  # Navigation timeout in milliseconds
+
+# ============================
+# CRAWL CONFIGURATION
+# ============================
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 4))  # Pages fetched and uploaded at once per round
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", 90))  # Seconds allowed for fetching one page
+
+# While the first turn runs, prefetch the same-origin links of the portal page
+# that best match the task prompt
+SPECULATIVE_PREFETCH = bool(strtobool(os.getenv("SPECULATIVE_PREFETCH", "false")))
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", 3))
+
+# Cleaned pages are cached in memory by canonical URL
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", 600))  # Seconds before a cached page is refetched
+
+# Pages are also kept on disk per origin, with their links, so repeat tasks on a
+# site can skip fetching and URL discovery; stale pages are refreshed in the background
+SITE_INDEX_ENABLED = bool(strtobool(os.getenv("SITE_INDEX_ENABLED", "false")))
+SITE_INDEX_DIR = Path(os.getenv("SITE_INDEX_DIR", AGENT_STATE_DIR / "site_index"))
+SITE_INDEX_TTL = float(os.getenv("SITE_INDEX_TTL", 24 * 3600))  # Seconds before an indexed page is refreshed
+SITE_INDEX_DEPTH = int(os.getenv("SITE_INDEX_DEPTH", 2))  # Link hops from the portal page that must be indexed
+SITE_INDEX_MAX_PAGES = int(os.getenv("SITE_INDEX_MAX_PAGES", 20))  # Larger sites go through URL discovery
+
+# Inferred action plans are cached by prompt, URL and page contents
+PLAN_CACHE_ENABLED = bool(strtobool(os.getenv("PLAN_CACHE_ENABLED", "true")))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", 1024))
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", 3600))
+
+# BeautifulSoup backend used by clean_html: "html.parser", "lxml" or "html5lib"
+HTML_PARSER = os.getenv("HTML_PARSER", "html.parser")
+# "stream" cleans html.parser pages in one event-driven pass without building a tree;
+# "tree" always goes through BeautifulSoup
+HTML_CLEANER = os.getenv("HTML_CLEANER", "stream")
+
+# Pages are sent to the model as cleaned HTML ("html") or as a compact outline of
+# headings and interactive elements with their selectors ("outline")
+PAGE_FORMAT = os.getenv("PAGE_FORMAT", "html")
+OUTLINE_TOKEN_BUDGET = int(os.getenv("OUTLINE_TOKEN_BUDGET", LLM_CONTEXT_WINDOW // 4))  # Tokens allowed per page outline
@@ -0,0 +1,250 @@
+# Description: Structural HTML diff over DOM trees whose subtrees carry Merkle hashes.
+
+import hashlib
+import html
+import json
+from difflib import SequenceMatcher
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+from .html_stream import PRESERVE_WHITESPACE_TAGS, VOID_TAGS
+
+
+TEXT = "#text"
+
+
+def _digest(*parts: bytes) -> bytes:
+    return hashlib.blake2b(b"\0".join(parts), digest_size=16).digest()
+
+
+class DomNode:
+    """An element or text node. `hash` covers the node and its whole subtree."""
+
+    __slots__ = ("tag", "attrs", "text", "children", "hash")
+
+    def __init__(self, tag: str, attrs: Tuple[Tuple[str, str], ...] = (), text: str = ""):
+        self.tag = tag
+        self.attrs = attrs
+        self.text = text
+        self.children: List["DomNode"] = []
+        self.hash = b""
+
+    def seal(self):
+        """Computes the hash once all children are in."""
+        if self.tag == TEXT:
+            self.hash = _digest(b"#text", self.text.encode("utf-8", "surrogatepass"))
+        else:
+            attrs = "\0".join(f"{key}={value}" for key, value in self.attrs)
+            self.hash = _digest(self.tag.encode(), attrs.encode("utf-8", "surrogatepass"),
+                                b"".join(child.hash for child in self.children))
+
+    def markup(self) -> str:
+        if self.tag == TEXT:
+            return html.escape(self.text, quote=False)
+        attrs = "".join(f' {key}="{html.escape(value)}"' for key, value in self.attrs)
+        if self.tag in VOID_TAGS and not self.children:
+            return f"<{self.tag}{attrs}/>"
+        return f"<{self.tag}{attrs}>{''.join(child.markup() for child in self.children)}</{self.tag}>"
+
+
+class _TreeBuilder(HTMLParser):
+    """
+    Builds a DomNode tree, sealing each node as it closes. Whitespace-only
+    text is dropped, so re-indented markup hashes the same. Other text has
+    each run of whitespace collapsed to one space (except in <pre> and
+    <textarea>); a space at either end is kept because it separates the text
+    from its neighbours when rendered, e.g. in `<b>x</b> y`.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = DomNode("#document")
+        self._stack = [self.root]
+        self._preserve = 0
+
+    def handle_starttag(self, tag, attrs):
+        node = DomNode(tag, tuple(sorted((key, value or "") for key, value in attrs)))
+        self._stack[-1].children.append(node)
+        if tag in VOID_TAGS:
+            node.seal()
+            return
+        self._stack.append(node)
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self._preserve += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not any(node.tag == tag for node in self._stack[1:]):
+            return
+        while True:
+            node = self._stack.pop()
+            self._close(node)
+            if node.tag == tag:
+                break
+
+    def _close(self, node: DomNode):
+        if node.tag in PRESERVE_WHITESPACE_TAGS:
+            self._preserve -= 1
+        node.seal()
+
+    def handle_data(self, data):
+        if not data.strip():
+            return
+        if not self._preserve:
+            leading = " " if data[0].isspace() else ""
+            trailing = " " if data[-1].isspace() else ""
+            data = leading + " ".join(data.split()) + trailing
+        node = DomNode(TEXT, text=data)
+        node.seal()
+        self._stack[-1].children.append(node)
+
+    def close(self):
+        super().close()
+        for node in self._stack[:0:-1]:
+            self._close(node)
+        self.root.seal()
+
+
+def parse_dom(html_content: str) -> DomNode:
+    """Parses HTML into a DomNode tree with subtree hashes."""
+    builder = _TreeBuilder()
+    builder.feed(html_content)
+    builder.close()
+    return builder.root
+
+
+def _child_paths(parent_path: str, children: List[DomNode]) -> List[str]:
+    counts: Dict[str, int] = {}
+    paths = []
+    for child in children:
+        counts[child.tag] = counts.get(child.tag, 0) + 1
+        step = "text()" if child.tag == TEXT else child.tag
+        paths.append(f"{parent_path}/{step}[{counts[child.tag]}]")
+    return paths
+
+
+class _Differ:
+    def __init__(self):
+        self.ops: List[Dict[str, Any]] = []
+        self._deleted: Dict[bytes, Dict[str, Any]] = {}
+        self._inserted: List[Tuple[DomNode, Dict[str, Any]]] = []
+
+    def node(self, old: DomNode, new: DomNode, path: str):
+        if old.hash == new.hash:
+            return
+        if old.tag == TEXT:
+            self.ops.append({"op": "text", "path": path, "text": new.text})
+            return
+        if old.attrs != new.attrs:
+            old_attrs, new_attrs = dict(old.attrs), dict(new.attrs)
+            changed = {key: value for key, value in new_attrs.items() if old_attrs.get(key) != value}
+            removed = [key for key in old_attrs if key not in new_attrs]
+            self.ops.append({"op": "attrs", "path": path, "set": changed, "remove": removed})
+        self.children(old.children, new.children, path)
+
+    def children(self, old: List[DomNode], new: List[DomNode], path: str):
+        start = 0
+        while start < len(old) and start < len(new) and old[start].hash == new[start].hash:
+            start += 1
+        old_end, new_end = len(old), len(new)
+        while old_end > start and new_end > start and old[old_end - 1].hash == new[new_end - 1].hash:
+            old_end -= 1
+            new_end -= 1
+        if start == old_end and start == new_end:
+            return
+
+        old_paths = _child_paths(path, old)
+        matcher = SequenceMatcher(None, [node.hash for node in old[start:old_end]],
+                                  [node.hash for node in new[start:new_end]], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            i1, i2, j1, j2 = i1 + start, i2 + start, j1 + start, j2 + start
+            # Same-tag nodes at the same place are updated in place
+            while i1 < i2 and j1 < j2 and old[i1].tag == new[j1].tag:
+                self.node(old[i1], new[j1], old_paths[i1])
+                i1 += 1
+                j1 += 1
+            while i1 < i2 and j1 < j2 and i2 - i1 == j2 - j1:
+                self.ops.append({"op": "replace", "path": old_paths[i1], "html": new[j1].markup()})
+                i1 += 1
+                j1 += 1
+            for index in range(i1, i2):
+                op = {"op": "delete", "path": old_paths[index]}
+                self._deleted.setdefault(old[index].hash, op)
+                self.ops.append(op)
+            for index in range(j1, j2):
+                op = {"op": "insert", "path": path, "index": index}
+                self._inserted.append((new[index], op))
+                self.ops.append(op)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Turns delete + insert pairs of identical subtrees into moves and renders what is left."""
+        dropped = set()
+        for node, op in self._inserted:
+            deleted = self._deleted.pop(node.hash, None)
+            if deleted is not None:
+                dropped.add(id(deleted))
+                op.update(op="move", source=deleted["path"])
+            else:
+                op["html"] = node.markup()
+        return [op for op in self.ops if id(op) not in dropped]
+
+
+def diff_trees(old: DomNode, new: DomNode) -> List[Dict[str, Any]]:
+    """
+    Returns the edit script turning `old` into `new`. Subtrees with equal hashes
+    are skipped without being visited. Paths are XPath-like and refer to the
+    old document; insert and move give the index in the new parent.
+    """
+    differ = _Differ()
+    differ.node(old, new, "")
+    return differ.finish()
+
+
+def diff_dom(old_html: str, new_html: str) -> List[Dict[str, Any]]:
+    return diff_trees(parse_dom(old_html), parse_dom(new_html))
+
+
+def format_edit_script(ops: List[Dict[str, Any]]) -> str:
+    """One line per operation, e.g. `insert /body[1]/ul[1] 3 <li>New</li>`."""
+    lines = []
+    for op in ops:
+        kind = op["op"]
+        if kind == "insert":
+            lines.append(f"insert {op['path'] or '/'} {op['index']} {op['html']}")
+        elif kind == "move":
+            lines.append(f"move {op['source']} {op['path'] or '/'} {op['index']}")
+        elif kind == "delete":
+            lines.append(f"delete {op['path']}")
+        elif kind == "replace":
+            lines.append(f"replace {op['path']} {op['html']}")
+        elif kind == "text":
+            lines.append(f"text {op['path']} {json.dumps(op['text'], ensure_ascii=False)}")
+        elif kind == "attrs":
+            changes = [f"{key}={json.dumps(value, ensure_ascii=False)}" for key, value in op["set"].items()]
+            changes += [f"-{key}" for key in op["remove"]]
+            lines.append(f"attrs {op['path']} {' '.join(changes)}")
+    return "\n".join(lines)
+
+
+class DomDiffer:
+    """
+    Diffs a sequence of snapshots of one page. Only the previous snapshot's
+    tree is kept, so each new snapshot is parsed and hashed once and compared
+    against hashes that are already there.
+    """
+
+    def __init__(self):
+        self.previous: Optional[DomNode] = None
+
+    def diff(self, html_content: str) -> List[Dict[str, Any]]:
+        """Returns the edit script from the previous snapshot ([] for the first one)."""
+        tree = parse_dom(html_content)
+        ops = diff_trees(self.previous, tree) if self.previous is not None else []
+        self.previous = tree
+        return ops
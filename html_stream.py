@@ -0,0 +1,384 @@
+# Description: Single-pass, event-based HTML cleaner producing the same markup as clean_html.
+
+import io
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, TextIO
+
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+
+
+REMOVED_TAGS = frozenset(["script", "style", "noscript", "meta", "link"])
+REMOVED_ATTRIBUTES = frozenset(["class", "id", "style"])
+
+# Tree-building rules of BeautifulSoup's html.parser builder, which the output must match
+VOID_TAGS = frozenset(HTMLTreeBuilder.empty_element_tags)
+PRESERVE_WHITESPACE_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+STRING_CONTAINER_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+LIST_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+ASCII_SPACES = frozenset("\x20\x0a\x09\x0c\x0d")
+
+OUTPUT_CHUNK_SIZE = 64 * 1024
+INPUT_CHUNK_SIZE = 64 * 1024
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _quote(value: str) -> str:
+    value = _escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', "&quot;") + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def _hides(attrs: Dict[str, str]) -> bool:
+    style = attrs.get("style")
+    if style:
+        style_lc = style.lower()
+        if "display: none" in style_lc or "visibility: hidden" in style_lc:
+            return True
+    return "hidden" in attrs
+
+
+class _Frame:
+    """An open element. Only the innermost one can still be pending (not yet known to be kept)."""
+
+    __slots__ = ("name", "skip", "level", "committed", "pending", "body", "empty")
+
+    def __init__(self, name: str, skip: bool, level: int, committed: bool = False, body: bool = False):
+        self.name = name
+        self.skip = skip
+        self.level = level
+        self.committed = committed
+        self.pending: List[str] = []
+        self.body = body
+        self.empty: Optional[str] = None  # How a void element is written if it ends up with no contents
+
+
+class StreamingHTMLCleaner(HTMLParser):
+    """
+    Applies the clean_html rules while the page is parsed: removed and hidden
+    elements are skipped with their subtrees, attributes are stripped on the
+    start tag, and a start tag is held back only until the element turns out
+    to have text or a child element, so empty elements never reach the output.
+
+    Once the first kept <body> has started, working memory is the stack of
+    open elements plus the one pending start tag, and the cleaned markup is
+    written to `out` in chunks of `chunk_size`. Only that <body> is written
+    when the page has one, like clean_html, so the cleaned markup before it
+    is held in memory until it shows up. Removed and hidden subtrees never
+    reach that buffer, but a page without a <body> is buffered whole.
+    """
+
+    def __init__(self, out: TextIO, prettify: bool = True, chunk_size: int = OUTPUT_CHUNK_SIZE):
+        super().__init__(convert_charrefs=False)
+        self.out = out
+        self.prettify = prettify
+        self.chunk_size = chunk_size
+        self._stack = [_Frame("[document]", False, -1, committed=True)]
+        self._open: Dict[str, int] = {}
+        self._closed_void: Counter = Counter()  # Void tags already closed at their start tag, by name
+        self._text: List[str] = []
+        self._preserve = 0
+        self._containers = 0
+        self._literal: Optional[_Frame] = None
+        self._outer_literal: Optional[_Frame] = None
+        self._body_open = False
+        self._body_kept = False
+        self._done = False
+        self._preamble: List[str] = []
+        self._chunks: List[str] = []
+        self._chunked = 0
+        self._held: List[_Frame] = []
+
+    # Output
+
+    def _write(self, piece: str):
+        if self._done or not piece:
+            return
+        if self._held:
+            self._release()
+        if not self._body_kept:
+            self._preamble.append(piece)
+            return
+        self._chunks.append(piece)
+        self._chunked += len(piece)
+        if self._chunked >= self.chunk_size:
+            self._flush_chunks()
+
+    def _release(self):
+        held, self._held = self._held, []
+        for frame in held:
+            self._write("".join(frame.pending))
+            frame.pending = []
+
+    def _flush_chunks(self):
+        if self._chunks:
+            self.out.write("".join(self._chunks))
+            self._chunks = []
+            self._chunked = 0
+
+    def _emit(self, frame: _Frame, piece: str):
+        if frame.committed:
+            self._write(piece)
+        else:
+            frame.pending.append(piece)
+
+    def _commit(self, frame: _Frame):
+        frame.committed = True
+        if frame.body:
+            # Everything written so far, held void elements included, was outside the body
+            self._body_kept = True
+            self._preamble = []
+            for held in self._held:
+                held.pending = []
+            self._held = []
+        if frame.empty is not None:
+            # A kept void element is written as <tag/> unless something inside it is written
+            self._held.append(frame)
+            return
+        self._write("".join(frame.pending))
+        frame.pending = []
+
+    def _indent(self, level: int) -> str:
+        return " " * level if level > 0 else ""
+
+    # Tree building, following BeautifulSoup's html.parser builder
+
+    def _push(self, frame: _Frame):
+        self._stack.append(frame)
+        self._open[frame.name] = self._open.get(frame.name, 0) + 1
+        if frame.name in PRESERVE_WHITESPACE_TAGS:
+            self._preserve += 1
+        if frame.name in STRING_CONTAINER_TAGS:
+            self._containers += 1
+
+    def _pop(self):
+        frame = self._stack.pop()
+        self._open[frame.name] -= 1
+        if frame.name in PRESERVE_WHITESPACE_TAGS:
+            self._preserve -= 1
+        if frame.name in STRING_CONTAINER_TAGS:
+            self._containers -= 1
+        if frame.skip:
+            return
+        if frame.committed and self._held and self._held[-1] is frame:
+            self._held.pop()
+            self._write(frame.empty)
+        elif frame.committed:
+            tag = f"</{frame.name}>"
+            if self.prettify:
+                if self._literal is frame:
+                    tag += "\n"
+                elif self._literal is None:
+                    tag = self._indent(frame.level) + tag + "\n"
+            self._write(tag)
+            if frame.body:
+                self._flush_chunks()
+                self._done = True
+        if self._literal is frame:
+            self._literal = None
+        if frame.body:
+            self._body_open = False
+            self._literal = self._outer_literal
+
+    def _pop_to(self, name: str):
+        if not self._open.get(name):
+            return
+        while len(self._stack) > 1:
+            popped = self._stack[-1].name
+            self._pop()
+            if popped == name:
+                break
+
+    def _start(self, name: str, attrs, handle_void: bool = True):
+        self._end_data()
+        parent = self._stack[-1]
+        values: Dict[str, str] = {}
+        for key, value in attrs:
+            values[key] = "" if value is None else value
+
+        if parent.skip or name in REMOVED_TAGS or _hides(values):
+            self._push(_Frame(name, True, parent.level))
+        else:
+            if not parent.committed:
+                self._commit(parent)
+            body = name == "body" and not self._body_kept and not self._body_open
+            frame = _Frame(name, False, 0 if body else parent.level + 1, body=body)
+            if body:
+                # The body is written on its own, outside any <pre> it sits in
+                self._body_open = True
+                self._outer_literal, self._literal = self._literal, None
+            frame.pending.append(self._format_start(frame, values))
+            if name in VOID_TAGS:
+                frame.empty = self._format_empty(frame, frame.pending[0])
+            self._push(frame)
+
+        if handle_void and name in VOID_TAGS:
+            self._end(name, check_closed=False)
+            self._closed_void[name] += 1
+
+    def _format_start(self, frame: _Frame, values: Dict[str, str]) -> str:
+        list_attributes = LIST_ATTRIBUTES["*"] + LIST_ATTRIBUTES.get(frame.name, [])
+        attributes = []
+        for key in sorted(values):
+            if key.startswith("on") or key in REMOVED_ATTRIBUTES:
+                continue
+            value = " ".join(values[key].split()) if key in list_attributes else values[key]
+            attributes.append(f" {key}={_quote(value)}")
+        tag = f"<{frame.name}{''.join(attributes)}>"
+        if not self.prettify or self._literal is not None:
+            return tag
+        if frame.name in PRESERVE_WHITESPACE_TAGS:
+            self._literal = frame
+            return self._indent(frame.level) + tag
+        return self._indent(frame.level) + tag + "\n"
+
+    def _format_empty(self, frame: _Frame, start: str) -> str:
+        tag = start.strip()[:-1] + "/>"
+        if not self.prettify or self._literal is not None:
+            return tag
+        return self._indent(frame.level) + tag + "\n"
+
+    def _end(self, name: str, check_closed: bool = True):
+        if check_closed and self._closed_void[name]:
+            self._closed_void[name] -= 1
+            return
+        self._end_data()
+        self._pop_to(name)
+
+    def _end_data(self, kind: Optional[str] = None):
+        """Turns the text collected since the last tag into one string of the current element."""
+        if not self._text:
+            return
+        data = "".join(self._text)
+        self._text = []
+        frame = self._stack[-1]
+        if frame.skip:
+            return
+        if frame.empty is not None:
+            # Any string, even one that prettify drops, makes a void element non-empty
+            frame.empty = None
+            if self._held and self._held[-1] is frame:
+                self._release()
+        if not self._preserve and all(char in ASCII_SPACES for char in data):
+            data = "\n" if "\n" in data else " "
+
+        if kind is None:
+            piece = _escape(data)
+        elif kind == "cdata":
+            piece = f"<![CDATA[{data}]]>"
+        elif kind == "doctype":
+            piece = f"<!DOCTYPE {data}>\n"
+        elif kind == "declaration":
+            piece = f"<!{data}>"
+        else:
+            piece = f"<?{data}>"
+
+        # Strings inside <template>, <rt> and <rp> only count as text for that element itself,
+        # and CDATA sections count for any element but those three
+        if kind is None:
+            counts = frame.name in STRING_CONTAINER_TAGS or not self._containers
+        else:
+            counts = kind == "cdata" and frame.name not in STRING_CONTAINER_TAGS
+        if counts and not frame.committed and data.strip():
+            self._commit(frame)
+
+        if self.prettify and self._literal is None:
+            piece = piece.strip()
+            if piece:
+                piece = self._indent(frame.level + 1) + piece + "\n"
+        if piece:
+            self._emit(frame, piece)
+
+    # HTMLParser events, translated the way BeautifulSoupHTMLParser does
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, handle_void=False)
+        self._end(tag)
+
+    def handle_endtag(self, tag):
+        self._end(tag)
+
+    def handle_data(self, data):
+        self._text.append(data)
+
+    def handle_charref(self, name):
+        if name.startswith(("x", "X")):
+            code = int(name.lstrip("xX"), 16)
+        else:
+            code = int(name)
+        data = None
+        if code < 256:
+            try:
+                data = bytes([code]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(code)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data):
+        self._end_data()
+
+    def handle_decl(self, data):
+        self._end_data()
+        self._text.append(data[len("DOCTYPE "):] if data.startswith("DOCTYPE ") else data)
+        self._end_data("doctype")
+
+    def unknown_decl(self, data):
+        kind = "declaration"
+        if data.upper().startswith("CDATA["):
+            kind = "cdata"
+            data = data[len("CDATA["):]
+        self._end_data()
+        self._text.append(data)
+        self._end_data(kind)
+
+    def handle_pi(self, data):
+        self._end_data()
+        self._text.append(data)
+        self._end_data("pi")
+
+    def close(self):
+        super().close()
+        self._end_data()
+        while len(self._stack) > 1:
+            self._pop()
+        if not self._body_kept:
+            self.out.write("".join(self._preamble))
+            self._preamble = []
+        self._flush_chunks()
+
+
+def clean_html_stream(html_content: str, prettify: bool = True, out: Optional[TextIO] = None,
+                      chunk_size: int = OUTPUT_CHUNK_SIZE) -> str:
+    """
+    Cleans html_content in one streaming pass. The result is identical to
+    clean_html with the html.parser backend. With `out` the markup is written
+    there in chunks and "" is returned.
+    """
+    target = out if out is not None else io.StringIO()
+    cleaner = StreamingHTMLCleaner(target, prettify, chunk_size)
+    try:
+        for start in range(0, len(html_content), INPUT_CHUNK_SIZE):
+            cleaner.feed(html_content[start:start + INPUT_CHUNK_SIZE])
+        cleaner.close()
+    except Exception:
+        return ""
+    return target.getvalue() if out is None else ""
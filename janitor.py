@@ -0,0 +1,242 @@
+# Description: Background cleanup of the OpenAI resources created while solving tasks.
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import openai
+from loguru import logger
+
+from .config import (
+    CLEANUP_QUEUE_PATH,
+    CLEANUP_BATCH_SIZE,
+    CLEANUP_MAX_ATTEMPTS,
+    CLEANUP_INTERVAL,
+    CLEANUP_WORKERS,
+)
+
+
+def _delete_vector_store(client: openai.OpenAI, resource_id: str):
+    client.vector_stores.delete(resource_id)
+
+
+def _delete_file(client: openai.OpenAI, resource_id: str):
+    client.files.delete(resource_id)
+
+
+def _delete_thread(client: openai.OpenAI, resource_id: str):
+    client.beta.threads.delete(resource_id)
+
+
+RESOURCE_DELETERS: Dict[str, Callable[[openai.OpenAI, str], None]] = {
+    "vector_store": _delete_vector_store,
+    "file": _delete_file,
+    "thread": _delete_thread,
+}
+
+
+class CleanupSession:
+    """
+    Resources created by one task; they are handed to the janitor when the
+    session ends. Resources tracked after that, such as a timed-out upload
+    that completed late, are eligible for deletion straight away.
+    """
+
+    def __init__(self, janitor: "ResourceJanitor"):
+        self.janitor = janitor
+        self.owner = uuid.uuid4().hex
+        self.released = False
+        self._lock = threading.Lock()
+
+    def track(self, kind: str, resource_id: str):
+        """Records a resource so it is deleted once the task is done, even if the task fails."""
+        with self._lock:
+            self.janitor.track(kind, resource_id, owner=None if self.released else self.owner)
+
+    def release(self):
+        with self._lock:
+            self.released = True
+            self.janitor.release(self.owner)
+
+
+class ResourceJanitor:
+    """
+    Deletes OpenAI resources in batches on a background thread.
+
+    Resources are tracked as soon as they are created and persisted to
+    `path`, so a crash leaves a record of everything that still has to be
+    deleted. Tracked resources become eligible for deletion when their
+    session is released; entries loaded from disk at startup belong to a
+    dead process and are eligible straight away. Failed deletions are retried
+    with exponential backoff up to `max_attempts` times.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], openai.OpenAI],
+        path: Path = CLEANUP_QUEUE_PATH,
+        batch_size: int = CLEANUP_BATCH_SIZE,
+        max_attempts: int = CLEANUP_MAX_ATTEMPTS,
+        interval: float = CLEANUP_INTERVAL,
+        workers: int = CLEANUP_WORKERS,
+    ):
+        self.client_factory = client_factory
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.interval = interval
+        self.workers = workers
+
+        self._items: List[Dict] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._load()
+
+    # ------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"janitor: ignoring unreadable queue {self.path}: {e}")
+            return
+        for item in items:
+            # Whoever created these is gone, so nothing is still using them
+            item["owner"] = None
+        self._items = items
+        if items:
+            logger.debug(f"janitor: resuming cleanup of {len(items)} resources")
+
+    def _save(self):
+        """Writes the queue to disk; callers hold the lock."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._items, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"janitor: failed to save queue {self.path}: {e}")
+
+    # ------------------------------------------------------
+    # Registration
+    # ------------------------------------------------------
+
+    def track(self, kind: str, resource_id: str, owner=None):
+        """Queues a resource for deletion; it waits until `owner` is released."""
+        if kind not in RESOURCE_DELETERS:
+            raise ValueError(f"Unsupported resource kind: {kind}")
+        with self._cond:
+            self._items.append({
+                "kind": kind,
+                "id": resource_id,
+                "owner": owner,
+                "attempts": 0,
+                "not_before": 0,
+            })
+            self._save()
+            self._cond.notify()
+
+    def release(self, owner: str):
+        """Makes every resource tracked by `owner` eligible for deletion."""
+        with self._cond:
+            for item in self._items:
+                if item["owner"] == owner:
+                    item["owner"] = None
+            self._save()
+            self._cond.notify()
+
+    @contextmanager
+    def session(self):
+        """Tracks the resources of one task and releases them when the block exits."""
+        self.start()
+        cleanup = CleanupSession(self)
+        try:
+            yield cleanup
+        finally:
+            cleanup.release()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    # ------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------
+
+    def start(self) -> "ResourceJanitor":
+        """Starts the worker thread (idempotent)."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="janitor", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _take_batch(self) -> List[Dict]:
+        now = time.time()
+        return [
+            item for item in self._items
+            if item["owner"] is None and item["not_before"] <= now
+        ][:self.batch_size]
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="janitor") as executor:
+            while True:
+                with self._cond:
+                    batch = self._take_batch()
+                    while not batch and not self._stopping:
+                        self._cond.wait(timeout=self.interval)
+                        batch = self._take_batch()
+                    if self._stopping:
+                        return
+                try:
+                    client = self.client_factory()
+                    results = list(executor.map(lambda item: self._delete(client, item), batch))
+                except Exception as e:
+                    logger.warning(f"janitor: cleanup batch failed: {e}")
+                    results = [False] * len(batch)
+                self._finish_batch(batch, results)
+
+    def _delete(self, client: openai.OpenAI, item: Dict) -> bool:
+        try:
+            RESOURCE_DELETERS[item["kind"]](client, item["id"])
+            logger.debug(f"janitor: deleted {item['kind']} {item['id']}")
+        except openai.NotFoundError:
+            pass
+        except Exception as e:
+            logger.debug(f"janitor: failed to delete {item['kind']} {item['id']}: {e}")
+            return False
+        return True
+
+    def _finish_batch(self, batch: List[Dict], results: List[bool]):
+        with self._cond:
+            for item, deleted in zip(batch, results):
+                if deleted:
+                    self._items.remove(item)
+                    continue
+                item["attempts"] += 1
+                if item["attempts"] >= self.max_attempts:
+                    logger.error(f"janitor: giving up on {item['kind']} {item['id']} after {item['attempts']} attempts")
+                    self._items.remove(item)
+                else:
+                    item["not_before"] = time.time() + self.interval * (2 ** item["attempts"])
+            self._save()
@@ -0,0 +1,105 @@
+# Description: Background jobs for solving tasks without holding the HTTP connection open.
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from .config import JOB_WORKERS, JOB_MAX_PENDING, JOB_RESULT_TTL
+from .serving import AdmissionGate, admission_gate
+
+
+class Job:
+    """State of one submitted task; `result` is set once status is "succeeded"."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded worker pool and keeps their results for `result_ttl` seconds.
+
+    At most `workers` jobs run at once and `max_pending` more may wait;
+    `submit` returns None when the backlog is full. A job also holds a slot
+    of `gate` while it runs, so jobs and requests share MAX_INFLIGHT_REQUESTS;
+    it stays queued until a slot is free.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING, result_ttl: float = JOB_RESULT_TTL,
+                 gate: Optional[AdmissionGate] = admission_gate):
+        self.gate = gate
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args) -> Optional[Job]:
+        with self._lock:
+            self._purge()
+            if self._active >= self.workers + self.max_pending:
+                return None
+            job = Job()
+            self._jobs[job.id] = job
+            self._active += 1
+        self._executor.submit(self._run, job, fn, *args)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], *args):
+        if self.gate is not None:
+            self.gate.enter()
+        job.status = "running"
+        try:
+            job.result = fn(*args)
+            job.status = "succeeded"
+        except Exception as e:
+            logger.exception(f"job {job.id} failed")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            if self.gate is not None:
+                self.gate.leave()
+            job.finished_at = time.time()
+            with self._lock:
+                self._active -= 1
+            job.done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def _purge(self):
+        """Forgets finished jobs whose results have expired; callers hold the lock."""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
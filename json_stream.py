@@ -0,0 +1,118 @@
+# Description: Incremental parser for the JSON array replies of the LLM, handing out each
+# element of the array as soon as it is complete.
+
+import json
+from typing import Any, Callable, List
+
+from loguru import logger
+
+
+class JsonArrayStream:
+    """
+    Fed the text of a reply in chunks, calls `on_item` with each element of
+    its top-level JSON array as soon as the element closes: a string at its
+    closing quote, an object or array at its closing bracket, and a number or
+    literal at the next comma or ]. The reply must start with the array, as
+    for the parser of complete replies; otherwise the stream gives up and
+    `failed` is set. Elements that do not decode are left out. `done` is set
+    once the closing ] of the array has been seen.
+    """
+
+    def __init__(self, on_item: Callable[[Any], None]):
+        self.on_item = on_item
+        self.items: List[Any] = []
+        self.done = False
+        self.failed = False
+        self._started = False
+        self._depth = 0  # Bracket depth inside the array, 0 between elements
+        self._in_string = False
+        self._escape = False
+        self._element: List[str] = []  # Pieces of the element being read, from earlier chunks
+        self._element_open = False
+
+    def _emit(self, text: str):
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.debug(f"json stream: skipping element {text!r}: {e}")
+            return
+        self.items.append(item)
+        self.on_item(item)
+
+    def feed(self, text: str):
+        if self.done or self.failed:
+            return
+        position = 0
+        if not self._started:
+            stripped = text.lstrip()
+            if not stripped:
+                return
+            if stripped[0] != "[":
+                self.failed = True
+                return
+            self._started = True
+            position = len(text) - len(stripped) + 1
+
+        start = position  # Where the open element's text begins in this chunk
+        length = len(text)
+        while position < length:
+            char = text[position]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        self._close(text, start, position + 1)
+                else:
+                    # Skip to the next character that can end or escape the string
+                    quote, backslash = text.find('"', position), text.find("\\", position)
+                    stops = [stop for stop in (quote, backslash) if stop >= 0]
+                    position = min(stops) if stops else length
+                    continue
+                position += 1
+                continue
+
+            if char == '"':
+                if self._depth == 0:
+                    start = self._open(position)
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    start = self._open(position)
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    if char == "]":
+                        if self._element_open:
+                            self._close(text, start, position)
+                        self.done = True
+                    else:
+                        self.failed = True
+                    return
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close(text, start, position + 1)
+            elif self._depth == 0:
+                if char == ",":
+                    if self._element_open:
+                        self._close(text, start, position)
+                elif not char.isspace() and not self._element_open:
+                    start = self._open(position)
+            position += 1
+
+        if self._element_open:
+            self._element.append(text[start:])
+
+    def _open(self, position: int) -> int:
+        self._element_open = True
+        return position
+
+    def _close(self, text: str, start: int, end: int):
+        self._element.append(text[start:end])
+        element = "".join(self._element)
+        self._element = []
+        self._element_open = False
+        self._emit(element)
@@ -0,0 +1,175 @@
+# Description: LLM providers behind the chat inference engine.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from loguru import logger
+
+from .config import (
+    LLM_PROVIDER,
+    OPENAI_MODEL,
+    OPENAI_TEMPERATURE,
+    CHAT_RESPONSE_RESERVE,
+    LOCAL_MODEL_ENDPOINT,
+    LOCAL_PARALLEL_MODEL_ENDPOINT,
+    LOCAL_MODEL_TIMEOUT,
+    LOCAL_MAX_CONNECTIONS,
+    LOCAL_BATCH_SIZE,
+    LOCAL_BATCH_WAIT,
+)
+
+
+class OpenAIProvider:
+    """Chat completions through the OpenAI API."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def complete(self, messages: List[Dict[str, str]], on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Returns the reply; with on_text it is streamed and on_text gets each piece as it arrives."""
+        if on_text is None:
+            completion = self.client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                temperature=OPENAI_TEMPERATURE,
+                max_tokens=CHAT_RESPONSE_RESERVE,
+            )
+            return completion.choices[0].message.content
+
+        pieces = []
+        stream = self.client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            temperature=OPENAI_TEMPERATURE,
+            max_tokens=CHAT_RESPONSE_RESERVE,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            pieces.append(chunk.choices[0].delta.content)
+            on_text(pieces[-1])
+        return "".join(pieces)
+
+
+def _output_text(output) -> str:
+    """Extracts the generated text from a local endpoint output ({"text": ...} or a bare string)."""
+    if isinstance(output, dict):
+        return output.get("text", "")
+    return output
+
+
+class LocalProvider:
+    """
+    Chat completions served by a local inference box.
+
+    A single request goes to LOCAL_MODEL_ENDPOINT as
+        {"input": {"text": messages}, "temperature": ..., "max_new_tokens": ...}
+    and is answered with {"output": {"text": ...}}. When several tasks are
+    generating at once, their requests are collected for up to
+    LOCAL_BATCH_WAIT seconds, in batches of up to LOCAL_BATCH_SIZE, and
+    sent together to LOCAL_PARALLEL_MODEL_ENDPOINT as {"requests": [...]},
+    which answers with {"outputs": [...]} in the same order.
+
+    Requests share one keep-alive HTTP connection pool.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = LOCAL_MODEL_ENDPOINT,
+        parallel_endpoint: str = LOCAL_PARALLEL_MODEL_ENDPOINT,
+        batch_size: int = LOCAL_BATCH_SIZE,
+        batch_wait: float = LOCAL_BATCH_WAIT,
+        timeout: float = LOCAL_MODEL_TIMEOUT,
+        max_connections: int = LOCAL_MAX_CONNECTIONS,
+    ):
+        self.endpoint = endpoint
+        self.parallel_endpoint = parallel_endpoint
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.http = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._senders = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="local-llm")
+        self._dispatcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _payload(self, messages: List[Dict[str, str]]) -> Dict:
+        return {
+            "input": {"text": messages},
+            "temperature": OPENAI_TEMPERATURE,
+            "max_new_tokens": CHAT_RESPONSE_RESERVE,
+        }
+
+    def complete(self, messages: List[Dict[str, str]], on_text: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Queues a request for the next batch and waits for its text. The local
+        endpoints do not stream, so on_text gets the whole reply at once.
+        """
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="local-llm-batcher", daemon=True)
+                self._dispatcher.start()
+        future = Future()
+        self._queue.put((self._payload(messages), future))
+        text = future.result()
+        if on_text is not None:
+            on_text(text)
+        return text
+
+    def _dispatch(self):
+        while True:
+            batch = [self._queue.get()]
+            # Give concurrent tasks a moment to join the batch; the wait is per batch,
+            # so a trickle of requests cannot hold the first one back
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch):
+        try:
+            if len(batch) == 1:
+                response = self.http.post(self.endpoint, json=batch[0][0])
+                response.raise_for_status()
+                outputs = [response.json()["output"]]
+            else:
+                logger.debug(f"sending {len(batch)} requests to {self.parallel_endpoint}")
+                response = self.http.post(self.parallel_endpoint, json={"requests": [payload for payload, _ in batch]})
+                response.raise_for_status()
+                outputs = response.json()["outputs"]
+                if len(outputs) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} outputs, got {len(outputs)}")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(_output_text(output))
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider(client_factory=None):
+    """Returns the process-wide provider selected by LLM_PROVIDER."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if LLM_PROVIDER == "local":
+                    _provider = LocalProvider()
+                else:
+                    _provider = OpenAIProvider(client_factory())
+    return _provider
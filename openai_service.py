@@ -1,15 +1,52 @@
-from typing import Any, List, Dict
+from typing import Any, Callable, List, Dict, Optional, Tuple
 import io
 import time
 import asyncio
 import json
 import openai
 import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from loguru import logger
 from .config import *
 from .prompt import *
-from .web_utils import get_html_contents
+from .web_utils import content_hash, estimate_tokens, render_page, url_origin
+from .actions.parsing import ActionStream, parse_actions
+from .assistant_registry import assistant_registry
+from .janitor import ResourceJanitor
+from .json_stream import JsonArrayStream
+from .plan_cache import plan_cache
+from .llm_provider import get_provider
+from .prefetch import Prefetcher
+from .serving import BatchSlots
+from .site_index import get_page_html, site_index
+from .metrics import BYTES_UPLOADED, TURNS_PER_TASK, span
+
+
+ASSISTANT_TOOLS = [ {"type": "file_search"} ]  # Enables file reading
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> openai.OpenAI:
+    """Returns the process-wide OpenAI client, whose connection pool is shared by all requests."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                logger.debug("creating client...")
+                _client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+
+janitor = ResourceJanitor(_get_client)
+
+# Uploads run here rather than on the event loop's default executor, which
+# asyncio.run waits for on exit: a stuck upload must not hold up the round
+_upload_executor = ThreadPoolExecutor(thread_name_prefix="upload")
+
 
 def _parse_response_json_list(response: str) -> List:
         """Parses a JSON list response from the LLM."""
@@ -17,190 +54,542 @@ def _parse_response_json_list(response: str) -> List:
         resp_fmt = ' { "data": {response} } '.replace("{response}", response)
         logger.debug(f"resp_fmt {resp_fmt}")
 
-        try:
-            resp_json = json.loads(resp_fmt)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse JSON response: {e}")
+        with span("parse_response"):
+            try:
+                resp_json = json.loads(resp_fmt)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Failed to parse JSON response: {e}")
 
         logger.debug(f"resp_json {resp_json}")
         return resp_json["data"]
 
 
+def _parse_actions_reply(response: str, action_stream: Optional[ActionStream] = None) -> List:
+    """Parses the action list of a final-turn reply, reusing what action_stream validated while it streamed."""
+    data = _parse_response_json_list(response)
+    return action_stream.result(data) if action_stream is not None else parse_actions(data)
+
+
+def _action_stream() -> Optional[ActionStream]:
+    return ActionStream() if STREAM_REPLIES else None
+
+
+def _new_prefetcher(task_prompt, portal_url, portal_html) -> Optional[Prefetcher]:
+    """A prefetcher for speculative prefetching, or only for the URLs of streamed replies."""
+    if SPECULATIVE_PREFETCH:
+        return Prefetcher(task_prompt, portal_url, portal_html)
+    if STREAM_REPLIES:
+        return Prefetcher(task_prompt, portal_url, portal_html, top_n=0)
+    return None
+
+
+def _url_stream(prefetcher: Optional[Prefetcher], pages_seen) -> Optional[Callable[[str], None]]:
+    """Text callback of a discovery turn that starts fetching each new URL as soon as its string closes."""
+    if prefetcher is None or not STREAM_REPLIES:
+        return None
+
+    def _on_url(url):
+        if isinstance(url, str) and url not in pages_seen:
+            prefetcher.request(url)
+
+    return JsonArrayStream(_on_url).feed
+
+
+def _upload_page(client, file_name, page_html, cleanup) -> Dict:
+    """Uploads one cleaned page as an assistants file."""
+    logger.debug(f"file_name {file_name}");
+    logger.debug(f"page_size {len(page_html)}");
+    page_bytes = page_html.encode("utf-8")
+    with span("file_upload"):
+        response = client.files.create(file=(file_name, io.BytesIO(page_bytes)), purpose="assistants",
+                                       timeout=PAGE_FETCH_TIMEOUT)
+    BYTES_UPLOADED.inc(len(page_bytes))
+    cleanup.track("file", response.id)
+    return {
+        "file" : file_name,
+        "html" : page_html,
+        "id" : response.id
+    }
+
+
+async def _fetch_and_upload_pages(client, page_urls: List[str], first_index: int, cleanup) -> List:
+    """
+    Fetches, cleans and uploads a round of pages concurrently.
+
+    At most CRAWL_CONCURRENCY pages are in flight at once and each page's
+    fetch and upload together are bounded by PAGE_FETCH_TIMEOUT seconds, so
+    a round takes at most about as long as its slowest page. Work given up
+    on at the timeout finishes on background threads without holding up the
+    round, and the upload itself is cut off after PAGE_FETCH_TIMEOUT. Returns (page_url, page) pairs in request order, where page is None when
+    the page could not be fetched or uploaded; one failing page does not
+    lose the others.
+    """
+    semaphore = asyncio.Semaphore(CRAWL_CONCURRENCY)
+
+    async def _load(file_name, page_url):
+        page_html = await get_page_html(page_url)
+        if not page_html or not len(page_html.strip()):
+            logger.warning(f"failed to fetch {page_url} or empty")
+            return None
+
+        logger.debug(f"page_url {page_url}");
+        return await asyncio.get_running_loop().run_in_executor(
+            _upload_executor, _upload_page, client, file_name, page_html, cleanup
+        )
+
+    async def _fetch_and_upload(index, page_url):
+        file_name = "page{index}.html".format(index=index)
+        async with semaphore:
+            try:
+                page = await asyncio.wait_for(_load(file_name, page_url), timeout=PAGE_FETCH_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"timed out loading {page_url} after {PAGE_FETCH_TIMEOUT}s")
+                return page_url, None
+            except Exception as e:
+                logger.warning(f"failed to load {page_url}: {e}")
+                return page_url, None
+            return page_url, page
+
+    page_urls = list(dict.fromkeys(page_urls))
+    return await asyncio.gather(*[
+        _fetch_and_upload(first_index + offset, page_url)
+        for offset, page_url in enumerate(page_urls)
+    ])
+
+
+async def _fetch_pages(page_urls: List[str]) -> List[str]:
+    """Fetches and cleans pages concurrently, at most CRAWL_CONCURRENCY at a time."""
+    semaphore = asyncio.Semaphore(CRAWL_CONCURRENCY)
+
+    async def _fetch(page_url):
+        async with semaphore:
+            return await get_page_html(page_url)
+
+    return await asyncio.gather(*[_fetch(page_url) for page_url in page_urls])
+
+
+class SiteSession:
+    """
+    Vector store and uploaded pages shared by the tasks solved on one site.
+
+    Each page is fetched, uploaded and indexed once per session however many
+    tasks ask for it. A task that asks for a page another task is already
+    loading waits for it instead of loading it again.
+    """
+
+    def __init__(self, client, cleanup):
+        self.client = client
+        self.cleanup = cleanup
+        # Create a vector store caled "Web Automation Testbed Store"
+        vector_store = client.vector_stores.create(name="Web Automation Testbed Store")
+        cleanup.track("vector_store", vector_store.id)
+        logger.debug(f"vector_store {vector_store}")
+        self.vector_store_id = vector_store.id
+
+        self._pages: Dict[str, Future] = {}  # url -> future of the uploaded page, None if it failed
+        self._next_index = 0
+        self._lock = threading.Lock()
+
+    def _claim(self, page_urls):
+        """Returns the futures for page_urls, the urls this caller must load and their first file index."""
+        page_urls = list(dict.fromkeys(page_urls))
+        with self._lock:
+            claimed = [url for url in page_urls if url not in self._pages]
+            for url in claimed:
+                self._pages[url] = Future()
+            first_index = self._next_index
+            self._next_index += len(claimed)
+            return [(url, self._pages[url]) for url in page_urls], claimed, first_index
+
+    def _load(self, claimed, load):
+        """Runs load() for the claimed urls, indexes the uploads and publishes them to waiting tasks."""
+        loaded = {}
+        try:
+            loaded = dict(load())
+            file_id_list = [page["id"] for page in loaded.values() if page is not None]
+            if len(file_id_list) > 0:
+                with span("vector_store_indexing"):
+                    batch = self.client.vector_stores.file_batches.create_and_poll(
+                        vector_store_id=self.vector_store_id,
+                        file_ids=file_id_list
+                    )
+        except Exception:
+            loaded = {}
+            raise
+        finally:
+            for url in claimed:
+                self._pages[url].set_result(loaded.get(url))
+
+    def add_page(self, page_url, page_html) -> Optional[Dict]:
+        """Uploads a page whose HTML is already known, such as the portal page sent with a task."""
+        entries, claimed, first_index = self._claim([page_url])
+        if claimed:
+            file_name = "page{index}.html".format(index=first_index)
+            self._load(claimed, lambda: [(page_url, _upload_page(self.client, file_name, page_html, self.cleanup))])
+        return entries[0][1].result()
+
+    def get_pages(self, page_urls) -> List[Tuple[str, Optional[Dict]]]:
+        """Returns (page_url, page) for each url, fetching and uploading the ones not loaded yet."""
+        entries, claimed, first_index = self._claim(page_urls)
+        if claimed:
+            self._load(claimed, lambda: asyncio.run(
+                _fetch_and_upload_pages(self.client, claimed, first_index, self.cleanup)
+            ))
+        return [(url, future.result()) for url, future in entries]
+
+
+def _wait_for_run(client, thread_id, run_id):
+    """Polls a run until it stops, starting at RUN_POLL_INITIAL seconds and backing off to RUN_POLL_MAX."""
+    delay = RUN_POLL_INITIAL
+    while True:
+        run_status = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        if run_status.status not in ("queued", "in_progress", "cancelling"):
+            return run_status
+        time.sleep(delay)  # Wait before checking again
+        delay = min(delay * RUN_POLL_BACKOFF, RUN_POLL_MAX)
+
+
+def _run_assistant(client, thread_id, assistant_id, on_text=None):
+    """Runs the assistant on the thread and returns the text of its reply, or None if the run did not complete."""
+    if RUN_MODE == "stream":
+        # Completion is pushed to us as server-sent events instead of being polled
+        with client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id) as stream:
+            if on_text is not None:
+                for text in stream.text_deltas:
+                    on_text(text)
+            stream.until_done()
+            run = stream.get_final_run()
+            if run.status != "completed":
+                logger.debug(f"run {run.id} ended with status {run.status}")
+                return None
+            messages = stream.get_final_messages()
+        if messages:
+            return messages[-1].content[0].text.value
+    else:
+        run = client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
+        run = _wait_for_run(client, thread_id, run.id)
+        if run.status != "completed":
+            logger.debug(f"run {run.id} ended with status {run.status}")
+            return None
+
+    # Get AI's response
+    messages = client.beta.threads.messages.list(thread_id=thread_id, limit=1)
+    return messages.data[0].content[0].text.value  # Extract text response
+
+
+def _chat_with_assistant(client, thread_id, assistant_id, user_message, file_id_list, turn_timings=None, on_text=None):
+    """Sends a message to an assistant and gets a response, passing on_text the text deltas when runs stream."""
+    started = time.perf_counter()
+
+    # The files are already indexed in the session's vector store
+    attachments = []
+    for file_id in file_id_list:
+        attachments.append({
+            "file_id": file_id, "tools": [{"type": "file_search"}]
+        })
+
+    # Add the user's message to the thread
+    client.beta.threads.messages.create(
+        thread_id=thread_id,
+        role="user",
+        content=user_message,
+        attachments=attachments
+    )
+
+    # Run the assistant to generate a response
+    with span("assistant_run"):
+        response = _run_assistant(client, thread_id, assistant_id, on_text)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"assistant turn took {elapsed:.3f}s")
+    if turn_timings is not None:
+        turn_timings.append(elapsed)
+    return response
+
+
+def _resolve_portal_html(portal_url, portal_html):
+    """Returns the portal HTML sent with the task, fetching the page when none was sent."""
+    if portal_html is None or not len(portal_html.strip()):
+        logger.debug("refetching the portal page...")
+        with span("portal_fetch"):
+            portal_html = asyncio.run(get_page_html(portal_url))
+        logger.debug(f"portal page size  {len(portal_html)}")
+    elif PAGE_FORMAT == "outline":
+        portal_html = render_page(portal_html, PAGE_FORMAT, portal_url)
+    return portal_html
+
+
+def _first_mission_prompt(task_prompt, portal_url, file_uploaded) -> str:
+    user_prompt = FIRST_MISSION_PROMPT.format(
+                    task_prompt=task_prompt,
+                    portal_url=portal_url,
+                    file_uploaded=file_uploaded)
+    if PAGE_FORMAT == "outline":
+        user_prompt += OUTLINE_FORMAT_PROMPT
+    return user_prompt
+
+
+def _indexed_mission_prompt(task_prompt, portal_url, urls_uploaded) -> str:
+    user_prompt = INDEXED_MISSION_PROMPT.format(
+                    task_prompt=task_prompt,
+                    portal_url=portal_url,
+                    urls_uploaded=urls_uploaded)
+    if PAGE_FORMAT == "outline":
+        user_prompt += OUTLINE_FORMAT_PROMPT
+    return user_prompt
+
+
+def _indexed_site_pages(portal_url, portal_html) -> Optional[List[str]]:
+    """
+    Returns the pages reachable from the portal when the site index holds all
+    of them, so URL discovery becomes a lookup. Otherwise starts indexing them
+    in the background for later tasks and returns None.
+    """
+    if not SITE_INDEX_ENABLED:
+        return None
+    page_urls = site_index.covered_pages(portal_url, portal_html)
+    if page_urls is None:
+        site_index.crawl(portal_url, portal_html)
+    return page_urls
 
 
-def infer_actions(task_prompt, portal_url, portal_html):
+def solve_task(task_prompt, portal_url, portal_html, engine=None) -> Tuple[List, bool]:
+    """
+    Returns (actions, cache_hit). Plans are served from the plan cache when the
+    same prompt arrives for the same URL and the page contents have not changed.
+    """
+    portal_html = _resolve_portal_html(portal_url, portal_html)
+    if not PLAN_CACHE_ENABLED or portal_html is None or not len(portal_html.strip()):
+        return infer_actions(task_prompt, portal_url, portal_html, engine, resolved=True), False
+
+    page_hash = content_hash(portal_html)
+    actions = plan_cache.get(task_prompt, portal_url, page_hash)
+    if actions is not None:
+        logger.debug(f"plan cache hit for {portal_url}")
+        return actions, True
+
+    actions = infer_actions(task_prompt, portal_url, portal_html, engine, resolved=True)
+    if actions:
+        plan_cache.put(task_prompt, portal_url, page_hash, actions)
+    return actions, False
+
+
+def solve_tasks(tasks: List[Dict], slots: Optional[BatchSlots] = None) -> List[Tuple[List, bool]]:
+    """
+    Solves a batch of tasks and returns (actions, cache_hit) for each, in order.
+
+    Portal pages are fetched once per distinct URL. Tasks on the same origin
+    share one SiteSession, so every page is uploaded once to a shared vector
+    store, and the per-task assistant turns run in parallel, at most
+    BATCH_CONCURRENCY at a time. Tasks answered by the chat engine skip the
+    sessions. A task that fails gets an empty action list.
+
+    With `slots`, each task holds an admission gate slot while it runs, so a
+    batch shares MAX_INFLIGHT_REQUESTS with the other requests.
+    """
+    def _gated(fn, *args):
+        if slots is None:
+            return fn(*args)
+        with slots.slot():
+            return fn(*args)
+
+    results: List[Optional[Tuple[List, bool]]] = [None] * len(tasks)
+
+    missing_urls = list(dict.fromkeys(
+        task["url"] for task in tasks if not (task.get("html") or "").strip()
+    ))
+    fetched_html = dict(zip(missing_urls, asyncio.run(_fetch_pages(missing_urls))))
+
+    groups: Dict[str, List] = {}
+    for index, task in enumerate(tasks):
+        task_prompt, portal_url = task["prompt"], task["url"]
+        portal_html = task.get("html") or ""
+        if not portal_html.strip():
+            portal_html = fetched_html.get(portal_url) or ""
+        elif PAGE_FORMAT == "outline":
+            portal_html = render_page(portal_html, PAGE_FORMAT, portal_url)
+        if not portal_html.strip():
+            logger.debug(f"failed to fetch the portal page {portal_url} or empty")
+            results[index] = ([], False)
+            continue
+
+        page_hash = content_hash(portal_html)
+        if PLAN_CACHE_ENABLED:
+            actions = plan_cache.get(task_prompt, portal_url, page_hash)
+            if actions is not None:
+                results[index] = (actions, True)
+                continue
+        engine = _select_engine(task.get("engine"), task_prompt, portal_url, portal_html)
+        if engine == "chat":
+            # Pages are inlined in the conversation, there is nothing to share
+            groups.setdefault(None, []).append((index, task_prompt, portal_url, portal_html, page_hash))
+        else:
+            groups.setdefault(url_origin(portal_url), []).append((index, task_prompt, portal_url, portal_html, page_hash))
+
+    with janitor.session() as cleanup, ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+        futures = []
+        for origin, group in groups.items():
+            if origin is None:
+                logger.debug(f"solving {len(group)} tasks with the chat engine")
+                for index, task_prompt, portal_url, portal_html, page_hash in group:
+                    future = executor.submit(_gated, _infer_actions_with_chat, task_prompt, portal_url, portal_html)
+                    futures.append((future, index, task_prompt, portal_url, page_hash))
+                continue
+
+            logger.debug(f"solving {len(group)} tasks on {origin}")
+            session = SiteSession(_get_client(), cleanup)
+            for index, task_prompt, portal_url, portal_html, page_hash in group:
+                future = executor.submit(_gated, _infer_actions_in_session, session, task_prompt, portal_url, portal_html)
+                futures.append((future, index, task_prompt, portal_url, page_hash))
+
+        for future, index, task_prompt, portal_url, page_hash in futures:
+            try:
+                actions = future.result()
+            except Exception as e:
+                logger.exception(f"batch task {index} failed: {e}")
+                actions = []
+            if actions and PLAN_CACHE_ENABLED:
+                plan_cache.put(task_prompt, portal_url, page_hash, actions)
+            results[index] = (actions, False)
+
+    return results
+
+
+def infer_actions(task_prompt, portal_url, portal_html, engine=None, resolved=False):
+    """`resolved` means portal_html already went through _resolve_portal_html."""
+    with span("infer_actions"):
+        return _infer_actions(task_prompt, portal_url, portal_html, engine, resolved)
+
+
+def _infer_actions(task_prompt, portal_url, portal_html, engine=None, resolved=False):
     logger.debug("getting inference for actions");
     logger.debug(f"task_prompt: {task_prompt}")
     logger.debug(f"portal_url: {portal_url}")
     logger.debug(f"portal_html: {portal_html}")
 
-    if portal_html is None or not len(portal_html.strip()):
-        logger.debug("refetching the portal page...")
-        portal_html = asyncio.run(get_html_contents(portal_url))
-        logger.debug(f"portal page size  {len(portal_html)}")
+    if not resolved:
+        portal_html = _resolve_portal_html(portal_url, portal_html)
     if portal_html is None or not len(portal_html.strip()):
         logger.debug("failed to fetch the portal page or empty")
         return []
 
-    # Set up OpenAI client
-    logger.debug("creating client...")
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
-    # Create a vector store caled "Web Automation Testbed Store"
-    vector_store = client.vector_stores.create(name="Web Automation Testbed Store")
-    logger.debug(f"vector_store {vector_store}")
+    engine = _select_engine(engine, task_prompt, portal_url, portal_html)
+    logger.debug(f"inference engine: {engine}")
+    if engine == "chat":
+        return _infer_actions_with_chat(task_prompt, portal_url, portal_html)
+
+    # Everything created for this task is deleted in the background once it is done
+    with janitor.session() as cleanup:
+        session = SiteSession(_get_client(), cleanup)
+        return _infer_actions_in_session(session, task_prompt, portal_url, portal_html)
+
+
+def _infer_actions_in_session(session, task_prompt, portal_url, portal_html):
+    client = session.client
 
-    logger.debug("creating assistant...")
-    assistant = client.beta.assistants.create(
+    # The assistant is shared by every task; files reach it through the thread
+    assistant_id = assistant_registry.get_assistant_id(
+        client,
         name="The Web Automation Action Generator",
-        instructions=SYSTEM_PROMPT,
         model=OPENAI_MODEL,
-        tools=[ {"type": "file_search"} ],  # Enables file reading
-        tool_resources={
-            "file_search": {
-                "vector_store_ids": [ vector_store.id ]
-            }
-        }
+        instructions=SYSTEM_PROMPT,
+        tools=ASSISTANT_TOOLS,
     )
-    assistant_id = assistant.id
     logger.debug("creating thread...")
     response = client.beta.threads.create(
         tool_resources={
             "file_search": {
-                "vector_store_ids": [ vector_store.id ]
+                "vector_store_ids": [ session.vector_store_id ]
             }
         }
     )
     thread_id = response.id
+    session.cleanup.track("thread", thread_id)
 
     logger.debug("getting upload pages")
-    file_obj = io.BytesIO(portal_html.encode("utf-8"))
-    response = client.files.create(file=("page0.html", file_obj), purpose="assistants")
-    portal_file_id = response.id
-    pages_uploaded = {
-        portal_url : {
-            "file": "page0.html",
-            "html": portal_html,
-            "id": portal_file_id
-        }
-    }
+    portal_page = session.add_page(portal_url, portal_html)
+    if portal_page is None:
+        logger.debug("failed to upload the portal page")
+        return []
+    # Pages this task has been given or that failed, so they are not requested twice
+    pages_seen = { portal_url }
+
+    turn_timings = []
 
     # Send a message and get a response (while keeping context)
-    def _chat_with_assistant(user_message, file_id_list):
-        """Sends a message to an assistant and gets a response."""
-
-        attachments = []
-        if len(file_id_list) > 0:
-            batch = client.vector_stores.file_batches.create_and_poll(
-                vector_store_id=vector_store.id,
-                file_ids=file_id_list
-            )
-            for file_id in file_id_list:
-                attachments.append({
-                    "file_id": file_id, "tools": [{"type": "file_search"}]
-                })
-
-        # Add the user's message to the thread
-        client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=user_message,
-            attachments=attachments
-        )
+    def _chat(user_message, file_id_list, on_text=None):
+        return _chat_with_assistant(client, thread_id, assistant_id,
+                                    user_message, file_id_list, turn_timings, on_text)
 
-        # Run the assistant to generate a response
-        run = client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
+    indexed_urls = _indexed_site_pages(portal_url, portal_html)
+    if indexed_urls is not None:
+        # Every page reachable from the portal is indexed, skip the discovery turns
+        mapping_list = [ portal_url + " : " + portal_page["file"] ]
+        for page_url, page in session.get_pages(indexed_urls):
+            if page is not None:
+                mapping_list.append(page_url + " : " + page["file"])
+        user_prompt = _indexed_mission_prompt(task_prompt, portal_url, "\n".join(mapping_list))
+        user_prompt += "\n" + OUTPUT_REQ_PROMPT
+        logger.debug(f"indexed prompt: {user_prompt}")
+        # The other pages reach file_search through the session's vector store
+        action_stream = _action_stream()
+        response = _chat(user_prompt, [ portal_page["id"] ], action_stream.feed if action_stream else None)
+        logger.debug(f"action response: {response}")
+        action_list = _parse_actions_reply(response, action_stream)
+        logger.info(f"site index covered {len(indexed_urls)} pages, assistant turn took {sum(turn_timings):.3f}s")
+        TURNS_PER_TASK.observe(len(turn_timings), engine="assistants")
+        return action_list
 
-        # Wait for the assistant to process the request
-        while True:
-            run_status = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
-            if run_status.status == "completed":
-                break
-            elif run_status.status == "expired":
-                return None
-            elif run_status.status == "failed":
-                return None
-            elif run_status.status == "incomplete":
-                return None
-            elif run_status.status == "cancelled":
-                return None
-            else:
-                time.sleep(1)  # Wait before checking again
+    prefetcher = _new_prefetcher(task_prompt, portal_url, portal_html)
+    try:
+        user_prompt = _first_mission_prompt(task_prompt, portal_url, portal_page["file"])
+        user_prompt += "\n" + OUTPUT_REQ_PROMPT
+    
+        logger.debug(f"first prompt: {user_prompt}")
+        response = _chat(user_prompt, [ portal_page["id"] ], _url_stream(prefetcher, pages_seen))
+        logger.debug(f"first response: {response}")
+        # return []
+        url_list = _parse_response_json_list(response)
+        url_list = [ url for url in url_list if url not in pages_seen ]
+        logger.debug(f"first response url: {url_list}")
 
-        # Get AI's response
-        messages = client.beta.threads.messages.list(thread_id=thread_id)
-        return messages.data[0].content[0].text.value  # Extract text response
+        while len(url_list) > 0:
+            file_id_list = []
+            mapping_list = []
+            pages_seen.update(url_list)
+            if prefetcher is not None:
+                prefetcher.wait(url_list)
+            for page_url, page in session.get_pages(url_list):
+                if page is None:
+                    continue
+                file_id_list.append(page["id"])
+                mapping_list.append(page_url + " : " + page["file"])
 
-    user_prompt = FIRST_MISSION_PROMPT.format(
-                    task_prompt=task_prompt,
-                    portal_url=portal_url,
-                    file_uploaded="page0.html")
-    user_prompt += "\n" + OUTPUT_REQ_PROMPT
-    
-    logger.debug(f"first prompt: {user_prompt}")
-    response = _chat_with_assistant(user_prompt, [ portal_file_id ])
-    logger.debug(f"first response: {response}")
-    # return []
-    url_list = _parse_response_json_list(response)
-    url_list = [ url for url in url_list if url not in pages_uploaded ]
-    logger.debug(f"first response url: {url_list}")
-
-    total_file_id_list = []
-    while len(url_list) > 0:
-        file_id_list = []
-        mapping_list = []
-        for page_url in url_list:
-            page_html = asyncio.run(get_html_contents(page_url))
-            file_name = "page{index}.html".format(index=len(pages_uploaded))
-            logger.debug(f"page_url {page_url}");
-            logger.debug(f"file_name {file_name}");
-            logger.debug(f"page_size {len(page_html)}");
-
-            file_obj = io.BytesIO(page_html.encode("utf-8"))
-            response = client.files.create(file=(file_name, file_obj), purpose="assistants")
-            file_id = response.id
-            file_id_list.append(file_id)
-            total_file_id_list.append(file_id)
-            pages_uploaded[page_url] = {
-                "file" : file_name,
-                "html" : page_html,
-                "id" : file_id
-            }
-            mapping_list.append(page_url + " : " + file_name)
+            urls_uploaded = "\n".join(mapping_list)
+            logger.debug(f"file_id_list {file_id_list}")
+            logger.debug(f"url_uploaded {urls_uploaded}")
+            user_prompt = NEXT_MISSION_PROMPT.format(urls_uploaded=urls_uploaded)
+            user_prompt += "\n" + OUTPUT_REQ_PROMPT
+            logger.debug(f"again prompt: {user_prompt}")
+            response = _chat(user_prompt, file_id_list, _url_stream(prefetcher, pages_seen))
+            logger.debug(f"again response: {response}")
+            url_list = _parse_response_json_list(response)
+            url_list = [ url for url in url_list if url not in pages_seen ]
+            logger.debug(f"again response url: {url_list}")
 
-        urls_uploaded = "\n".join(mapping_list)
-        logger.debug(f"file_id_list {file_id_list}")
-        logger.debug(f"url_uploaded {urls_uploaded}")
-        user_prompt = NEXT_MISSION_PROMPT.format(urls_uploaded=urls_uploaded)
-        user_prompt += "\n" + OUTPUT_REQ_PROMPT
-        logger.debug(f"again prompt: {user_prompt}")
-        response = _chat_with_assistant(user_prompt, file_id_list)
-        logger.debug(f"again response: {response}")
-        url_list = _parse_response_json_list(response)
-        url_list = [ url for url in url_list if url not in pages_uploaded ]
-        logger.debug(f"again response url: {url_list}")
-
-    user_prompt = LAST_MISSION_PROMPT + "\n" + OUTPUT_REQ_PROMPT
-    logger.debug(f"action prompt: {user_prompt}")
-    response = _chat_with_assistant(user_prompt, [])
-    logger.debug(f"action response: {response}")
-    action_list = _parse_response_json_list(response)
-    logger.debug(f"action list: {action_list}")
-
-    # List all files in vector store
-    files = client.vector_stores.files.list(vector_store.id)
-    # Delete each file from vector store
-    for file in files.data:
-        logger.debug(f"Deleting file {file.id} from vector_store %{vector_store.id}")
-        client.vector_stores.files.delete(vector_store_id = vector_store.id, file_id = file.id)
-    # Delete vector store
-    logger.debug(f"Deleting vector_store %{vector_store.id}")
-    client.vector_stores.delete(vector_store.id)
-    # Delete files uploaded
-    for file_id in total_file_id_list:
-        logger.debug(f"Deleting file: {file.id}")
-        client.files.delete(file_id)
-    logger.debug(f"Deleting assistant {assistant.id}")
-    client.beta.assistants.delete(assistant.id)
+        user_prompt = LAST_MISSION_PROMPT + "\n" + OUTPUT_REQ_PROMPT
+        logger.debug(f"action prompt: {user_prompt}")
+        action_stream = _action_stream()
+        response = _chat(user_prompt, [], action_stream.feed if action_stream else None)
+        logger.debug(f"action response: {response}")
+        action_list = _parse_actions_reply(response, action_stream)
+        logger.debug(f"action list: {action_list}")
+        logger.info(f"{len(turn_timings)} assistant turns took {sum(turn_timings):.3f}s "
+                    f"({', '.join(f'{t:.3f}s' for t in turn_timings)})")
+        TURNS_PER_TASK.observe(len(turn_timings), engine="assistants")
+    finally:
+        if prefetcher is not None:
+            prefetcher.finish()
 
     #for store in client.vector_stores.list():
     #    try:
@@ -219,3 +608,158 @@ def infer_actions(task_prompt, portal_url, portal_html):
     #        pass
 
     return action_list
+
+
+def _chat_budget() -> int:
+    """Prompt tokens available to the chat engine."""
+    return LLM_CONTEXT_WINDOW - CHAT_RESPONSE_RESERVE
+
+
+TRUNCATED_MARKER = "\n<!-- truncated -->\n"
+
+
+def _fit_page_prompt(page_prompt, budget, page_url) -> Optional[str]:
+    """Cuts an inlined page down to `budget` tokens, or returns None when there is no room left for it."""
+    if estimate_tokens(page_prompt) <= budget:
+        return page_prompt
+    if budget <= estimate_tokens(TRUNCATED_MARKER):
+        logger.warning(f"context window full, leaving out {page_url}")
+        return None
+    logger.warning(f"truncating {page_url} to fit the context window")
+    return page_prompt[:(budget - estimate_tokens(TRUNCATED_MARKER)) * 4] + TRUNCATED_MARKER
+
+
+def _first_chat_prompt(task_prompt, portal_url, portal_html, budget: Optional[int] = None) -> str:
+    """The first chat turn; with `budget`, the portal page is truncated so the turn fits in that many tokens."""
+    user_prompt = _first_mission_prompt(task_prompt, portal_url, "page0.html")
+    page_prompt = INLINE_PAGE_PROMPT.format(file_name="page0.html", page_url=portal_url, page_html=portal_html)
+    tail = "\n" + OUTPUT_REQ_PROMPT
+    if budget is not None:
+        page_prompt = _fit_page_prompt(page_prompt, budget - estimate_tokens(user_prompt + tail), portal_url) or ""
+    return user_prompt + page_prompt + tail
+
+
+def _select_engine(engine, task_prompt, portal_url, portal_html) -> str:
+    """Resolves "auto" to "chat" when the first turn fits the context window, else "assistants"."""
+    if LLM_PROVIDER == "local":
+        # The local model has no assistants API, so pages over the budget are truncated
+        # to fit LLM_CONTEXT_WINDOW, the window of the local model, instead
+        return "chat"
+    engine = engine or INFERENCE_ENGINE
+    if engine != "auto":
+        return engine
+    first_turn = SYSTEM_PROMPT + _first_chat_prompt(task_prompt, portal_url, portal_html)
+    return "chat" if estimate_tokens(first_turn) <= _chat_budget() else "assistants"
+
+
+def _infer_actions_with_chat(task_prompt, portal_url, portal_html):
+    """
+    Chat-completions engine: pages are inlined in the conversation instead of
+    going through a vector store and file_search. The conversation is kept
+    within LLM_CONTEXT_WINDOW; pages that do not fit, the portal page
+    included, are truncated. Turns go to the provider selected by LLM_PROVIDER.
+    """
+    provider = get_provider(_get_client)
+    turn_timings = []
+    messages = [ {"role": "system", "content": SYSTEM_PROMPT} ]
+
+    def _chat(user_message, on_text=None):
+        messages.append({"role": "user", "content": user_message})
+        started = time.perf_counter()
+        with span("chat_completion"):
+            response = provider.complete(messages, on_text)
+        elapsed = time.perf_counter() - started
+        logger.info(f"chat turn took {elapsed:.3f}s")
+        turn_timings.append(elapsed)
+        messages.append({"role": "assistant", "content": response})
+        return response
+
+    def _tokens_left():
+        return _chat_budget() - sum(estimate_tokens(message["content"]) for message in messages)
+
+    indexed_urls = _indexed_site_pages(portal_url, portal_html)
+    if indexed_urls is not None:
+        # Every page reachable from the portal is indexed; inline them all if they fit
+        mapping_list = [ portal_url + " : page0.html" ]
+        inlined_pages = INLINE_PAGE_PROMPT.format(file_name="page0.html", page_url=portal_url, page_html=portal_html)
+        for page_url, page_html in zip(indexed_urls, asyncio.run(_fetch_pages(indexed_urls))):
+            if not page_html or not len(page_html.strip()):
+                continue
+            file_name = "page{index}.html".format(index=len(mapping_list))
+            mapping_list.append(page_url + " : " + file_name)
+            inlined_pages += INLINE_PAGE_PROMPT.format(file_name=file_name, page_url=page_url, page_html=page_html)
+        user_prompt = _indexed_mission_prompt(task_prompt, portal_url, "\n".join(mapping_list))
+        user_prompt += inlined_pages + "\n" + OUTPUT_REQ_PROMPT
+        if estimate_tokens(user_prompt) <= _tokens_left():
+            logger.debug(f"indexed prompt: {user_prompt}")
+            action_stream = _action_stream()
+            response = _chat(user_prompt, action_stream.feed if action_stream else None)
+            logger.debug(f"action response: {response}")
+            action_list = _parse_actions_reply(response, action_stream)
+            logger.info(f"site index covered {len(indexed_urls)} pages, chat turn took {sum(turn_timings):.3f}s")
+            TURNS_PER_TASK.observe(len(turn_timings), engine="chat")
+            return action_list
+        logger.debug("indexed pages do not fit the context window, discovering URLs instead")
+
+    prefetcher = _new_prefetcher(task_prompt, portal_url, portal_html)
+    try:
+        # Room is left for the final turn's prompt, like the discovery rounds do
+        budget = _tokens_left() - estimate_tokens(LAST_MISSION_PROMPT + "\n" + OUTPUT_REQ_PROMPT)
+        user_prompt = _first_chat_prompt(task_prompt, portal_url, portal_html, budget)
+        logger.debug(f"first prompt: {user_prompt}")
+        pages_seen = { portal_url }
+        response = _chat(user_prompt, _url_stream(prefetcher, pages_seen))
+        logger.debug(f"first response: {response}")
+        url_list = _parse_response_json_list(response)
+        page_count = 1
+        url_list = [ url for url in url_list if url not in pages_seen ]
+        logger.debug(f"first response url: {url_list}")
+
+        while len(url_list) > 0:
+            pages_seen.update(url_list)
+            if prefetcher is not None:
+                prefetcher.wait(url_list)
+            fetched = asyncio.run(_fetch_pages(url_list))
+            budget = _tokens_left() - estimate_tokens(NEXT_MISSION_PROMPT + OUTPUT_REQ_PROMPT)
+            mapping_list = []
+            inlined_pages = ""
+            for page_url, page_html in zip(url_list, fetched):
+                if not page_html or not len(page_html.strip()):
+                    continue
+                file_name = "page{index}.html".format(index=page_count)
+                page_prompt = _fit_page_prompt(
+                    INLINE_PAGE_PROMPT.format(file_name=file_name, page_url=page_url, page_html=page_html),
+                    budget, page_url,
+                )
+                if page_prompt is None:
+                    continue
+                budget -= estimate_tokens(page_prompt)
+                page_count += 1
+                mapping_list.append(page_url + " : " + file_name)
+                inlined_pages += page_prompt
+
+            urls_uploaded = "\n".join(mapping_list)
+            user_prompt = NEXT_MISSION_PROMPT.format(urls_uploaded=urls_uploaded)
+            user_prompt += inlined_pages
+            user_prompt += "\n" + OUTPUT_REQ_PROMPT
+            logger.debug(f"again prompt: {user_prompt}")
+            response = _chat(user_prompt, _url_stream(prefetcher, pages_seen))
+            logger.debug(f"again response: {response}")
+            url_list = _parse_response_json_list(response)
+            url_list = [ url for url in url_list if url not in pages_seen ]
+            logger.debug(f"again response url: {url_list}")
+
+        user_prompt = LAST_MISSION_PROMPT + "\n" + OUTPUT_REQ_PROMPT
+        logger.debug(f"action prompt: {user_prompt}")
+        action_stream = _action_stream()
+        response = _chat(user_prompt, action_stream.feed if action_stream else None)
+        logger.debug(f"action response: {response}")
+        action_list = _parse_actions_reply(response, action_stream)
+        logger.debug(f"action list: {action_list}")
+        logger.info(f"{len(turn_timings)} chat turns took {sum(turn_timings):.3f}s "
+                    f"({', '.join(f'{t:.3f}s' for t in turn_timings)})")
+        TURNS_PER_TASK.observe(len(turn_timings), engine="chat")
+        return action_list
+    finally:
+        if prefetcher is not None:
+            prefetcher.finish()
@@ -0,0 +1,55 @@
+# Description: Cache of inferred action plans keyed by task prompt, URL and page contents.
+
+import copy
+from typing import Any, Dict, List, Optional
+
+from .cache import LRUCache
+from .config import PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_TTL
+from .web_utils import canonicalize_url
+
+
+def normalize_prompt(task_prompt: str) -> str:
+    """
+    Collapses whitespace so trivial variations share an entry. Case is kept:
+    prompts often carry text to type (passwords, usernames, search terms).
+    """
+    return " ".join(task_prompt.split())
+
+
+class PlanCache:
+    """
+    Maps (normalized prompt, canonical URL, page content hash) to the action
+    list inferred for it. A changed page yields a different hash, so stale
+    plans are never served for a page that has changed.
+    """
+
+    def __init__(self, max_entries: int = PLAN_CACHE_MAX_ENTRIES, ttl: float = PLAN_CACHE_TTL):
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl)
+
+    @staticmethod
+    def _key(task_prompt: str, page_url: str, page_hash: str):
+        return (normalize_prompt(task_prompt), canonicalize_url(page_url), page_hash)
+
+    def get(self, task_prompt: str, page_url: str, page_hash: str) -> Optional[List[Any]]:
+        actions = self._cache.get(self._key(task_prompt, page_url, page_hash))
+        # Hand out copies so callers cannot mutate the cached plan
+        return copy.deepcopy(actions) if actions is not None else None
+
+    def put(self, task_prompt: str, page_url: str, page_hash: str, actions: List[Any]):
+        self._cache.put(self._key(task_prompt, page_url, page_hash), copy.deepcopy(actions))
+
+    def invalidate(self, task_prompt: Optional[str] = None, page_url: Optional[str] = None) -> int:
+        """Drops the plans matching the prompt and/or URL (all plans when neither is given)."""
+        prompt_key = normalize_prompt(task_prompt) if task_prompt is not None else None
+        url_key = canonicalize_url(page_url) if page_url is not None else None
+
+        def _matches(key, _):
+            return (prompt_key is None or key[0] == prompt_key) and (url_key is None or key[1] == url_key)
+
+        return self._cache.remove_if(_matches)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+plan_cache = PlanCache()
@@ -0,0 +1,211 @@
+# Description: Speculative prefetching of the pages a task is likely to ask for.
+
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Any, Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from .config import (
+    CRAWL_CONCURRENCY,
+    PAGE_FETCH_TIMEOUT,
+    PREFETCH_TOP_N,
+)
+from .site_index import get_page_html
+from .web_utils import canonicalize_url, extract_links
+
+
+STOP_WORDS = frozenset([
+    "the", "and", "for", "with", "that", "this", "from", "into", "your", "you",
+    "then", "page", "click", "on", "to", "of", "in", "a", "an", "is", "it", "go",
+])
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 1 and word not in STOP_WORDS]
+
+
+def rank_links(task_prompt: str, links: List[Tuple[str, str]]) -> List[str]:
+    """
+    Orders links by how many task prompt words appear in their anchor text
+    (counted twice) and URL path. Links matching nothing are dropped; ties keep
+    page order.
+    """
+    prompt_words = set(_words(task_prompt))
+    scored = []
+    for position, (url, text) in enumerate(links):
+        score = 2 * len(prompt_words.intersection(_words(text))) + len(prompt_words.intersection(_words(urlsplit(url).path)))
+        if score > 0:
+            scored.append((-score, position, url))
+    return [url for _, _, url in sorted(scored)]
+
+
+class PrefetchStats:
+    """Process-wide counters of how useful speculative prefetching has been."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.prefetched = 0  # Pages fetched speculatively
+        self.requested = 0  # Pages the model asked for
+        self.hits = 0  # Requested pages that had been prefetched
+        self.wasted = 0  # Prefetched pages the model never asked for
+        self.wasted_seconds = 0.0  # Fetch time spent on those pages
+        self.streamed = 0  # Pages fetched while the reply asking for them was still streaming
+
+    def record(self, prefetched: int, requested: int, hits: int, wasted: int, wasted_seconds: float, streamed: int = 0):
+        with self._lock:
+            self.tasks += 1
+            self.streamed += streamed
+            self.prefetched += prefetched
+            self.requested += requested
+            self.hits += hits
+            self.wasted += wasted
+            self.wasted_seconds += wasted_seconds
+
+    def record_streamed(self, streamed: int):
+        """Counts pages fetched while streaming for a task that did no speculative prefetching."""
+        with self._lock:
+            self.streamed += streamed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tasks": self.tasks,
+                "prefetched": self.prefetched,
+                "requested": self.requested,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "wasted_seconds": round(self.wasted_seconds, 3),
+                "streamed": self.streamed,
+                "hit_rate": self.hits / self.requested if self.requested else 0.0,
+                "waste_ratio": self.wasted / self.prefetched if self.prefetched else 0.0,
+            }
+
+
+prefetch_stats = PrefetchStats()
+
+_executor = ThreadPoolExecutor(max_workers=CRAWL_CONCURRENCY, thread_name_prefix="prefetch")
+
+
+def _fetch(page_url: str) -> Tuple[str, float]:
+    started = time.perf_counter()
+    page_html = asyncio.run(get_page_html(page_url))
+    return page_html, time.perf_counter() - started
+
+
+class Prefetcher:
+    """
+    Fetches, in the background, the top_n same-origin links of the portal page
+    that best match the task prompt. Pages land in the page cache, so once the
+    model asks for them the regular fetch path finds them ready.
+
+    request() starts fetching a URL as soon as the model has written it, while
+    the rest of its reply is still streaming; with top_n=0 those are the only
+    pages fetched.
+
+    Call wait() with the URLs the model asked for before fetching them, and
+    finish() when the task is done to record hit and waste counts. Tasks
+    with top_n=0 only add to the streamed count.
+    """
+
+    def __init__(self, task_prompt: str, portal_url: str, portal_html: str, top_n: int = PREFETCH_TOP_N):
+        self._futures: Dict[str, Future] = {}  # canonical url -> future of (html, seconds)
+        self._streamed: Dict[str, Future] = {}  # Same, for the pages started by request()
+        self._requested = set()
+        self._hits = 0
+        self._lock = threading.Lock()
+        self._finished = False
+        self._top_n = top_n
+        # Link extraction parses the whole page, keep it off the first turn as well
+        self._planned = _executor.submit(self._plan, task_prompt, portal_url, portal_html, top_n) if top_n > 0 else None
+
+    def _plan(self, task_prompt, portal_url, portal_html, top_n):
+        urls = rank_links(task_prompt, extract_links(portal_html, portal_url))[:top_n]
+        logger.debug(f"prefetching {urls}")
+        with self._lock:
+            if self._finished:
+                return
+            for url in urls:
+                self._futures[canonicalize_url(url)] = _executor.submit(_fetch, url)
+
+    def request(self, page_url: str):
+        """Starts fetching a page the model is asking for, unless it is already on its way."""
+        key = canonicalize_url(page_url)
+        with self._lock:
+            if self._finished or key in self._requested or key in self._futures or key in self._streamed:
+                return
+            self._streamed[key] = _executor.submit(_fetch, page_url)
+
+    def wait(self, page_urls: Iterable[str]) -> int:
+        """
+        Waits for the prefetches of page_urls still in flight and returns how
+        many of them were prefetched successfully; failed or timed out
+        prefetches are not hits.
+        """
+        try:
+            if self._planned is not None:
+                self._planned.result()
+        except Exception as e:
+            logger.debug(f"prefetch planning failed: {e}")
+        prefetched = []
+        streamed = []
+        with self._lock:
+            for page_url in page_urls:
+                key = canonicalize_url(page_url)
+                if key in self._requested:
+                    continue
+                self._requested.add(key)
+                if key in self._futures:
+                    prefetched.append(self._futures[key])
+                elif key in self._streamed:
+                    streamed.append(self._streamed[key])
+        # One timeout for all of them, however many are stuck
+        done, not_done = wait_futures(prefetched + streamed, timeout=PAGE_FETCH_TIMEOUT)
+        if not_done:
+            logger.debug(f"{len(not_done)} prefetches still running after {PAGE_FETCH_TIMEOUT}s")
+        hits = 0
+        for future in prefetched:
+            if future not in done or future.cancelled():
+                continue
+            if future.exception() is not None:
+                logger.debug(f"prefetch failed: {future.exception()}")
+                continue
+            # get_page_html returns "" when the fetch failed
+            if future.result()[0]:
+                hits += 1
+        with self._lock:
+            self._hits += hits
+        return hits
+
+    def finish(self):
+        """Cancels pending prefetches and records how many were used and wasted."""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            wasted, wasted_seconds = 0, 0.0
+            for key, future in self._futures.items():
+                if key in self._requested:
+                    continue
+                wasted += 1
+                if not future.cancel() and future.done() and future.exception() is None:
+                    wasted_seconds += future.result()[1]
+            for key, future in self._streamed.items():
+                if key not in self._requested:
+                    future.cancel()
+            prefetched, requested, hits = len(self._futures), len(self._requested), self._hits
+            streamed = len(self._streamed)
+        if self._top_n <= 0:
+            # Speculative prefetching was off; counting the task would dilute the hit rate
+            prefetch_stats.record_streamed(streamed)
+            logger.info(f"prefetch: {streamed} pages fetched while streaming")
+            return
+        prefetch_stats.record(prefetched, requested, hits, wasted, wasted_seconds, streamed)
+        logger.info(f"prefetch: {hits}/{requested} requested pages prefetched, "
+                    f"{wasted}/{prefetched} prefetched pages unused ({wasted_seconds:.3f}s wasted), "
+                    f"{streamed} pages fetched while streaming")
@@ -11,7 +11,7 @@ OUTPUT_REQ_PROMPT = """
 - 3. Ensure the JSON strictly begins with '[' and ends with ']'.
 """
 
-FIRST_MISSION_PROMPT = """
+TASK_SPEC_PROMPT = """
 # Objective
 Generate a JSON-formatted list of Action objects for the Web Agent to execute tasks on a web site specified by **Task Prompt**.
 The Web Agent sequentially performs these actions using Playwright.
@@ -150,7 +150,9 @@ Selects an element using an XPath expression.
 
 **Additional Fields:**  
 - `value`: The XPath query identifying the element. 
+"""
 
+FIRST_MISSION_PROMPT = TASK_SPEC_PROMPT + """
 # Provided Information
 Following is the url of main page and corresponding uploaded file names.
 {portal_url} : {file_uploaded}
@@ -175,7 +177,34 @@ Followings are the urls of pages and corresponding uploaded file names.
 """
 
 
+INDEXED_MISSION_PROMPT = TASK_SPEC_PROMPT + """
+# Provided Information
+Followings are the urls of the main page and of every page reachable from it, and corresponding uploaded file names.
+{urls_uploaded}
+
+# Mission: Generate the list of Action objects
+The uploaded files have brief HTML contents of all the pages the Web Agent may need to navigate.
+Analyze them and generate a JSON-formatted list of Action objects to execute tasks on web pages specified by **Task Prompt**.
+"""
+
+
 LAST_MISSION_PROMPT = """
 # Last Mission: Genernate the list of Action objects
 Generate a JSON-formatted list of Action objects to execute tasks on web pages specified by **Task Prompt**.
-"""
\ No newline at end of file
+"""
+
+
+INLINE_PAGE_PROMPT = """
+## File `{file_name}`
+Brief HTML contents of {page_url}:
+{page_html}
+"""
+
+
+OUTLINE_FORMAT_PROMPT = """
+# Page Outline Format
+The uploaded pages are outlines rather than HTML. Each line is a heading (`#`), a form,
+or an interactive element followed by its label and a ready-made `Selector` object in JSON.
+Lines starting with `|` are the text shown just before the next element.
+Use the given `Selector` objects as they are.
+"""
@@ -0,0 +1,54 @@
+# Description: Records task requests as JSON lines so they can be replayed offline.
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from loguru import logger
+
+from .config import RECORD_REQUESTS, RECORD_REQUESTS_PATH
+
+
+# Endpoints whose requests are worth replaying
+RECORDED_ENDPOINTS = frozenset(["/solve_task", "/solve_task/batch", "/solve_task/jobs"])
+
+
+class TrafficRecorder:
+    """
+    Appends one JSON object per request to `path`:
+    {"endpoint", "payload", "status", "seconds", "recorded_at"}.
+    """
+
+    def __init__(self, path: Path = RECORD_REQUESTS_PATH, enabled: bool = RECORD_REQUESTS):
+        self.path = Path(path)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, path: Optional[Path] = None):
+        with self._lock:
+            self.enabled = enabled
+            if path is not None:
+                self.path = Path(path)
+
+    def record(self, endpoint: str, payload: Any, status: int, seconds: float):
+        if not self.enabled or endpoint not in RECORDED_ENDPOINTS or payload is None:
+            return
+        line = json.dumps({
+            "endpoint": endpoint,
+            "payload": payload,
+            "status": status,
+            "seconds": round(seconds, 4),
+            "recorded_at": time.time(),
+        })
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.warning(f"recorder: failed to append to {self.path}: {e}")
+
+
+traffic_recorder = TrafficRecorder()
@@ -0,0 +1,130 @@
+# Description: Admission control for serving tasks concurrently.
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from loguru import logger
+
+from .config import MAX_INFLIGHT_REQUESTS, REQUEST_QUEUE_SIZE, REQUEST_QUEUE_TIMEOUT, RETRY_AFTER_SECONDS
+
+
+class AdmissionGate:
+    """
+    Caps the number of requests being worked on at once.
+
+    Up to `max_inflight` requests run concurrently and up to `queue_size`
+    more wait for a slot, each for at most `queue_timeout` seconds. Requests
+    beyond that are rejected so that clients back off instead of piling up.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = MAX_INFLIGHT_REQUESTS,
+        queue_size: int = REQUEST_QUEUE_SIZE,
+        queue_timeout: float = REQUEST_QUEUE_TIMEOUT,
+        retry_after: int = RETRY_AFTER_SECONDS,
+    ):
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._waiting = 0
+        self.configure(max_inflight, queue_size, queue_timeout, retry_after)
+
+    def configure(self, max_inflight: int, queue_size: int, queue_timeout: float, retry_after: int):
+        with self._cond:
+            self.max_inflight = max(1, max_inflight)
+            self.queue_size = max(0, queue_size)
+            self.queue_timeout = queue_timeout
+            self.retry_after = retry_after
+            self._cond.notify_all()
+
+    def try_enter(self) -> bool:
+        """Takes a slot, waiting in the queue if needed; False means the request must be rejected."""
+        with self._cond:
+            if self._inflight < self.max_inflight and self._waiting == 0:
+                self._inflight += 1
+                return True
+            if self._waiting >= self.queue_size:
+                return False
+
+            self._waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._inflight >= self.max_inflight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(timeout=remaining)
+            finally:
+                self._waiting -= 1
+            self._inflight += 1
+            return True
+
+    def enter(self):
+        """Takes a slot for work that belongs to an admitted request, waiting as long as it takes."""
+        with self._cond:
+            while self._inflight >= self.max_inflight:
+                self._cond.wait()
+            self._inflight += 1
+
+    def leave(self):
+        with self._cond:
+            self._inflight -= 1
+            # Queued requests and batch tasks wait on the same condition, wake them all
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "inflight": self._inflight,
+                "waiting": self._waiting,
+                "max_inflight": self.max_inflight,
+                "queue_size": self.queue_size,
+            }
+
+
+admission_gate = AdmissionGate()
+
+
+class BatchSlots:
+    """
+    Admission for the tasks of one admitted batch request. The slot the
+    request already holds runs one task at a time; every other task takes a
+    slot of its own from the gate while it runs, so a batch never has more
+    tasks in flight than the gate allows.
+    """
+
+    def __init__(self, gate: AdmissionGate = admission_gate):
+        self.gate = gate
+        self._own = threading.Semaphore(1)
+
+    @contextmanager
+    def slot(self):
+        if self._own.acquire(blocking=False):
+            try:
+                yield
+            finally:
+                self._own.release()
+            return
+        self.gate.enter()
+        try:
+            yield
+        finally:
+            self.gate.leave()
+
+
+def admission_controlled(view):
+    """Decorates a Flask view so it only runs when the admission gate lets it in."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not admission_gate.try_enter():
+            logger.warning(f"rejecting request, server busy {admission_gate.stats()}")
+            return "Server busy, retry later", 503, {"Retry-After": str(admission_gate.retry_after)}
+        try:
+            return view(*args, **kwargs)
+        finally:
+            admission_gate.leave()
+
+    return wrapper
@@ -0,0 +1,269 @@
+# Description: Persistent per-origin index of rendered pages and the links between them.
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .config import (
+    CRAWL_CONCURRENCY,
+    PAGE_FORMAT,
+    SITE_INDEX_DEPTH,
+    SITE_INDEX_DIR,
+    SITE_INDEX_ENABLED,
+    SITE_INDEX_MAX_PAGES,
+    SITE_INDEX_TTL,
+)
+from .metrics import PAGES_CRAWLED
+from .web_utils import canonicalize_url, content_hash, extract_links, get_html_contents, url_origin
+
+
+class SiteIndex:
+    """
+    Rendered pages kept on disk under `root`, one directory per origin and page
+    format: index.json maps each canonical URL to its content hash, fetch time
+    and same-origin links, and every page is stored in a file of its own.
+
+    Pages older than `ttl` seconds are still served, and refetched in the
+    background. A portal is covered when every page within `depth` link hops
+    of it is indexed and there are at most `max_pages` of them.
+    """
+
+    def __init__(
+        self,
+        root: Path = SITE_INDEX_DIR,
+        ttl: float = SITE_INDEX_TTL,
+        depth: int = SITE_INDEX_DEPTH,
+        max_pages: int = SITE_INDEX_MAX_PAGES,
+        page_format: str = PAGE_FORMAT,
+    ):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.depth = depth
+        self.max_pages = max_pages
+        self.page_format = page_format
+
+        self._sites: Dict[str, Dict] = {}  # origin -> {"origin", "format", "pages": {canonical url: entry}}
+        self._in_flight = set()  # canonical urls being refreshed or crawled
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=CRAWL_CONCURRENCY, thread_name_prefix="site-index")
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    # ------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------
+
+    def _site_dir(self, origin: str) -> Path:
+        return self.root / hashlib.sha256(f"{self.page_format} {origin}".encode("utf-8")).hexdigest()[:16]
+
+    def _page_path(self, origin: str, key: str) -> Path:
+        return self._site_dir(origin) / (hashlib.sha256(key.encode("utf-8")).hexdigest()[:24] + ".page")
+
+    def _site(self, origin: str) -> Dict:
+        """Returns the index of an origin, loading it on first use; callers hold the lock."""
+        site = self._sites.get(origin)
+        if site is None:
+            site = {"origin": origin, "format": self.page_format, "pages": {}}
+            try:
+                with open(self._site_dir(origin) / "index.json", "r", encoding="utf-8") as f:
+                    site = json.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"site index: ignoring unreadable index of {origin}: {e}")
+            self._sites[origin] = site
+        return site
+
+    def _save(self, origin: str):
+        """Writes the index of an origin to disk; callers hold the lock."""
+        try:
+            path = self._site_dir(origin) / "index.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._sites[origin], f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"site index: failed to save index of {origin}: {e}")
+
+    # ------------------------------------------------------
+    # Pages
+    # ------------------------------------------------------
+
+    def lookup(self, page_url: str) -> Optional[Dict[str, Any]]:
+        """Returns the index entry of a page (url, hash, fetched_at, links), if any."""
+        key = canonicalize_url(page_url)
+        with self._lock:
+            entry = self._site(url_origin(key))["pages"].get(key)
+            return dict(entry) if entry is not None else None
+
+    def get(self, page_url: str) -> Optional[str]:
+        """Returns the indexed contents of a page, scheduling a refresh when they are stale."""
+        key = canonicalize_url(page_url)
+        origin = url_origin(key)
+        with self._lock:
+            entry = self._site(origin)["pages"].get(key)
+        page_html = None
+        if entry is not None:
+            try:
+                page_html = self._page_path(origin, key).read_text(encoding="utf-8")
+            except OSError:
+                pass
+        with self._lock:
+            if page_html is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        if time.time() - entry["fetched_at"] > self.ttl:
+            self.refresh(page_url)
+        return page_html
+
+    def put(self, page_url: str, page_html: str):
+        """Stores the rendered contents of a page along with its same-origin links."""
+        key = canonicalize_url(page_url)
+        origin = url_origin(key)
+        links = [url for url, _ in extract_links(page_html, page_url, self.page_format)]
+        with self._lock:
+            path = self._page_path(origin, key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(page_html, encoding="utf-8")
+            except OSError as e:
+                logger.warning(f"site index: failed to store {page_url}: {e}")
+                return
+            self._site(origin)["pages"][key] = {
+                "url": page_url,
+                "hash": content_hash(page_html),
+                "fetched_at": time.time(),
+                "links": links,
+            }
+            self._save(origin)
+
+    async def fetch(self, page_url: str) -> str:
+        """Returns a page from the index, fetching and indexing it when it is not there."""
+        page_html = self.get(page_url)
+        if page_html is not None:
+            PAGES_CRAWLED.inc(source="index")
+            return page_html
+        page_html = await get_html_contents(page_url)
+        if page_html and page_html.strip():
+            # Link extraction parses the page, keep it off the loop
+            await asyncio.to_thread(self.put, page_url, page_html)
+        return page_html
+
+    def _claim(self, page_urls: List[str]) -> List[str]:
+        with self._lock:
+            claimed = [url for url in page_urls if canonicalize_url(url) not in self._in_flight]
+            self._in_flight.update(canonicalize_url(url) for url in claimed)
+            return claimed
+
+    def _fetch_into_index(self, page_urls: List[str]):
+        """Fetches claimed pages and stores them, on a background thread."""
+        async def _fetch_all():
+            semaphore = asyncio.Semaphore(CRAWL_CONCURRENCY)
+
+            async def _fetch(page_url):
+                async with semaphore:
+                    return await get_html_contents(page_url)
+
+            return await asyncio.gather(*[_fetch(url) for url in page_urls])
+
+        try:
+            for page_url, page_html in zip(page_urls, asyncio.run(_fetch_all())):
+                if page_html and page_html.strip():
+                    self.put(page_url, page_html)
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(canonicalize_url(url) for url in page_urls)
+
+    def refresh(self, page_url: str):
+        """Refetches a page in the background."""
+        claimed = self._claim([page_url])
+        if claimed:
+            logger.debug(f"site index: refreshing {page_url}")
+            with self._lock:
+                self.refreshes += 1
+            self._executor.submit(self._fetch_into_index, claimed)
+
+    # ------------------------------------------------------
+    # Link graph
+    # ------------------------------------------------------
+
+    def _walk(self, portal_url: str, portal_html: str) -> Tuple[List[str], List[str]]:
+        """Returns the indexed and the missing pages within `depth` hops of the portal, in discovery order."""
+        portal_key = canonicalize_url(portal_url)
+        seen = { portal_key }
+        indexed, missing = [], []
+        level = [url for url, _ in extract_links(portal_html, portal_url)]
+        with self._lock:
+            pages = self._site(url_origin(portal_key))["pages"]
+            for _ in range(self.depth):
+                next_level = []
+                for url in level:
+                    key = canonicalize_url(url)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    entry = pages.get(key)
+                    if entry is None:
+                        missing.append(url)
+                        continue
+                    indexed.append(url)
+                    next_level.extend(entry["links"])
+                level = next_level
+        return indexed, missing
+
+    def covered_pages(self, portal_url: str, portal_html: str) -> Optional[List[str]]:
+        """
+        Returns every page reachable from the portal when all of them are
+        indexed and they are no more than `max_pages`, otherwise None.
+        """
+        indexed, missing = self._walk(portal_url, portal_html)
+        if missing or len(indexed) > self.max_pages:
+            return None
+        return indexed
+
+    def crawl(self, portal_url: str, portal_html: str):
+        """Indexes, in the background, the pages reachable from the portal that are not indexed yet."""
+        self._executor.submit(self._crawl, portal_url, portal_html)
+
+    def _crawl(self, portal_url: str, portal_html: str):
+        # Each round indexes one more level of links
+        for _ in range(self.depth):
+            indexed, missing = self._walk(portal_url, portal_html)
+            claimed = self._claim(missing[:max(0, self.max_pages - len(indexed))])
+            if not claimed:
+                return
+            logger.debug(f"site index: crawling {len(claimed)} pages of {url_origin(portal_url)}")
+            self._fetch_into_index(claimed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sites": len(self._sites),
+                "pages": sum(len(site["pages"]) for site in self._sites.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+site_index = SiteIndex()
+
+
+async def get_page_html(page_url: str) -> str:
+    """Returns the rendered contents of a page, going through the site index when it is enabled."""
+    if SITE_INDEX_ENABLED:
+        return await site_index.fetch(page_url)
+    return await get_html_contents(page_url)
@@ -0,0 +1,85 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+
+PACKAGE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PACKAGE_DIR.parent))
+# config refuses to load without a key; the tests never reach the API
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+
+@pytest.fixture(scope="session")
+def web_utils():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.web_utils")
+
+
+@pytest.fixture(scope="session")
+def llm_provider():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.llm_provider")
+
+
+@pytest.fixture(scope="session")
+def html_stream():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.html_stream")
+
+
+@pytest.fixture(scope="session")
+def dom_diff():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.dom_diff")
+
+
+@pytest.fixture(scope="session")
+def frames():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.actions.frames")
+
+
+@pytest.fixture(scope="session")
+def actions():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.actions.actions")
+
+
+@pytest.fixture(scope="session")
+def openai_service():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.openai_service")
+
+
+@pytest.fixture
+def stub_openai(monkeypatch, openai_service, llm_provider):
+    """A stub OpenAI API whose model asks for no further pages; the service talks to it for the test."""
+    stub_module = importlib.import_module(f"{PACKAGE_DIR.name}.benchmarks.stub_openai")
+    stub = stub_module.StubOpenAI(llm_latency=0, api_latency=0, index_latency=0, jitter=0,
+                                  model=stub_module.StubModel(fanout=0))
+    monkeypatch.setenv("OPENAI_BASE_URL", stub.start())
+    monkeypatch.setattr(openai_service, "_client", None)
+    monkeypatch.setattr(llm_provider, "_provider", None)
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture(scope="session")
+def browser_pool():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.browser_pool")
+
+
+@pytest.fixture(scope="session")
+def prefetch():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.prefetch")
+
+
+@pytest.fixture(scope="session")
+def jobs():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.jobs")
+
+
+@pytest.fixture(scope="session")
+def serving():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.serving")
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    return importlib.import_module(f"{PACKAGE_DIR.name}.app")
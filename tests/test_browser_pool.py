@@ -0,0 +1,91 @@
+import asyncio
+
+
+class FakePage:
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        self.contexts.append(FakeContext())
+        return self.contexts[-1]
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = self
+        self.browsers = []
+
+    async def launch(self, **options):
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+    async def start(self):
+        return self
+
+
+def _pool(monkeypatch, browser_pool, **options):
+    playwright = FakePlaywright()
+    monkeypatch.setattr(browser_pool, "async_playwright", lambda: playwright)
+    return browser_pool.BrowserPool(**options), playwright
+
+
+def test_each_browser_serves_several_pages_at_once(monkeypatch, browser_pool):
+    pool, playwright = _pool(monkeypatch, browser_pool, size=2, pages_per_browser=3)
+
+    async def run():
+        await pool._start()
+        open_pages = 0
+        most_open = 0
+
+        async def borrow():
+            nonlocal open_pages, most_open
+            async with pool.page():
+                open_pages += 1
+                most_open = max(most_open, open_pages)
+                await asyncio.sleep(0.05)
+                open_pages -= 1
+
+        await asyncio.gather(*(borrow() for _ in range(10)))
+        return most_open
+
+    assert asyncio.run(run()) == 6
+    assert len(playwright.browsers) == 2
+
+
+def test_context_is_recycled_only_once_its_pages_are_closed(monkeypatch, browser_pool):
+    pool, playwright = _pool(monkeypatch, browser_pool, size=1, pages_per_browser=2, context_max_pages=1)
+
+    async def run():
+        await pool._start()
+        browser = playwright.browsers[0]
+        async with pool.page():
+            async with pool.page():
+                # The first page is still open in the context that is due for recycling
+                assert len(browser.contexts) == 1
+        async with pool.page():
+            assert len(browser.contexts) == 2
+            assert browser.contexts[0].closed
+
+    asyncio.run(run())
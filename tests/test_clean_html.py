@@ -0,0 +1,70 @@
+import io
+
+import pytest
+
+
+PAGES = {
+    "shop": """<!DOCTYPE html>
+<html><head><title>Shop</title><meta charset="utf-8"><link rel="stylesheet" href="/s.css">
+<style>body { color: red }</style><script>window.state = {"cart": []};</script></head>
+<body onload="init()">
+  <!-- navigation -->
+  <nav class="top" id="nav"><a href="/" onclick="go()">Home</a> <a href="/cart">Cart</a></nav>
+  <main>
+    <h1 style="color: blue">Products</h1>
+    <div hidden>Secret promo</div>
+    <div style="display: none">Hidden banner</div>
+    <ul><li>Lamp <span>$10</span></li><li>Desk</li><li></li></ul>
+    <form action="/search"><input type="text" name="q"><input type="text" name="near">
+      <select name="sort"><option value="a">Price</option><option value="b">Name</option></select>
+      <button type="submit">Search</button></form>
+  </main>
+  <noscript>Enable JavaScript</noscript>
+</body></html>""",
+    "empty_nesting": """<html><body>
+<div><div><span></span></div><p>  </p></div>
+<section><article><div><b>kept</b></div></article></section>
+<table><tr><td></td><td>cell</td></tr></table>
+</body></html>""",
+    "text_and_templates": """<html><body>
+<pre>  keep
+   spacing  </pre>
+<textarea name="t">  draft  </textarea>
+<template><p>template content</p></template>
+<p>one <!-- c --> two <br> three</p>
+<img src="a.png" alt="logo"><hr>
+</body></html>""",
+    "fragment": """<div class="x"><p>No html or body element</p><script>1</script><i></i></div>""",
+}
+
+
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_tree_cleaner_matches_multipass(web_utils, name):
+    page = PAGES[name]
+    assert web_utils._clean_html_tree(page, parser="html.parser") == web_utils._clean_html_multipass(page)
+
+
+def test_unknown_parser_is_rejected(web_utils):
+    with pytest.raises(ValueError):
+        web_utils.check_html_parser("no-such-parser")
+
+
+def test_removed_head_content_is_not_buffered(html_stream):
+    cleaner = html_stream.StreamingHTMLCleaner(io.StringIO())
+    cleaner.feed("<html><head><title>t</title><script>" + "x" * 100000 + "</script><style>a{}</style></head>")
+    assert sum(len(piece) for piece in cleaner._preamble) < 100
+
+
+@pytest.mark.parametrize("prettify", [True, False])
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_stream_cleaner_matches_tree(web_utils, html_stream, name, prettify):
+    page = PAGES[name]
+    expected = web_utils._clean_html_tree(page, prettify=prettify, parser="html.parser")
+    assert html_stream.clean_html_stream(page, prettify=prettify) == expected
+
+
+def test_stream_cleaner_handles_many_void_tags(web_utils, html_stream):
+    rows = "".join(f"<p>row {index}<br><img src='{index}.png'><input name='f{index}'></p>" for index in range(5000))
+    page = f"<html><body>{rows}<br></br></body></html>"
+    expected = web_utils._clean_html_tree(page, parser="html.parser")
+    assert html_stream.clean_html_stream(page) == expected
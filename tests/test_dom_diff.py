@@ -0,0 +1,13 @@
+def test_reindented_markup_has_no_differences(dom_diff):
+    assert dom_diff.diff_dom("<div>\n  <p>a  b</p>\n</div>", "<div><p>a\n b</p></div>") == []
+
+
+def test_boundary_space_is_a_difference(dom_diff):
+    ops = dom_diff.diff_dom("<p><b>x</b> y</p>", "<p><b>x</b>y</p>")
+    assert ops == [{"op": "text", "path": "/p[1]/text()[1]", "text": "y"}]
+
+
+def test_differences_after_the_first_page(web_utils):
+    pages = ["<ul><li>a</li></ul>", "<ul><li>a</li></ul>", "<ul><li>a</li><li>b</li></ul>"]
+    diffs = web_utils.generate_html_differences_with_dom_diff(pages)
+    assert len(diffs) == 2 and diffs[0] == pages[0] and "insert" in diffs[1]
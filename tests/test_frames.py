@@ -0,0 +1,65 @@
+import asyncio
+
+
+class FakeFrame:
+    def __init__(self, url, result, delay=0.0, select_error=None):
+        self.url = url
+        self.result = result
+        self.delay = delay
+        self.select_error = select_error
+        self.parent_frame = None
+        self.selected = []
+
+    def is_detached(self):
+        return False
+
+    async def evaluate(self, script, arg):
+        await asyncio.sleep(self.delay)
+        return self.result
+
+    def locator(self, selector):
+        return FakeLocator(self)
+
+
+class FakeLocator:
+    def __init__(self, frame):
+        self.frame = frame
+
+    def nth(self, index):
+        return self
+
+    async def select_option(self, label, timeout):
+        if self.frame.select_error is not None:
+            raise self.frame.select_error
+        self.frame.selected.append(label)
+        return [label]
+
+
+class FakePage:
+    def __init__(self, frames):
+        self.frames = frames
+
+    def on(self, event, handler):
+        pass
+
+
+FOUND = {"found": True}
+MISSED = {"found": False}
+
+
+def test_first_match_in_page_order_wins(frames):
+    # The later frame answers first, but the earlier one also matches
+    early = FakeFrame("early", FOUND, delay=0.05)
+    late = FakeFrame("late", FOUND)
+    page = FakePage([FakeFrame("main", MISSED), early, late])
+    found = asyncio.run(frames.find_in_frames(page, "", "//select", accept=lambda info: info["found"]))
+    assert found == (early, FOUND)
+
+
+def test_select_falls_back_to_the_next_matching_frame(actions):
+    broken = FakeFrame("broken", FOUND, select_error=RuntimeError("detached"))
+    working = FakeFrame("working", FOUND)
+    page = FakePage([FakeFrame("main", MISSED), broken, working])
+    action = actions.SelectDropDownOption(selector={"type": "xpathSelector", "value": "//select"}, text="Two")
+    asyncio.run(action.execute(page, None, "agent"))
+    assert working.selected == ["Two"]
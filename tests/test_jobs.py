@@ -0,0 +1,19 @@
+import threading
+
+
+def test_jobs_hold_an_admission_gate_slot(jobs, serving):
+    gate = serving.AdmissionGate(max_inflight=1, queue_size=0, queue_timeout=0, retry_after=1)
+    manager = jobs.JobManager(workers=2, max_pending=4, result_ttl=60, gate=gate)
+    release = threading.Event()
+
+    first = manager.submit(release.wait, 5)
+    second = manager.submit(lambda: "done")
+    assert not second.done.wait(0.2)
+    assert second.status == "queued"
+    # A request arriving now is shed, the job already holds the only slot
+    assert not gate.try_enter()
+
+    release.set()
+    assert first.done.wait(5) and second.done.wait(5)
+    assert second.result == "done"
+    assert gate.stats()["inflight"] == 0
@@ -0,0 +1,109 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+
+class StubLocalModel:
+    """Serves the local inference endpoints: /generate for one request and /generate_batch for many."""
+
+    def __init__(self):
+        self.single_calls = 0
+        self.batch_sizes = []
+        self.fail_batches = False
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path == "/generate":
+                    with stub._lock:
+                        stub.single_calls += 1
+                    payload = {"output": {"text": stub.reply(body)}}
+                elif self.path == "/generate_batch":
+                    with stub._lock:
+                        stub.batch_sizes.append(len(body["requests"]))
+                    if stub.fail_batches:
+                        self.send_response(500)
+                        self.end_headers()
+                        return
+                    payload = {"outputs": [{"text": stub.reply(request)} for request in body["requests"]]}
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def reply(payload):
+        return "echo: " + payload["input"]["text"][-1]["content"]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    stub = StubLocalModel()
+    yield stub
+    stub.stop()
+
+
+def _provider(llm_provider, stub, batch_size=4, batch_wait=0.5):
+    return llm_provider.LocalProvider(
+        endpoint=f"{stub.url}/generate",
+        parallel_endpoint=f"{stub.url}/generate_batch",
+        batch_size=batch_size,
+        batch_wait=batch_wait,
+        timeout=5,
+        max_connections=4,
+    )
+
+
+def _messages(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_single_request(llm_provider, stub):
+    provider = _provider(llm_provider, stub, batch_wait=0.05)
+    assert provider.complete(_messages("hello")) == "echo: hello"
+    assert stub.single_calls == 1
+    assert stub.batch_sizes == []
+
+
+def test_parallel_requests_share_a_batch(llm_provider, stub):
+    provider = _provider(llm_provider, stub, batch_size=4, batch_wait=0.5)
+    texts = [f"task {index}" for index in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        replies = list(executor.map(lambda text: provider.complete(_messages(text)), texts))
+    assert replies == [f"echo: {text}" for text in texts]
+    assert stub.batch_sizes == [4]
+    assert stub.single_calls == 0
+
+
+def test_batch_error_fails_every_request(llm_provider, stub):
+    stub.fail_batches = True
+    provider = _provider(llm_provider, stub, batch_size=3, batch_wait=0.5)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(provider.complete, _messages(f"task {index}")) for index in range(3)]
+        for future in futures:
+            with pytest.raises(httpx.HTTPStatusError):
+                future.result(timeout=5)
+    assert stub.batch_sizes == [3]
@@ -0,0 +1,37 @@
+import time
+
+PORTAL = """<html><body>
+<a href="/cart">Cart</a> <a href="/cart/checkout">Cart checkout</a> <a href="/cart/help">Cart help</a>
+</body></html>"""
+URLS = ["http://localhost/cart", "http://localhost/cart/checkout", "http://localhost/cart/help"]
+
+
+def test_stuck_prefetches_share_one_timeout(monkeypatch, prefetch):
+    def stuck(page_url):
+        time.sleep(0.6)
+        return "<html></html>", 0.6
+
+    monkeypatch.setattr(prefetch, "_fetch", stuck)
+    monkeypatch.setattr(prefetch, "PAGE_FETCH_TIMEOUT", 0.2)
+    prefetcher = prefetch.Prefetcher("open the cart", "http://localhost/", PORTAL, top_n=3)
+
+    started = time.perf_counter()
+    hits = prefetcher.wait(URLS)
+
+    assert hits == 0
+    assert time.perf_counter() - started < 0.5
+    prefetcher.finish()
+
+
+def test_tasks_without_speculative_prefetch_are_not_counted(monkeypatch, prefetch):
+    monkeypatch.setattr(prefetch, "_fetch", lambda page_url: ("<html>page</html>", 0.01))
+    stats = prefetch.PrefetchStats()
+    monkeypatch.setattr(prefetch, "prefetch_stats", stats)
+
+    prefetcher = prefetch.Prefetcher("open the cart", "http://localhost/", PORTAL, top_n=0)
+    prefetcher.request(URLS[0])
+    prefetcher.wait(URLS[:1])
+    prefetcher.finish()
+
+    assert stats.stats()["tasks"] == 0
+    assert stats.stats()["streamed"] == 1
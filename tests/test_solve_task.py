@@ -0,0 +1,111 @@
+import asyncio
+import time
+import types
+
+
+PAGE = """<html><body>
+<h1>Sign up</h1>
+<form action="/signup"><input name="email" placeholder="Email"><button type="submit">Submit</button></form>
+<a href="/login">Log in</a>
+</body></html>"""
+
+
+def test_outline_task_reaches_the_model(monkeypatch, openai_service, stub_openai):
+    monkeypatch.setattr(openai_service, "PAGE_FORMAT", "outline")
+    monkeypatch.setattr(openai_service, "PLAN_CACHE_ENABLED", False)
+
+    actions, cache_hit = openai_service.solve_task("Sign up", "http://localhost/", PAGE, engine="chat")
+
+    assert [action.type for action in actions] == ["NavigateAction", "ClickAction"]
+    assert not cache_hit
+    assert stub_openai.llm_turns() == 2
+
+
+def test_rendering_an_outline_again_keeps_it(web_utils):
+    outline = web_utils.render_page(PAGE, "outline", "http://localhost/")
+    assert outline
+    assert web_utils.render_page(outline, "outline", "http://localhost/") == outline
+
+
+class StuckFiles:
+    def create(self, **kwargs):
+        time.sleep(2)
+        return types.SimpleNamespace(id="file-late")
+
+
+class Cleanup:
+    def __init__(self):
+        self.tracked = []
+
+    def track(self, kind, resource_id):
+        self.tracked.append((kind, resource_id))
+
+
+def test_stuck_upload_does_not_hold_up_the_round(monkeypatch, openai_service):
+    async def get_page_html(page_url):
+        return PAGE
+
+    monkeypatch.setattr(openai_service, "get_page_html", get_page_html)
+    monkeypatch.setattr(openai_service, "PAGE_FETCH_TIMEOUT", 0.2)
+    client = types.SimpleNamespace(files=StuckFiles())
+
+    started = time.perf_counter()
+    pages = asyncio.run(openai_service._fetch_and_upload_pages(client, ["http://localhost/a"], 1, Cleanup()))
+
+    assert pages == [("http://localhost/a", None)]
+    assert time.perf_counter() - started < 1
+
+
+class RecordingProvider:
+    """Answers like the stub model and records the prompt tokens of every turn."""
+
+    def __init__(self, estimate_tokens):
+        self.estimate_tokens = estimate_tokens
+        self.prompt_tokens = []
+
+    def complete(self, messages, on_text=None):
+        self.prompt_tokens.append(sum(self.estimate_tokens(message["content"]) for message in messages))
+        if "# First Misson" in messages[-1]["content"]:
+            return "[]"
+        return '[{"type": "NavigateAction", "url": "http://localhost/"}]'
+
+
+def test_oversized_portal_page_is_truncated_to_the_context_window(monkeypatch, openai_service):
+    provider = RecordingProvider(openai_service.estimate_tokens)
+    monkeypatch.setattr(openai_service, "get_provider", lambda client_factory=None: provider)
+    monkeypatch.setattr(openai_service, "PLAN_CACHE_ENABLED", False)
+    page = "<html><body>" + "<p>filler text</p>" * 20000 + "</body></html>"
+
+    actions, _ = openai_service.solve_task("Open the page", "http://localhost/", page, engine="chat")
+
+    assert [action.type for action in actions] == ["NavigateAction"]
+    assert max(provider.prompt_tokens) <= openai_service._chat_budget()
+
+
+def test_local_provider_turns_fit_its_context_window(monkeypatch, openai_service, llm_provider):
+    from test_llm_provider import StubLocalModel
+
+    class StubAgentModel(StubLocalModel):
+        prompt_tokens = []
+
+        @classmethod
+        def reply(cls, payload):
+            messages = payload["input"]["text"]
+            cls.prompt_tokens.append(sum(openai_service.estimate_tokens(message["content"]) for message in messages))
+            return "[]" if "# First Misson" in messages[-1]["content"] else '[{"type": "NavigateAction", "url": "/"}]'
+
+    stub = StubAgentModel()
+    provider = llm_provider.LocalProvider(endpoint=f"{stub.url}/generate", parallel_endpoint=f"{stub.url}/generate_batch",
+                                          batch_wait=0, timeout=5)
+    monkeypatch.setattr(openai_service, "LLM_PROVIDER", "local")
+    monkeypatch.setattr(openai_service, "LLM_CONTEXT_WINDOW", 4000)
+    monkeypatch.setattr(openai_service, "get_provider", lambda client_factory=None: provider)
+    monkeypatch.setattr(openai_service, "PLAN_CACHE_ENABLED", False)
+    page = "<html><body>" + "<p>filler text</p>" * 20000 + "</body></html>"
+    try:
+        actions, _ = openai_service.solve_task("Open the page", "http://localhost/", page)
+    finally:
+        stub.stop()
+
+    assert [action.type for action in actions] == ["NavigateAction"]
+    assert max(StubAgentModel.prompt_tokens) <= 4000 - openai_service.CHAT_RESPONSE_RESERVE
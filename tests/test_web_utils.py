@@ -0,0 +1,20 @@
+def test_route_fragments_name_different_pages(web_utils):
+    canonical = web_utils.canonicalize_url
+    assert canonical("http://shop.test/#/cart") != canonical("http://shop.test/#/checkout")
+    assert canonical("http://shop.test/#!/cart") == "http://shop.test/#!/cart"
+    assert canonical("HTTP://Shop.test:80/page#reviews") == "http://shop.test/page"
+
+
+def test_route_links_are_extracted(web_utils):
+    page = '<a href="#/cart">Cart</a> <a href="#top">Top</a> <a href="/about">About</a>'
+    links = web_utils.extract_links(page, "http://shop.test/", page_format="html")
+    assert [url for url, _ in links] == ["http://shop.test/#/cart", "http://shop.test/about"]
+
+
+def test_cache_stats_are_exported(web_utils, app_module):
+    web_utils.page_cache.get(("http://shop.test/never-cached", "html"))
+
+    metrics = app_module.registry.render()
+
+    assert 'agent_cache_lookups_total{cache="page",result="miss"}' in metrics
+    assert 'agent_cache_entries{cache="plan"}' in metrics
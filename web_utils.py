@@ -1,104 +1,259 @@
 # take from autoppia_iwa
 
+import asyncio
 import difflib
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
-from bs4 import BeautifulSoup, Comment
+from bs4 import BeautifulSoup, Comment, FeatureNotFound, NavigableString, Tag
+from loguru import logger
 from PIL import Image
-from playwright.async_api import async_playwright
 from xmldiff import main
 
+from .browser_pool import get_browser_pool
+from .cache import LRUCache
+from .dom_diff import DomDiffer, format_edit_script
+from .html_stream import REMOVED_TAGS, clean_html_stream
+from .metrics import PAGES_CRAWLED, span
+from .config import (
+    HTML_CLEANER,
+    HTML_PARSER,
+    PAGE_CACHE_MAX_BYTES,
+    PAGE_CACHE_TTL,
+    PAGE_FORMAT,
+    OUTLINE_TOKEN_BUDGET,
+)
+
 # XXX: UIParserServer does nothing now
 # from autoppia_iwa.src.llms.infrastructure.ui_parser_service import UIParserService
 
 
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+# Fragments of hash-routed single-page apps, which select a page rather than a spot on it
+ROUTE_FRAGMENT_PREFIXES = ("/", "!")
+
+
+def canonicalize_url(page_url: str) -> str:
+    """
+    Normalizes a URL so that equivalent spellings share a cache entry:
+    lowercases scheme and host, drops default ports and fragments,
+    sorts the query string and defaults the path to "/". Fragments that look
+    like client-side routes (#/cart, #!/cart) name different pages of a
+    hash-routed app and are kept.
+    """
+    parts = urlsplit(page_url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    fragment = parts.fragment if parts.fragment.startswith(ROUTE_FRAGMENT_PREFIXES) else ""
+    return urlunsplit((scheme, host, parts.path or "/", query, fragment))
+
+
+def url_origin(page_url: str) -> str:
+    """Returns the scheme://host[:port] part of a URL in canonical form."""
+    parts = urlsplit(canonicalize_url(page_url))
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def content_hash(html: str) -> str:
+    """Returns a stable hash of page contents."""
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+_render_executor = ThreadPoolExecutor(thread_name_prefix="render")
+
+# Rendered pages keyed by (canonical URL, page format); each entry is {"html": ..., "hash": ...}
+page_cache = LRUCache(
+    max_bytes=PAGE_CACHE_MAX_BYTES,
+    ttl=PAGE_CACHE_TTL,
+    sizeof=lambda page: len(page["html"].encode("utf-8")),
+)
+
+
 # async def get_html_and_screenshot(page_url: str) -> Tuple[str, str, Image.Image, str]:
-async def get_html_contents(page_url: str) -> str:
+async def get_html_contents(page_url: str, page_format: str = PAGE_FORMAT) -> str:
     """
-    Navigates to page_url using Playwright in headless mode, extracts & cleans HTML,
-    captures a screenshot, and uses UIParserService to generate a textual summary
-    of that screenshot. Returns (cleaned_html, screenshot_description).
+    Returns the cached cleaned HTML of page_url when there is a fresh entry.
+    Otherwise navigates to page_url with a browser borrowed from the shared pool,
+    extracts & cleans HTML, captures a screenshot, and uses UIParserService
+    to generate a textual summary of that screenshot.
+    Returns (cleaned_html, screenshot_description).
+
+    With page_format="outline" the page is rendered by build_page_outline instead.
     """
     # screenshot = None
     # screenshot_description = ""
     # cleaned_html = ""
     raw_html = ""
 
-    try:
-        async with async_playwright() as p:
-            browser_type = p.chromium
-            browser = await browser_type.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            await page.goto(page_url, timeout=60000)
-
-            ## Extract raw HTML and clean it
-            raw_html = await page.content()
-            cleaned_html = clean_html(raw_html)
+    cache_key = (canonicalize_url(page_url), page_format)
+    cached = page_cache.get(cache_key)
+    if cached is not None:
+        PAGES_CRAWLED.inc(source="cache")
+        return cached["html"]
 
-            ## Capture screenshot in memory
-            # screenshot_bytes = await page.screenshot()
-            # screenshot = Image.open(BytesIO(screenshot_bytes)).convert("RGB")
-
-            ## Generate textual summary of the screenshot
-            # ui_parser = UIParserService()
-            # screenshot_description = ui_parser.summarize_image(screenshot)
-
-            await context.close()
-            await browser.close()
+    try:
+        ## Extract raw HTML and clean it
+        with span("browser_fetch"):
+            raw_html = await get_browser_pool().fetch_html(page_url)
+        # Cleaning is CPU-bound, keep it off the loop so concurrent fetches overlap.
+        # Its own executor, unlike the loop's default one, is not waited for by
+        # asyncio.run, so a caller that timed out is not held up by a slow clean
+        cleaned_html = await asyncio.get_running_loop().run_in_executor(
+            _render_executor, render_page, raw_html, page_format, page_url
+        )
+
+        ## Capture screenshot in memory
+        # screenshot_bytes = await page.screenshot()
+        # screenshot = Image.open(BytesIO(screenshot_bytes)).convert("RGB")
+
+        ## Generate textual summary of the screenshot
+        # ui_parser = UIParserService()
+        # screenshot_description = ui_parser.summarize_image(screenshot)
 
     except Exception as e:
         print(f"Error during HTML extraction or screenshot processing: {e}")
         # return raw_html, cleaned_html, None, screenshot_description
         return ""
 
+    PAGES_CRAWLED.inc(source="browser")
+    if cleaned_html:
+        page_cache.put(cache_key, {"html": cleaned_html, "hash": content_hash(cleaned_html)})
+
     # return raw_html, cleaned_html, screenshot, screenshot_description
     return cleaned_html
 
 
 def sync_extract_html(page_url: str) -> str:
     """
-    Uses Playwright in sync mode to extract HTML from a page.
-    Adjust if your environment doesn't support sync Playwright.
+    Extracts raw HTML from a page, blocking until a pooled browser has loaded it.
     """
-    from playwright.sync_api import sync_playwright
-
-    launch_options = {"headless": True, "args": ["--start-maximized"]}
-    with sync_playwright() as p:
-        browser_type = p.chromium
-        browser = browser_type.launch(**launch_options)
-        context = browser.new_context()
-        page = context.new_page()
-        page.goto(page_url)
-        html = page.content()
-        context.close()
-        browser.close()
-    return html
+    return get_browser_pool().fetch_html_sync(page_url)
 
 
 async def async_extract_html(page_url: str) -> str:
     """
-    Uses Playwright in async mode to extract raw HTML from a page.
+    Uses a pooled Playwright browser in async mode to extract raw HTML from a page.
     """
-    launch_options = {"headless": True, "args": ["--start-maximized"]}
-    async with async_playwright() as p:
-        browser_type = p.chromium
-        browser = await browser_type.launch(**launch_options)
-        context = await browser.new_context()
-        page = await context.new_page()
-        await page.goto(page_url)
-        html = await page.content()
-        await context.close()
-        await browser.close()
-    return html
+    return await get_browser_pool().fetch_html(page_url)
+
 
+def _is_hidden(tag: Tag) -> bool:
+    style = tag.get("style")
+    if style:
+        try:
+            style_lc = style.lower()
+        except Exception:
+            style_lc = ""
+        if "display: none" in style_lc or "visibility: hidden" in style_lc:
+            return True
+    return tag.has_attr("hidden")
+
+
+def _is_text(tag: Tag, node: NavigableString) -> bool:
+    """True for the strings that count towards tag.text (not comments, doctypes, template contents, ...)."""
+    types = tag.interesting_string_types
+    if isinstance(types, type):
+        return type(node) is types
+    return type(node) in types
+
+
+def check_html_parser(parser: str):
+    """Raises ValueError when the BeautifulSoup backend `parser` is not installed."""
+    try:
+        BeautifulSoup("", parser)
+    except FeatureNotFound:
+        raise ValueError(f"HTML parser {parser!r} is not installed (HTML_PARSER=lxml and html5lib need the packages of the same name)")
 
-def clean_html(html_content: str) -> str:
+
+# Without its backend every page would clean to "", fail at startup instead
+check_html_parser(HTML_PARSER)
+
+
+def clean_html(html_content: str, parser: str = HTML_PARSER, prettify: bool = True) -> str:
     """
     Removes scripts, styles, hidden tags, inline event handlers, etc.,
     returning a 'clean' version of the DOM.
     This version is exception resistant.
+
+    `parser` selects the BeautifulSoup backend ("html.parser", "lxml" or
+    "html5lib") and prettify=False returns compact markup instead of the
+    indented form. With html.parser and HTML_CLEANER="stream" the page is
+    cleaned while it is parsed, without building a tree; the output is the same.
+    """
+    if HTML_CLEANER == "stream" and parser == "html.parser":
+        return clean_html_stream(html_content, prettify=prettify)
+    return _clean_html_tree(html_content, parser, prettify)
+
+
+def _clean_html_tree(html_content: str, parser: str = HTML_PARSER, prettify: bool = True) -> str:
+    """Parses the page into a BeautifulSoup tree and cleans it in a single depth-first traversal."""
+    try:
+        soup = BeautifulSoup(html_content, parser)
+    except Exception:
+        return ""
+
+    # Each frame is [tag, remaining children, has element child, has text].
+    # A tag is removed as empty once all of its children have been visited,
+    # but children removed as empty still count as content for their parent,
+    # matching the original leaves-only empty-tag pass.
+    stack = [[soup, iter(list(soup.contents)), False, False]]
+    while stack:
+        frame = stack[-1]
+        for child in frame[1]:
+            try:
+                if isinstance(child, Tag):
+                    if child.name in REMOVED_TAGS or _is_hidden(child):
+                        child.decompose()
+                        continue
+                    # Remove inline event handlers and style/id/class attributes
+                    for attr in list(child.attrs):
+                        if attr.startswith("on") or attr in ["class", "id", "style"]:
+                            del child[attr]
+                    frame[2] = True
+                    stack.append([child, iter(list(child.contents)), False, False])
+                    break
+                elif isinstance(child, Comment):
+                    child.extract()
+                elif isinstance(child, NavigableString) and not frame[3]:
+                    frame[3] = _is_text(frame[0], child) and bool(child.strip())
+            except Exception:
+                pass
+        else:
+            stack.pop()
+            tag, _, has_element_child, has_text = frame
+            if stack and not has_element_child and not has_text:
+                try:
+                    tag.decompose()
+                except Exception:
+                    pass
+
+    # Return the cleaned HTML
+    try:
+        clean_soup = soup.body if soup.body else soup
+        return clean_soup.prettify() if prettify else clean_soup.decode()
+    except Exception:
+        return ""
+
+
+def _clean_html_multipass(html_content: str) -> str:
+    """
+    The original multi-pass cleaner, kept as the reference output that
+    clean_html must reproduce with the default parser and prettify=True.
     """
     try:
         soup = BeautifulSoup(html_content, "html.parser")
@@ -177,6 +332,202 @@ def clean_html(html_content: str) -> str:
         return ""
 
 
+OUTLINE_INTERACTIVE_TAGS = frozenset(["a", "button", "input", "select", "textarea"])
+OUTLINE_HEADING_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+OUTLINE_SKIPPED_TAGS = REMOVED_TAGS | frozenset(["template", "head", "svg"])
+OUTLINE_SELECTOR_ATTRIBUTES = ["name", "placeholder", "aria-label", "data-testid"]
+OUTLINE_TEXT_LIMIT = 80
+
+
+def _short_text(text: str, limit: int = OUTLINE_TEXT_LIMIT) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _xpath(tag: Tag) -> str:
+    """Returns a positional XPath for tag, e.g. //body/div[2]/form/input[3]."""
+    steps = []
+    while tag is not None and tag.name not in (None, "[document]"):
+        parent = tag.parent
+        same_name = [sibling for sibling in parent.find_all(tag.name, recursive=False)] if parent is not None else [tag]
+        step = tag.name
+        if len(same_name) > 1:
+            # By identity: Tag equality is structural, identical siblings would all be [1]
+            step += f"[{next(index for index, sibling in enumerate(same_name) if sibling is tag) + 1}]"
+        steps.append(step)
+        tag = parent
+    return "//" + "/".join(reversed(steps))
+
+
+def _outline_selector(tag: Tag) -> Dict[str, str]:
+    """Picks the most stable Selector for an element, falling back to its XPath."""
+    for attribute in OUTLINE_SELECTOR_ATTRIBUTES:
+        value = tag.get(attribute)
+        if isinstance(value, str) and value.strip():
+            return {"type": "attributeValueSelector", "attribute": attribute, "value": value}
+    href = tag.get("href")
+    if tag.name == "a" and isinstance(href, str) and href.strip():
+        return {"type": "attributeValueSelector", "attribute": "href", "value": href}
+    text = " ".join(tag.get_text(" ", strip=True).split())
+    if tag.name in ("a", "button") and text and len(text) <= OUTLINE_TEXT_LIMIT:
+        return {"type": "tagContainsSelector", "value": text}
+    return {"type": "xpathSelector", "value": _xpath(tag)}
+
+
+def _outline_element(tag: Tag, labels: Dict[str, str]) -> str:
+    kind = tag.name
+    input_type = tag.get("type")
+    if isinstance(input_type, str) and input_type:
+        kind += f"[type={input_type}]"
+    label = (
+        (tag.get_text(" ", strip=True) if tag.name != "select" else "")
+        or labels.get(tag.get("id") or "")
+        or tag.get("aria-label") or tag.get("placeholder") or tag.get("title") or tag.get("value") or ""
+    )
+    line = kind
+    if label:
+        line += f' "{_short_text(str(label))}"'
+    if tag.name == "a" and isinstance(tag.get("href"), str) and tag["href"].strip():
+        line += f" href={json.dumps(tag['href'].strip())}"
+    if tag.name == "select":
+        options = [_short_text(option.get_text(" ", strip=True), 30) for option in tag.find_all("option")]
+        line += f" options={json.dumps(options[:10])}"
+    return line + " " + json.dumps(_outline_selector(tag), separators=(",", ":"))
+
+
+def build_page_outline(html_content: str, token_budget: int = OUTLINE_TOKEN_BUDGET, parser: str = HTML_PARSER) -> str:
+    """
+    Returns a compact outline of a page for the model: headings, forms and
+    interactive elements with a stable selector each, preceded by the text
+    just before them. Covers what detect_interactive_elements finds (forms
+    and their fields, buttons, links) plus selects and textareas.
+
+    Scripts, styles and hidden elements are skipped. When the outline is
+    over token_budget, context text is dropped first, then trailing elements.
+    """
+    try:
+        soup = BeautifulSoup(html_content, parser)
+    except Exception:
+        return ""
+
+    labels = {}
+    for label in soup.find_all("label"):
+        target = label.get("for")
+        if isinstance(target, str) and target:
+            labels[target] = label.get_text(" ", strip=True)
+
+    lines = []  # (is_context, text)
+    pending_text = []
+    stack = [(soup, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if isinstance(node, NavigableString):
+            if isinstance(node.parent, Tag) and _is_text(node.parent, node) and node.strip():
+                # Only the text closest to the next element is kept as its context
+                pending_text = pending_text[-2:] + [str(node)]
+            continue
+        if not isinstance(node, Tag) or node.name in OUTLINE_SKIPPED_TAGS or _is_hidden(node):
+            continue
+        if node.name == "input" and node.get("type") == "hidden":
+            continue
+
+        indent = "  " * depth
+        if node.name in OUTLINE_HEADING_TAGS or node.name in OUTLINE_INTERACTIVE_TAGS:
+            if pending_text:
+                lines.append((True, indent + "| " + _short_text(" ".join(pending_text))))
+                pending_text = []
+            if node.name in OUTLINE_HEADING_TAGS:
+                lines.append((False, indent + "#" * int(node.name[1]) + " " + _short_text(node.get_text(" ", strip=True))))
+            else:
+                lines.append((False, indent + _outline_element(node, labels)))
+            # Their own text is already in the line
+            continue
+        if node.name == "form":
+            lines.append((False, indent + "form " + json.dumps(_outline_selector(node), separators=(",", ":"))))
+            depth += 1
+        stack.extend((child, depth) for child in reversed(node.contents))
+
+    outline_tokens = sum(estimate_tokens(text) for _, text in lines)
+    if outline_tokens > token_budget:
+        kept = [line for line in lines if not line[0]]
+        outline_tokens = sum(estimate_tokens(text) for _, text in kept)
+        lines = kept
+    if outline_tokens > token_budget:
+        kept, used = [], 0
+        for line in lines:
+            used += estimate_tokens(line[1])
+            if used > token_budget:
+                break
+            kept.append(line)
+        kept.append((False, f"... {len(lines) - len(kept)} more elements"))
+        lines = kept
+    return "\n".join(text for _, text in lines)
+
+
+# Start of an HTML tag or declaration; outlines have none
+HTML_TAG_PATTERN = re.compile(r"<(?:[a-zA-Z][\w:-]*|/[a-zA-Z]|!)")
+
+
+def render_page(raw_html: str, page_format: str = PAGE_FORMAT, page_url: str = "") -> str:
+    """
+    Turns raw page HTML into what is sent to the model: cleaned HTML or an
+    outline. Text without any tags is taken to be an outline already and is
+    returned unchanged, so rendering twice is harmless.
+    """
+    if page_format != "outline":
+        with span("clean_html"):
+            return clean_html(raw_html)
+    if not HTML_TAG_PATTERN.search(raw_html):
+        return raw_html
+
+    with span("page_outline"):
+        outline = build_page_outline(raw_html)
+    # Cleaning the page again only to compare sizes is too costly outside debug logging
+    logger.opt(lazy=True).debug("outline of {}: {} tokens instead of {}", lambda: page_url,
+                                lambda: estimate_tokens(outline), lambda: estimate_tokens(clean_html(raw_html)))
+    return outline
+
+
+# Anchor lines of a page outline: a "text" href="..." {...}
+OUTLINE_LINK_PATTERN = re.compile(r'^\s*a(?: "(?P<text>.*)")? href=(?P<href>"(?:[^"\\]|\\.)*")', re.MULTILINE)
+LINK_SKIPPED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".pdf", ".zip", ".css", ".js")
+
+
+def extract_links(page_html: str, page_url: str, page_format: str = PAGE_FORMAT) -> List[Tuple[str, str]]:
+    """Returns (absolute url, anchor text) for each distinct same-origin link of a rendered page, in page order."""
+    if page_format == "outline":
+        anchors = []
+        for match in OUTLINE_LINK_PATTERN.finditer(page_html):
+            try:
+                anchors.append((json.loads(match.group("href")), match.group("text") or ""))
+            except ValueError:
+                continue
+    else:
+        soup = BeautifulSoup(page_html, HTML_PARSER)
+        anchors = [(a["href"], a.get_text(" ", strip=True)) for a in soup.find_all("a", href=True)]
+
+    origin = url_origin(page_url)
+    seen = { canonicalize_url(page_url) }
+    links = []
+    for href, text in anchors:
+        href = href.strip()
+        if not href or href.startswith(("javascript:", "mailto:", "tel:")):
+            continue
+        if href.startswith("#") and not href[1:].startswith(ROUTE_FRAGMENT_PREFIXES):
+            continue
+        url = urljoin(page_url, href)
+        if urlsplit(url).scheme not in ("http", "https") or url_origin(url) != origin:
+            continue
+        if urlsplit(url).path.lower().endswith(LINK_SKIPPED_EXTENSIONS):
+            continue
+        key = canonicalize_url(url)
+        if key in seen:
+            continue
+        seen.add(key)
+        links.append((url, text))
+    return links
+
+
 def detect_interactive_elements(cleaned_html: str) -> Dict[str, Any]:
     """
     Inspects the cleaned HTML to find possible interactive elements:
@@ -253,3 +604,23 @@ def generate_html_differences_with_xmldiff(html_list: List[str]) -> List[str]:
         prev_html = current_html
 
     return diffs
+
+
+def generate_html_differences_with_dom_diff(html_list: List[str]) -> List[str]:
+    """
+    Generate a list of initial HTML followed by structural edit scripts between consecutive HTMLs.
+    Unchanged subtrees are matched by hash, so large mostly-unchanged pages diff quickly.
+    """
+    if not html_list:
+        return []
+
+    diffs = [html_list[0]]
+    differ = DomDiffer()
+    differ.diff(html_list[0])
+
+    for current_html in html_list[1:]:
+        diff_str = format_edit_script(differ.diff(current_html))
+        if diff_str:
+            diffs.append(diff_str)
+
+    return diffs